@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import sys
+import time
+from broadcaster import Broadcaster
+from metrics import configure_logging, log_event
+from protocol import IDLE_TIMEOUT, MAX_FRAME_SIZE, decode_payload, encode_message, frame_length
+from server import GameServer
+
+log = logging.getLogger("golf.server")
+broadcaster_log = logging.getLogger("golf.broadcaster")
+
+
+class AsyncConnection:
+    """Socket-like wrapper so the GameServer handlers can write to an asyncio stream."""
+
+    def __init__(self, reader, writer, max_write_buffer):
+        self.reader = reader
+        self.writer = writer
+        self.max_write_buffer = max_write_buffer
+
+    def send(self, data):
+        """Queue data on the transport without blocking the event loop."""
+        if self.writer.is_closing():
+            raise ConnectionError("Connection is closed.")
+        if self.writer.transport.get_write_buffer_size() > self.max_write_buffer:
+            # The peer stopped reading; drop it instead of buffering without bound.
+            self.writer.transport.abort()
+            raise ConnectionError("Client write buffer is full.")
+        self.writer.write(data)
+        return len(data)
+
+    sendall = send
+
+    def shutdown(self, how=None):
+        self.writer.transport.abort()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncBroadcaster(Broadcaster):
+    """Broadcaster whose channels are drained by one event-loop task each.
+
+    Queueing, policies and metrics are the same as Broadcaster; only the
+    sender thread is replaced, since asyncio transports never block.
+    """
+
+    def start(self):
+        pass
+
+    def add(self, name, sock):
+        channel = super().add(name, sock)
+        channel.wakeup = asyncio.Event()
+        channel.task = asyncio.get_running_loop().create_task(self.drain(channel))
+        return channel
+
+    def schedule(self, channel):
+        if not channel.scheduled:
+            channel.scheduled = True
+            channel.wakeup.set()
+
+    def remove_socket(self, sock):
+        channel = self.by_socket.get(sock)
+        super().remove_socket(sock)
+        if channel is not None:
+            channel.wakeup.set()
+
+    async def drain(self, channel):
+        writer = channel.sock.writer
+        while not channel.closed:
+            await channel.wakeup.wait()
+            channel.wakeup.clear()
+            channel.scheduled = False
+            while not channel.closed:
+                entry = channel.pop()
+                if entry is None:
+                    break
+                try:
+                    writer.write(entry[0])
+                    # Only this task waits on a slow client; other channels keep draining.
+                    await writer.drain()
+                except (ConnectionError, RuntimeError) as e:
+                    log_event(broadcaster_log, logging.WARNING, "send_failed", player=channel.name, error=e)
+                    self.close_channel(channel)
+                    return
+                self.messages_sent += 1
+                self.send_latencies.append(time.perf_counter() - entry[1])
+
+
+class AsyncGameServer(GameServer):
+    """GameServer that serves every connection from a single asyncio event loop."""
+
+    def __init__(self, host='192.168.1.160', port=7500, max_connections=10000,
+                 write_buffer_high=64 * 1024, max_write_buffer=1024 * 1024, max_read_buffer=64 * 1024,
+                 max_frame_size=MAX_FRAME_SIZE, backlog=1024, journal_path=None,
+                 metrics_port=None, metrics_file=None, instrument=True, peer_tables=False,
+                 idle_timeout=IDLE_TIMEOUT, max_replies=64):
+        self.connections = set()
+        super().__init__(host, port, serve=False, journal_path=journal_path, metrics_port=metrics_port,
+                         metrics_file=metrics_file, instrument=instrument, peer_tables=peer_tables,
+                         idle_timeout=idle_timeout, max_replies=max_replies)
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.write_buffer_high = write_buffer_high
+        self.max_write_buffer = max_write_buffer
+        # The stream stops reading a connection once about twice this is buffered.
+        self.max_read_buffer = max_read_buffer
+        self.max_frame_size = max_frame_size
+        self.backlog = backlog
+        self.server = None
+        self.matchmaking_task = None
+        self.reaper_task = None
+
+    def create_broadcaster(self, max_queue, policy):
+        return AsyncBroadcaster(max_queue, policy, on_disconnect=self.on_slow_client, instrument=self.instrument,
+                                max_replies=self.max_replies)
+
+    def active_connections(self):
+        return len(self.connections)
+
+    def start_matchmaking(self):
+        # Tables are formed on the event loop, since the broadcaster is not thread-safe here.
+        if self.matchmaking_task is None:
+            self.matchmaking_task = asyncio.get_running_loop().create_task(self.run_matchmaking())
+
+    async def run_matchmaking(self):
+        while True:
+            await asyncio.sleep(self.matchmaking.interval)
+            try:
+                self.matchmaking.form_tables()
+            except Exception as e:
+                log_event(log, logging.ERROR, "matchmaking_failed", error=e)
+
+    async def run_reaper(self):
+        while True:
+            await asyncio.sleep(self.reaper.resolution)
+            self.reap_idle()
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port, backlog=self.backlog, limit=self.max_read_buffer)
+        if self.reaper is not None:
+            self.reaper_task = asyncio.get_running_loop().create_task(self.run_reaper())
+        log_event(log, logging.INFO, "server_started", host=self.host, port=self.port)
+        return self.server
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        if len(self.connections) >= self.max_connections:
+            log_event(log, logging.WARNING, "connection_rejected", peer=addr, reason="server full")
+            writer.write(encode_message({"status": "FAILURE", "reason": "Server is full."}))
+            writer.close()
+            return
+
+        log_event(log, logging.DEBUG, "connection_opened", peer=addr)
+        # drain() waits once this much is buffered, so a client that stops reading
+        # also stops having its requests read.
+        writer.transport.set_write_buffer_limits(high=self.write_buffer_high)
+        connection = AsyncConnection(reader, writer, self.max_write_buffer)
+        self.connections.add(connection)
+        request_bytes = self.request_bytes
+        reaper = self.reaper
+        if reaper is not None:
+            reaper.add(connection)
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(4)
+                    payload = await reader.readexactly(frame_length(header, self.max_frame_size))
+                except asyncio.IncompleteReadError:
+                    break
+                if request_bytes is not None:
+                    request_bytes.record(len(payload))
+                if reaper is not None:
+                    reaper.touch(connection)
+                message = decode_payload(payload)
+                self.dispatch(message, connection)
+                await writer.drain()
+        except Exception as e:
+            log_event(log, logging.INFO, "connection_closed", peer=addr, reason=e)
+        finally:
+            self.connections.discard(connection)
+            self.connection_closed(connection)
+            writer.close()
+
+
+# Main execution
+if __name__ == "__main__":
+    host = sys.argv[1] if len(sys.argv) > 1 else '192.168.1.160'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 7500
+    journal_path = sys.argv[3] if len(sys.argv) > 3 else None
+    metrics_port = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    configure_logging()
+    asyncio.run(AsyncGameServer(host, port, journal_path=journal_path, metrics_port=metrics_port).serve_forever())
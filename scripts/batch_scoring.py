@@ -0,0 +1,127 @@
+"""Vectorized NumPy scoring of many hands at once, and a Monte-Carlo action evaluator.
+
+Hands are integer arrays of card codes (cards.CARD_NAMES order) whose last
+axis holds the six cards, e.g. shape (games, players, 6). Positions 0-2 are
+the top row and 3-5 the bottom row, so columns are (0, 3), (1, 4), (2, 5).
+
+Requires NumPy (pip install numpy); nothing else in the server imports it.
+"""
+import numpy as np
+from cards import CARD_CODES, CARD_VALUES, RANKS
+
+VALUES = np.frombuffer(CARD_VALUES, dtype=np.uint8).astype(np.int16)
+RANK_OF = np.arange(len(CARD_VALUES), dtype=np.int16) % len(RANKS)
+RULES = ("sum", "pairs")
+
+# COLUMN_SCORES[rule][top, bottom] is the score of one column, so scoring a
+# hand is three table lookups instead of per-card arithmetic.
+_PAIR_VALUES = (VALUES[:, None] + VALUES[None, :]).astype(np.int16)
+COLUMN_SCORES = {
+    "sum": _PAIR_VALUES,
+    "pairs": np.where(RANK_OF[:, None] == RANK_OF[None, :], 0, _PAIR_VALUES).astype(np.int16),
+}
+
+
+def _codes(cards):
+    return np.array([card if isinstance(card, (int, np.integer)) else CARD_CODES[card] for card in cards],
+                    dtype=np.int16)
+
+
+def score_batch(hands, rule="sum"):
+    """Score every hand in one pass; returns an array with the last axis summed away.
+
+    "sum" matches GameServer.calculate_scores. "pairs" is the Six Card Golf
+    rule where a column holding two cards of the same rank scores zero.
+    """
+    hands = np.asarray(hands)
+    return column_scores(hands, rule).sum(axis=-1)
+
+
+def column_scores(hands, rule="sum"):
+    """Score of each of the three columns, shape (..., 3)."""
+    if rule not in COLUMN_SCORES:
+        raise ValueError(f"Unknown scoring rule '{rule}'; expected one of {RULES}.")
+    return COLUMN_SCORES[rule][hands[..., :3], hands[..., 3:]]
+
+
+def sample_distinct(rng, pool, samples, count):
+    """Draw `count` distinct cards from pool for each of `samples` rows.
+
+    Draws with replacement and redraws only the rows that collided, which for
+    a handful of cards out of a few dozen is far cheaper than shuffling.
+    """
+    picks = rng.integers(0, len(pool), (samples, count))
+    rows = np.arange(samples)
+    while len(rows):
+        subset = picks[rows]
+        clash = np.zeros(len(rows), dtype=bool)
+        for i in range(count):
+            for j in range(i + 1, count):
+                clash |= subset[:, i] == subset[:, j]
+        rows = rows[clash]
+        picks[rows] = rng.integers(0, len(pool), (len(rows), count))
+    return pool[picks]
+
+
+def candidate_actions():
+    """Every plan a player can commit to on a turn, as (source, position).
+
+    ("discard", i) takes the top discard into position i; ("deck", i) draws
+    and swaps the drawn card into position i; ("deck", -1) draws and
+    discards the drawn card.
+    """
+    return [("discard", i) for i in range(6)] + [("deck", i) for i in range(6)] + [("deck", -1)]
+
+
+def evaluate_actions(hand, known, top_discard, unseen=None, samples=10000, rule="pairs", rng=None):
+    """Estimate the expected hand score of each candidate action.
+
+    hand holds six cards (codes or strings such as 'AS'); known marks which
+    of them the player can see, the rest are treated as unknown. top_discard
+    is what get_top_discard_card() returns. unseen is the pool the hidden
+    cards and the next deck card are drawn from; by default every card not
+    known to the player. Returns {action: expected score}, lower is better.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    hand = _codes(hand)
+    known = np.asarray(known, dtype=bool)
+    top = top_discard if isinstance(top_discard, (int, np.integer)) else CARD_CODES[top_discard]
+    if unseen is None:
+        visible = np.zeros(len(VALUES), dtype=bool)
+        visible[hand[known]] = True
+        visible[top] = True
+        unseen = np.flatnonzero(~visible).astype(np.int16)
+    else:
+        unseen = _codes(unseen)
+
+    hidden = np.flatnonzero(~known)
+    # The hidden cards plus the next card off the deck
+    picks = sample_distinct(rng, unseen, samples, len(hidden) + 1)
+    base = np.broadcast_to(hand, (samples, 6)).copy()
+    base[:, hidden] = picks[:, :-1]
+    drawn = picks[:, -1]
+
+    # Each action changes one card, so only that card's column is rescored.
+    table = COLUMN_SCORES[rule]
+    columns = column_scores(base, rule)
+    totals = columns.sum(axis=1)
+    results = {}
+    for source, position in candidate_actions():
+        if position < 0:
+            results[(source, position)] = float(totals.mean())
+            continue
+        card = top if source == "discard" else drawn
+        column = position % 3
+        if position < 3:
+            replaced = table[card, base[:, column + 3]]
+        else:
+            replaced = table[base[:, column], card]
+        results[(source, position)] = float((totals - columns[:, column] + replaced).mean())
+    return results
+
+
+def best_action(hand, known, top_discard, **kwargs):
+    """The candidate action with the lowest expected score, and that score."""
+    scores = evaluate_actions(hand, known, top_discard, **kwargs)
+    action = min(scores, key=scores.get)
+    return action, scores[action]
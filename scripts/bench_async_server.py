@@ -0,0 +1,109 @@
+"""Load benchmark for AsyncGameServer: idle connections plus a set of active clients.
+
+The server runs in its own process pinned to one core. Usage:
+
+    python bench_async_server.py [idle] [active] [seconds]
+"""
+import asyncio
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import time
+from async_server import AsyncGameServer
+from protocol import decode_payload, encode_message, frame_length
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def run_server(port, max_connections, ready):
+    raise_fd_limit()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {0})
+    sys.stdout = open(os.devnull, "w")
+    server = AsyncGameServer('127.0.0.1', port, max_connections=max_connections)
+
+    async def main():
+        await server.start()
+        ready.set()
+        await server.server.serve_forever()
+
+    asyncio.run(main())
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def open_idle(port, count, batch=500):
+    connections = []
+    for start in range(0, count, batch):
+        opened = await asyncio.gather(*[
+            asyncio.open_connection('127.0.0.1', port)
+            for _ in range(min(batch, count - start))
+        ])
+        connections.extend(opened)
+    return connections
+
+
+async def active_client(port, deadline, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    request = encode_message({"type": "query_games"})
+    while time.perf_counter() < deadline:
+        sent = time.perf_counter()
+        writer.write(request)
+        header = await reader.readexactly(4)
+        decode_payload(await reader.readexactly(frame_length(header)))
+        latencies.append(time.perf_counter() - sent)
+    writer.close()
+
+
+async def run_clients(port, idle, active, seconds):
+    started = time.perf_counter()
+    idle_connections = await open_idle(port, idle)
+    print(f"Opened {len(idle_connections)} idle connections in {time.perf_counter() - started:.2f}s")
+
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*[active_client(port, deadline, latencies) for _ in range(active)])
+
+    print(f"Active clients: {active}, requests: {len(latencies)}, "
+          f"throughput: {len(latencies) / seconds:.0f} req/s")
+    print(f"Latency p50: {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p99: {percentile(latencies, 99) * 1000:.2f} ms")
+    for _, writer in idle_connections:
+        writer.close()
+
+
+def main():
+    idle = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    active = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    raise_fd_limit()
+
+    port = free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=run_server, args=(port, idle + active + 10, ready), daemon=True)
+    server.start()
+    ready.wait()
+    try:
+        asyncio.run(run_clients(port, idle, active, seconds))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
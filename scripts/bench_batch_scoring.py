@@ -0,0 +1,57 @@
+"""Compare GameServer.calculate_scores with vectorized score_batch, and time the evaluator.
+
+Usage: python bench_batch_scoring.py [games]
+"""
+import sys
+import time
+import numpy as np
+from batch_scoring import evaluate_actions, score_batch
+from cards import CARD_NAMES
+from server import GameServer
+from simulation import score_pairs
+
+
+class Hands:
+    """Minimal stand-in with the players_cards attribute calculate_scores reads."""
+
+    def __init__(self, players_cards):
+        self.players_cards = players_cards
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = np.random.default_rng(0)
+    hands = np.argsort(rng.random((games, 52)), axis=1)[:, :24].reshape(games, 4, 6).astype(np.int16)
+
+    server = GameServer(serve=False)
+    tables = [Hands({seat + 1: [CARD_NAMES[c] for c in hand] for seat, hand in enumerate(game)}) for game in hands]
+    started = time.perf_counter()
+    loop_scores = [server.calculate_scores(table) for table in tables]
+    loop_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch_scores = score_batch(hands, "sum")
+    batch_time = time.perf_counter() - started
+    assert all(list(batch_scores[g]) == list(loop_scores[g].values()) for g in range(games))
+
+    pairs = score_batch(hands, "pairs")
+    assert all(pairs[g, p] == score_pairs(list(hands[g, p])) for g in range(100) for p in range(4))
+
+    print(f"{games} games x 4 players")
+    print(f"  calculate_scores loop: {loop_time * 1000:8.2f} ms")
+    print(f"  score_batch (sum):     {batch_time * 1000:8.2f} ms  ({loop_time / batch_time:.0f}x)")
+
+    hand = ["KH", "5D", "5S", "QC", "2H", "9D"]
+    known = [True, True, False, True, False, False]
+    evaluate_actions(hand, known, "5C", samples=10000)  # warm up
+    runs = 50
+    started = time.perf_counter()
+    for _ in range(runs):
+        scores = evaluate_actions(hand, known, "5C", samples=10000, rng=rng)
+    per_call = (time.perf_counter() - started) / runs
+    best = min(scores, key=scores.get)
+    print(f"  evaluate_actions, 10k samples: {per_call * 1000:.2f} ms per call; best {best} -> {scores[best]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
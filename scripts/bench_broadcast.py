@@ -0,0 +1,91 @@
+"""Check that one stalled client does not slow broadcasts to everyone else.
+
+Publishes timestamped messages to healthy clients with and without an extra
+client that never reads, and compares the healthy clients' delivery latency.
+Exits non-zero if the stalled run's p99 is not flat.
+Usage: python bench_broadcast.py [clients] [messages] [policy]
+"""
+import socket
+import sys
+import threading
+import time
+from broadcaster import Broadcaster
+from protocol import MessageReader
+
+PAYLOAD = "x" * 512
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def reader(sock, last_seq, latencies):
+    messages = MessageReader(sock)
+    while True:
+        message = messages.recv()
+        latencies.append(time.perf_counter() - message["sent"])
+        if message["seq"] == last_seq:
+            break
+
+
+def run(clients, messages, policy, stalled):
+    broadcaster = Broadcaster(max_queue=64, policy=policy)
+    latencies = []
+    threads = []
+    names = []
+    keep = []
+    for i in range(clients):
+        server_end, client_end = socket.socketpair()
+        keep.append((server_end, client_end))
+        name = f"client{i}"
+        broadcaster.add(name, server_end)
+        names.append(name)
+        thread = threading.Thread(target=reader, args=(client_end, messages - 1, latencies), daemon=True)
+        thread.start()
+        threads.append(thread)
+    if stalled:
+        server_end, client_end = socket.socketpair()
+        server_end.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        client_end.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        keep.append((server_end, client_end))
+        broadcaster.add("stalled", server_end)
+        names.append("stalled")
+
+    for seq in range(messages):
+        broadcaster.publish(names, {"type": "game_state", "seq": seq, "sent": time.perf_counter(),
+                                    "message": PAYLOAD}, key="state" if seq % 2 else None)
+        time.sleep(0.001)
+    for thread in threads:
+        thread.join(timeout=30)
+    metrics = broadcaster.metrics()
+    for server_end, client_end in keep:
+        server_end.close()
+        client_end.close()
+    return latencies, metrics
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    policy = sys.argv[3] if len(sys.argv) > 3 else "coalesce"
+
+    results = {}
+    for stalled in (False, True):
+        latencies, metrics = run(clients, messages, policy, stalled)
+        results[stalled] = latencies
+        label = "with stalled client" if stalled else "baseline"
+        print(f"{label:<22} delivered {len(latencies):>6}  p50 {percentile(latencies, 50) * 1000:6.2f} ms"
+              f"  p99 {percentile(latencies, 99) * 1000:6.2f} ms  queue max {metrics['queue_depth_max']}"
+              f"  dropped {metrics['dropped']}  coalesced {metrics['coalesced']}"
+              f"  disconnected {metrics['disconnected']}")
+
+    base_p99 = percentile(results[False], 99)
+    stalled_p99 = percentile(results[True], 99)
+    flat = stalled_p99 <= max(2 * base_p99, base_p99 + 0.005)
+    print("PASS: healthy clients unaffected" if flat else "FAIL: stalled client slowed other players")
+    sys.exit(0 if flat else 1)
+
+
+if __name__ == "__main__":
+    main()
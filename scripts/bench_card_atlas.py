@@ -0,0 +1,89 @@
+"""Compare per-file PNG loading with the mmap'd card atlas for a 4-player table.
+
+Before: every redraw decodes and scales each visible card's PNG.
+After: the atlas is mapped once and redraws blit sprites from the LRU.
+Cold start is the time to the first complete frame.
+
+Usage: python bench_card_atlas.py [frames] [atlas file]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+from card_atlas import DEFAULT_IMAGES, CardAtlas, Image, SpriteCache, build_atlas, read_png, resize
+from cards import CARD_NAMES
+
+WINDOW = (1280, 800)
+CARD_SIZE = (80, 120)
+
+
+def table_layout(hands, top_discard):
+    """(card name, x, y) for four hands of six cards, the deck and the discard pile."""
+    width, height = CARD_SIZE
+    spots = []
+    for seat, hand in enumerate(hands):
+        x0 = 20 + (seat % 2) * 640
+        y0 = 20 + (seat // 2) * 420
+        for i, card in enumerate(hand):
+            spots.append((card, x0 + (i % 3) * (width + 10), y0 + (i // 3) * (height + 10)))
+    spots.append(("blue_back", 540, 340))
+    spots.append((top_discard, 660, 340))
+    return spots
+
+
+def draw(frame, spots, sprite_for):
+    frame[:] = (0, 96, 0, 255)
+    for card, x, y in spots:
+        sprite = sprite_for(card)
+        frame[y:y + sprite.shape[0], x:x + sprite.shape[1]] = sprite
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    atlas_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.mkdtemp(), "cards.atlas")
+    rng = random.Random(0)
+    deck = rng.sample(CARD_NAMES, 25)
+    spots = table_layout([deck[i * 6:i * 6 + 6] for i in range(4)], deck[24])
+    frame = np.zeros((WINDOW[1], WINDOW[0], 4), dtype=np.uint8)
+    print(f"PNG decoder: {'Pillow' if Image is not None else 'built-in (zlib + NumPy)'}")
+
+    def from_png(card):
+        return resize(read_png(os.path.join(DEFAULT_IMAGES, card + ".png")), *CARD_SIZE)
+
+    # Before: the first frame is also the cold start, since nothing is kept between frames.
+    started = time.perf_counter()
+    draw(frame, spots, from_png)
+    before_frame = time.perf_counter() - started
+    before = frame.copy()
+    print(f"Per-file PNGs: cold start {before_frame * 1000:.0f} ms, every redraw {before_frame * 1000:.0f} ms "
+          f"({len(spots)} cards decoded per frame)")
+
+    started = time.perf_counter()
+    build_atlas(DEFAULT_IMAGES, atlas_path)
+    print(f"Atlas build (one-off): {time.perf_counter() - started:.1f}s, "
+          f"{os.path.getsize(atlas_path) / 1e6:.0f} MB")
+
+    started = time.perf_counter()
+    atlas = CardAtlas(atlas_path)
+    sprites = SpriteCache(atlas)
+    opened = time.perf_counter() - started
+    draw(frame, spots, lambda card: sprites.get(card, *CARD_SIZE))
+    cold = time.perf_counter() - started
+    # Odd-sized source PNGs are rescaled into the atlas slot, so allow rounding differences.
+    assert np.abs(frame.astype(np.int16) - before).mean() < 1.0
+
+    started = time.perf_counter()
+    for _ in range(frames):
+        draw(frame, spots, lambda card: sprites.get(card, *CARD_SIZE))
+    redraw = (time.perf_counter() - started) / frames
+    print(f"Atlas: cold start {cold * 1000:.1f} ms (mmap open {opened * 1000:.2f} ms), "
+          f"redraw {redraw * 1000:.3f} ms over {frames} frames")
+    print(f"  speedup: cold start {before_frame / cold:.0f}x, redraw {before_frame / redraw:.0f}x; "
+          f"sprite cache {sprites.hits} hits / {sprites.misses} misses")
+    atlas.close()
+
+
+if __name__ == "__main__":
+    main()
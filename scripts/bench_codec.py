@@ -0,0 +1,71 @@
+"""Compare the framed binary protocol against the old pickle path.
+
+Reports bytes per message and encode/decode time in microseconds.
+Usage: python bench_codec.py [iterations]
+"""
+import pickle
+import sys
+import timeit
+from game_logic import SixCardGolfGame
+from protocol import FrameDecoder, decode_message, encode_message
+
+
+def as_lists(value):
+    """Mirror the one lossy conversion in the codec: tuples decode as lists."""
+    if isinstance(value, dict):
+        return {key: as_lists(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [as_lists(item) for item in value]
+    return value
+
+
+def sample_messages():
+    game = SixCardGolfGame(4)
+    players = {
+        f"player{chr(97 + i)}": {"ipv4": "192.168.1.10", "t_port": 7501 + i, "p_port": 7601 + i, "status": "free"}
+        for i in range(20)
+    }
+    return {
+        "register": {"type": "register", "name": "alice", "ipv4": "192.168.1.10", "t_port": 7501, "p_port": 7601},
+        "draw_card": {"type": "draw_card", "player": "alice"},
+        "swap_card": {"type": "swap_card", "player": "alice", "your_card": "10H", "drawn_card": "QS"},
+        "response": {"status": "SUCCESS"},
+        "query_players": {"status": len(players), "players": list(players.items())},
+        "game_state": {
+            "type": "game_state",
+            "current_player": 1,
+            "players": players,
+            "discard_pile": game.get_top_discard_card(),
+            "player_cards": game.players_cards,
+        },
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'message':<14}{'pickle B':>10}{'frame B':>10}"
+          f"{'pickle enc':>12}{'frame enc':>12}{'pickle dec':>12}{'frame dec':>12}")
+    for name, message in sample_messages().items():
+        pickled = pickle.dumps(message)
+        framed = encode_message(message)
+        assert decode_message(framed) == as_lists(message)
+
+        def us(stmt):
+            return timeit.timeit(stmt, number=iterations) / iterations * 1e6
+
+        print(f"{name:<14}{len(pickled):>10}{len(framed):>10}"
+              f"{us(lambda: pickle.dumps(message)):>12.2f}{us(lambda: encode_message(message)):>12.2f}"
+              f"{us(lambda: pickle.loads(pickled)):>12.2f}{us(lambda: decode_message(framed)):>12.2f}")
+
+    # Streaming: many frames per read, split at awkward boundaries.
+    stream = b"".join(encode_message(m) for m in sample_messages().values()) * 100
+    decoder = FrameDecoder()
+    decoded = []
+    for start in range(0, len(stream), 7):
+        decoded.extend(decoder.feed(stream[start:start + 7]))
+    assert len(decoded) == 600 and not decoder.buffer
+    print(f"Streaming decoder: {len(decoded)} messages from {len(stream)} bytes in 7-byte reads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Game creations per second: the old shuffle-and-pop deal against seeded and pooled decks.
+
+    legacy     what SixCardGolfGame.__init__ did before decks.py: build the
+               deck from strings, random.shuffle it, pop each card (shown
+               in the "seeded" column)
+    seeded     a fresh seeded shuffle per game (SixCardGolfGame(4))
+    pooled     decks taken from a DeckPool filled beforehand
+    sustained  a small DeckPool whose thread refills it while games are made
+
+The refill thread needs the GIL to shuffle, so a burst that outlasts the
+pool runs at the "sustained" rate, shuffles included. "pooled" is the rate
+for a burst the pool covers, having been refilled while the server was
+waiting on sockets. Before timing, every engine is checked to rebuild the
+same deal from a seed.
+
+Usage: python bench_deck_pool.py [games]
+"""
+import gc
+import random
+import sys
+import time
+from compact_game import CompactGolfGame
+from decks import DeckPool, shuffled_deck
+from game_logic import SixCardGolfGame
+from game_manager import GameManager
+
+PLAYERS = 4
+ENGINES = [("SixCardGolfGame", SixCardGolfGame), ("CompactGolfGame", CompactGolfGame)]
+
+
+def legacy_game(num_players):
+    deck = [rank + suit for suit in ['C', 'D', 'H', 'S']
+            for rank in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']]
+    random.shuffle(deck)
+    hands = {i: [deck.pop() for _ in range(6)] for i in range(1, num_players + 1)}
+    return deck, hands, [deck.pop()]
+
+
+def check_replay(factory):
+    for seed in range(100):
+        first = factory(PLAYERS, shuffled_deck(seed))
+        second = factory(PLAYERS, shuffled_deck(seed))
+        reference = SixCardGolfGame(PLAYERS, shuffled_deck(seed))
+        assert first.players_cards == second.players_cards == reference.players_cards, seed
+        assert first.get_top_discard_card() == reference.get_top_discard_card(), seed
+        assert [first.draw_card() for _ in range(5)] == [reference.draw_card() for _ in range(5)], seed
+
+
+def rate(fn, count):
+    gc.collect()  # Leave no garbage from the previous run for this one's collections.
+    started = time.perf_counter()
+    fn(count)
+    return count / (time.perf_counter() - started)
+
+
+def legacy(count):
+    for _ in range(count):
+        legacy_game(PLAYERS)
+
+
+def seeded(factory):
+    def run(count):
+        for _ in range(count):
+            factory(PLAYERS)
+    return run
+
+
+def pooled(factory, pool):
+    def run(count):
+        take = pool.take
+        for _ in range(count):
+            factory(PLAYERS, take()[1])
+    return run
+
+
+def manager_tables(count):
+    manager = GameManager(deck_pool=prefilled(count))
+    players = [f"p{seat}" for seat in range(PLAYERS)]
+    for _ in range(count):
+        manager.create_table(players[0], players, 9)
+
+
+def prefilled(count):
+    pool = DeckPool(size=count, low_water=0)
+    pool.fill()
+    return pool
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    for _, factory in ENGINES:
+        check_replay(factory)
+    print(f"{PLAYERS}-player games, {count} per run; deals replay from their seeds on every engine")
+    print(f"{'engine':<18}{'seeded':>12}{'pooled':>12}{'sustained':>12}   games/sec")
+    print(f"{'legacy deal':<18}{rate(legacy, count):>12,.0f}")
+    # The runs from a count-sized pool go last: whatever runs after them measures slower.
+    rows = []
+    for name, factory in ENGINES:
+        sustained = DeckPool(size=256)
+        sustained.fill()
+        rows.append([name, rate(seeded(factory), count), rate(pooled(factory, sustained), count), sustained.stats()])
+    for row, (_, factory) in zip(rows, ENGINES):
+        row.append(rate(pooled(factory, prefilled(count)), count))
+    for name, seeded_rate, sustained_rate, stats, pooled_rate in rows:
+        print(f"{name:<18}{seeded_rate:>12,.0f}{pooled_rate:>12,.0f}{sustained_rate:>12,.0f}")
+        print(f"{'':<18}  sustained pool: {stats}")
+    print(f"GameManager.create_table from a filled pool: {rate(manager_tables, count):,.0f} tables/sec")
+
+
+if __name__ == "__main__":
+    main()
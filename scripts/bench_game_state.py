@@ -0,0 +1,79 @@
+"""Memory and throughput of CompactGolfGame against SixCardGolfGame.
+
+Usage: python bench_game_state.py [games]
+"""
+import sys
+import time
+import tracemalloc
+from compact_game import CompactGolfGame
+from game_logic import SixCardGolfGame
+from server import GameServer
+
+ENGINES = [("SixCardGolfGame", SixCardGolfGame), ("CompactGolfGame", CompactGolfGame)]
+
+
+def memory_per_game(factory, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [factory(4) for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) / count
+
+
+def rate(fn, count):
+    started = time.perf_counter()
+    fn(count)
+    return count / (time.perf_counter() - started)
+
+
+def create_games(factory):
+    def run(count):
+        for _ in range(count):
+            factory(4)
+    return run
+
+
+def play_moves(factory):
+    """Each move is a draw plus a swap or discard, like a server turn."""
+    compact = factory is CompactGolfGame
+
+    def run(count):
+        game = factory(4)
+        for move in range(count):
+            seat = game.current_player
+            card = game.draw_code() if compact else game.draw_card()
+            if card is None:
+                game = factory(4)
+                continue
+            game.add_card(seat, card)
+            if move % 2:
+                hand = game.hands[seat] if compact else game.players_cards[seat]
+                game.swap_card(seat, hand[0], card)
+            else:
+                game.discard_card(seat, card)
+            game.end_turn()
+    return run
+
+
+def score_games(factory):
+    server = GameServer(serve=False)
+    game = factory(4)
+    if factory is SixCardGolfGame:
+        return lambda count: [server.calculate_scores(game) for _ in range(count)]
+    return lambda count: [game.calculate_scores() for _ in range(count)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'engine':<18}{'bytes/game':>12}{'creates/s':>12}{'moves/s':>12}{'scores/s':>12}")
+    for name, factory in ENGINES:
+        print(f"{name:<18}{memory_per_game(factory, count):>12.0f}"
+              f"{rate(create_games(factory), count):>12.0f}"
+              f"{rate(play_moves(factory), count * 5):>12.0f}"
+              f"{rate(score_games(factory), count * 5):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
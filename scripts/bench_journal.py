@@ -0,0 +1,96 @@
+"""Measure move-journal write overhead per move and recovery time for a large journal.
+
+Plays draw+swap turns on many tables through GameManager, first without a
+journal and then with one, and reports the extra cost per move. Then rebuilds
+every table from the journal (and from one written without snapshots) and
+checks the rebuilt tables match the live ones.
+
+Usage: python bench_journal.py [moves] [journal file]
+"""
+import os
+import sys
+import tempfile
+import time
+from compact_game import CompactGolfGame
+from game_manager import GameManager
+from journal import Journal, recover
+
+TURNS_PER_TABLE = 39  # 52 cards - 12 dealt - 1 discard
+
+
+def play(manager, moves):
+    """Create 2-player tables and play draw+swap turns until `moves` moves are made."""
+    made = 0
+    while made < moves:
+        table = manager.create_table("alice", ["alice", "bob"], 9)
+        for turn in range(TURNS_PER_TABLE):
+            if made >= moves:
+                break
+            player = table.players[table.game.current_player - 1]
+            card = table.draw_card(player)["card"]
+            table.swap_card(player, table.hand(player)[turn % 6], card)
+            made += 2
+    return made
+
+
+def run(moves, journal=None):
+    manager = GameManager(CompactGolfGame)
+    if journal is not None:
+        manager.use_journal(journal)
+    started = time.perf_counter()
+    made = play(manager, moves)
+    elapsed = time.perf_counter() - started
+    return manager, made, elapsed
+
+
+def check(manager, tables):
+    assert set(tables) == set(manager.tables)
+    for game_id, table in tables.items():
+        live = manager.tables[game_id]
+        assert table.version == live.version
+        assert table.game.players_cards == live.game.players_cards
+        assert table.game.get_top_discard_card() == live.game.get_top_discard_card()
+        assert table.game.current_player == live.game.current_player
+
+
+def main():
+    moves = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    directory = tempfile.mkdtemp()
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(directory, "moves.journal")
+    plain_path = os.path.join(directory, "plain.journal")
+
+    _, made, base = run(moves)
+    print(f"{made} moves without a journal: {base / made * 1e6:.2f} us/move")
+
+    journal = Journal(path)
+    manager, made, elapsed = run(moves, journal)
+    started = time.perf_counter()
+    journal.close()
+    final_commit = time.perf_counter() - started
+    metrics = journal.metrics()
+    print(f"{made} moves with a journal:    {elapsed / made * 1e6:.2f} us/move "
+          f"(+{(elapsed - base) / made * 1e6:.2f} us), final commit {final_commit * 1000:.1f} ms")
+    print(f"  {metrics['records']} records, {metrics['bytes'] / 1e6:.1f} MB "
+          f"({metrics['bytes'] / made:.1f} bytes/move), {metrics['commits']} fsynced commits")
+
+    started = time.perf_counter()
+    tables, stats = recover(path, CompactGolfGame)
+    elapsed = time.perf_counter() - started
+    check(manager, tables)
+    print(f"Recovery with snapshots every {journal.snapshot_interval} versions: {elapsed:.2f}s for "
+          f"{stats['records']} records, {stats['tables']} tables, {stats['moves_replayed']} moves replayed")
+
+    plain = Journal(plain_path, snapshot_interval=0)
+    manager, _, _ = run(moves, plain)
+    plain.close()
+    started = time.perf_counter()
+    tables, stats = recover(plain_path, CompactGolfGame)
+    elapsed = time.perf_counter() - started
+    check(manager, tables)
+    print(f"Recovery without snapshots:                {elapsed:.2f}s for "
+          f"{stats['records']} records, {stats['moves_replayed']} moves replayed")
+    os.remove(plain_path)
+
+
+if __name__ == "__main__":
+    main()
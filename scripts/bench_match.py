@@ -0,0 +1,121 @@
+"""Play complete 9-hole matches on many concurrent tables through GameServer's move handlers.
+
+Every turn is a draw followed by a discard of the drawn card or a swap, so
+each hole ends when the deck runs out and the server scores it, rotates
+the dealer and redeals, until the match's final_result. Worker threads
+each own a slice of the tables, as in bench_tables.py.
+
+"incremental" is the server as it is: each move updates the moving seat's
+score and the delta carries it. "rescan" adds what live standings would
+cost without that, a full calculate_scores() after every move. Before
+timing, a few matches are checked move by move against a full rescan.
+
+Usage: python bench_match.py [threads] [holes]
+"""
+import sys
+import threading
+import time
+from server import GameServer
+
+TABLE_COUNTS = [1, 100, 1000]
+PLAYERS = 4
+
+
+def new_tables(server, count, holes):
+    tables = []
+    for index in range(count):
+        players = [f"m{index}x{seat}" for seat in range(PLAYERS)]
+        tables.append(server.game_manager.create_table(players[0], players, holes))
+    return tables
+
+
+def play_turn(server, table, turn):
+    """One turn at a table; returns the moves made, or 0 once its match is over."""
+    if table.match_over():
+        return 0
+    player = table.players[table.game.current_player - 1]
+    hole = table.hole
+    server.handle_draw_card(player)
+    if table.hole != hole:
+        return 1
+    hand = table.hand(player)
+    drawn = hand[-1]
+    if turn % 2:
+        response = server.handle_swap_card(player, hand[0], drawn)
+    else:
+        response = server.handle_discard_card(player, drawn)
+    assert response["status"] == "SUCCESS", response
+    return 2
+
+
+def worker(server, tables, rescan, ready, counts):
+    ready.wait()
+    moves = 0
+    turn = 0
+    live = list(tables)
+    while live:
+        turn += 1
+        still_live = []
+        for table in live:
+            made = play_turn(server, table, turn)
+            if made:
+                moves += made
+                if rescan:
+                    server.calculate_scores(table.game)
+                still_live.append(table)
+        live = still_live
+    counts.append(moves)
+
+
+def check(holes):
+    """Play a few matches, comparing the incremental scores with a full rescan after every move."""
+    server = GameServer(serve=False)
+    for table in new_tables(server, 5, holes):
+        turn = 0
+        last_hole = 1
+        while not table.match_over():
+            turn += 1
+            play_turn(server, table, turn)
+            if table.match_over():
+                break
+            assert table.scores == server.calculate_scores(table.game), (table.game_id, turn)
+            if table.hole != last_hole:
+                expected = (last_hole % PLAYERS) + 1
+                assert table.game.current_player == expected, (table.game_id, table.hole)
+                last_hole = table.hole
+        assert table.hole == holes + 1 and server.game_manager.get(table.game_id) is None
+
+
+def run(table_count, threads, holes, rescan):
+    server = GameServer(serve=False)
+    tables = new_tables(server, table_count, holes)
+    thread_count = min(threads, table_count)
+    ready = threading.Barrier(thread_count + 1)
+    counts = []
+    workers = [threading.Thread(target=worker, args=(server, tables[t::thread_count], rescan, ready, counts))
+               for t in range(thread_count)]
+    for w in workers:
+        w.start()
+    ready.wait()
+    started = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    assert all(table.match_over() for table in tables)
+    return table_count / elapsed, sum(counts) / elapsed
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    holes = int(sys.argv[2]) if len(sys.argv) > 2 else 9
+    check(holes)
+    print(f"{PLAYERS}-player {holes}-hole matches, {threads} threads; incremental scores match a full rescan")
+    print(f"{'tables':>8}{'matches/s':>12}{'moves/s':>12}{'rescan moves/s':>17}")
+    for table_count in TABLE_COUNTS:
+        matches, moves = run(table_count, threads, holes, False)
+        _, rescan_moves = run(table_count, threads, holes, True)
+        print(f"{table_count:>8}{matches:>12,.1f}{moves:>12,.0f}{rescan_moves:>17,.0f}")
+
+
+if __name__ == "__main__":
+    main()
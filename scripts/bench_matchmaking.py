@@ -0,0 +1,69 @@
+"""Drive MatchmakingQueue with bursty arrivals and report tables/sec and time-to-table.
+
+Arrivals come in bursts spread over all (size, holes) buckets; a background
+scheduler thread forms tables into a GameManager while players keep arriving.
+A few players cancel, and a short timeout lets stragglers expire.
+
+Usage: python bench_matchmaking.py [players] [burst]
+"""
+import random
+import sys
+import time
+from game_manager import GameManager
+from matchmaking import HOLE_COUNTS, TABLE_SIZES, MatchmakingQueue
+from player_registry import PlayerRegistry
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    burst = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(0)
+    registry = PlayerRegistry()
+    manager = GameManager()
+    names = [f"p{i}" for i in range(players)]
+    for name in names:
+        registry.register(name, "10.0.0.1", 7501, 7502)
+
+    def form_table(requests):
+        seated = [request.player for request in requests]
+        table = manager.create_table(seated[0], seated, requests[0].holes)
+        registry.seat(seated, table.game_id)
+
+    def on_expired(request):
+        registry.release([request.player])
+
+    queue = MatchmakingQueue(form_table, on_expired, timeout=0.5)
+    queue.start()
+    # Most players want 4-player 9-hole tables; the rest spread thin.
+    buckets = [(size, holes) for size in TABLE_SIZES for holes in HOLE_COUNTS]
+    weights = [20 if bucket == (4, 9) else 1 for bucket in buckets]
+
+    started = time.perf_counter()
+    for offset in range(0, players, burst):
+        for name in names[offset:offset + burst]:
+            size, holes = rng.choices(buckets, weights)[0]
+            registry.reserve(name)
+            queue.enqueue(name, size, holes)
+            if rng.random() < 0.01 and queue.cancel(name):
+                registry.release([name])
+        time.sleep(0.005)
+    enqueue_time = time.perf_counter() - started
+
+    while queue.metrics()["waiting"]:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    metrics = queue.metrics()
+    seated = sum(len(table.players) for table in manager.tables.values())
+    assert seated + metrics["expired"] + metrics["cancelled"] == players
+    assert registry.free_count() == metrics["expired"] + metrics["cancelled"]
+    print(f"{players} players in bursts of {burst}: enqueued in {enqueue_time:.2f}s")
+    print(f"  tables formed: {metrics['tables_formed']}  ({metrics['tables_formed'] / enqueue_time:,.0f} tables/sec "
+          f"during arrivals), {seated} players seated")
+    print(f"  cancelled: {metrics['cancelled']}  expired: {metrics['expired']}  drained after {elapsed:.2f}s")
+    print(f"  time to table: p50 {metrics['time_to_table_ms']['p50']:.1f} ms, "
+          f"p99 {metrics['time_to_table_ms']['p99']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Compare tracker-relayed and peer-hosted play on localhost: tracker CPU and move latency.
+
+The same tables of bots play in both modes against an async tracker:
+
+    tracker  every move goes to the tracker, which fans the deltas out
+    peer     the dealer's bot hosts the table on its p_port (peer.PeerHost)
+             and the others send their moves there; the tracker only sees
+             the hole_result and end when the hole is over
+
+Each bot takes its turns (draw, then discard the drawn card); then the
+dealer ends the game. Tracker CPU is read from /proc for the tracker
+process over the game phase only (matchmaking to end), so registration is
+not counted. Move latency is send-to-reply for the non-dealers' moves,
+which cross a socket in both modes; a peer host's own moves are local
+calls and are reported separately.
+
+Usage: python bench_peer.py [tables] [turns per player]
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from loadgen import name_for, percentile
+from peer import PeerHost, PeerLink, host_address
+from protocol import ConnectionClosed, MessageReader, send_message
+
+HOST = "127.0.0.1"
+PORT = 7740
+TABLE_SIZE = 4
+FIRST_P_PORT = 7501
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process, from /proc/<pid>/stat."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def spawn_tracker(peer_tables):
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = ("import asyncio; from async_server import AsyncGameServer; "
+            f"asyncio.run(AsyncGameServer({HOST!r}, {PORT}, peer_tables={peer_tables}).serve_forever())")
+    env = dict(os.environ, GOLF_LOG_LEVEL="ERROR")
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=here, env=env)
+    for _ in range(200):
+        try:
+            socket.create_connection((HOST, PORT), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Tracker did not start.")
+
+
+class TableSync:
+    """Lets a table's dealer wait until every bot has taken its turns."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = 0
+        self.all_done = threading.Event()
+
+    def finish(self):
+        with self.lock:
+            self.done += 1
+            if self.done == TABLE_SIZE:
+                self.all_done.set()
+
+
+class Bot:
+    def __init__(self, index, bench):
+        self.bench = bench
+        self.name = name_for(index)
+        self.p_port = FIRST_P_PORT + index
+        self.sock = socket.create_connection((HOST, PORT))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = MessageReader(self.sock)
+        self.send_lock = threading.Lock()
+        self.changed = threading.Condition()
+        self.seat = None
+        self.current_player = None
+        self.drawn = None
+        self.link = None
+        self.host = None
+
+    def send(self, message):
+        with self.send_lock:
+            send_message(self.sock, message)
+
+    def observe(self, message):
+        """Track whose turn it is and what this bot drew, from a broadcast."""
+        with self.changed:
+            kind = message.get("type")
+            if kind == "game_state":
+                for seat, name in message["players"].items():
+                    if name == self.name:
+                        self.seat = seat
+                self.current_player = message["current_player"]
+            elif kind == "delta":
+                if message["op"] == "draw" and message["seat"] == self.seat:
+                    self.drawn = message["card"]
+                if "current_player" in message:
+                    self.current_player = message["current_player"]
+            self.changed.notify_all()
+
+    def request(self, reader, send, message):
+        """Send message and return its reply, observing any broadcasts read on the way."""
+        send(message)
+        while True:
+            reply = reader.recv()
+            if "type" not in reply:
+                return reply
+            self.observe(reply)
+
+    def read_until(self, reader, condition):
+        while not condition():
+            message = reader.recv()
+            if "type" in message:
+                self.observe(message)
+                if message["type"] == "matched":
+                    return message
+
+    def register(self):
+        reply = self.request(self.reader, self.send, {"type": "register", "name": self.name, "ipv4": HOST,
+                                                      "t_port": 7501, "p_port": self.p_port})
+        assert reply["status"] == "SUCCESS", reply
+
+    def play(self):
+        bench = self.bench
+        self.request(self.reader, self.send, {"type": "matchmake", "player": self.name, "size": TABLE_SIZE,
+                                              "holes": 1})
+        matched = self.read_until(self.reader, lambda: False)
+        sync = bench.sync_for(matched["game_id"])
+        dealer = matched["dealer"]
+
+        if "host" not in matched:
+            reader, send = self.reader, self.send
+            latencies = bench.tracker_moves
+        elif matched["host"] == self.name:
+            players = [info["name"] for info in matched["players"]]
+            self.host = PeerHost(matched["game_id"], self.name, players, matched["holes"], self.p_port,
+                                 self.send, on_message=self.observe, host=HOST).start()
+            reader = None
+            latencies = bench.local_moves
+        else:
+            ipv4, p_port = host_address(matched)
+            self.link = PeerLink(ipv4, p_port, matched["game_id"], self.name)
+            reader, send = self.link.reader, self.link.send
+            latencies = bench.peer_moves
+            reply = reader.recv()
+            assert reply["status"] == "SUCCESS", reply
+
+        for _ in range(bench.turns):
+            self.wait_for(reader, lambda: self.seat is not None and self.current_player == self.seat)
+            self.drawn = None
+            started = time.perf_counter()
+            self.move(reader, send if reader else None, {"type": "draw_card", "player": self.name})
+            latencies.append(time.perf_counter() - started)
+            self.wait_for(reader, lambda: self.drawn is not None)
+            started = time.perf_counter()
+            reply = self.move(reader, send if reader else None,
+                              {"type": "discard_card", "player": self.name, "card": self.drawn})
+            latencies.append(time.perf_counter() - started)
+            assert reply["status"] == "SUCCESS", reply
+        sync.finish()
+
+        if self.name == dealer:
+            sync.all_done.wait()
+            if self.host is not None:
+                # Reports hole_result and end to the tracker; wait for both replies.
+                self.host.end_hole()
+                for _ in range(2):
+                    reply = self.reader.recv()
+                    assert reply["status"] == "SUCCESS", reply
+            else:
+                reply = self.request(self.reader, self.send, {"type": "end", "game_id": matched["game_id"],
+                                                              "player": self.name})
+                assert reply["status"] == "SUCCESS", reply
+        if self.link is not None:
+            # Stay joined until the host has sent the result, so it is not writing to a closed link.
+            message = {}
+            try:
+                while message.get("type") != "final_result":
+                    message = reader.recv()
+            except ConnectionClosed:
+                pass
+            self.link.close()
+
+    def move(self, reader, send, message):
+        if reader is None:
+            return self.host.move(self.name, message)
+        return self.request(reader, send, message)
+
+    def wait_for(self, reader, condition):
+        if reader is None:
+            # The host's own state arrives through on_message from the peers' threads.
+            with self.changed:
+                self.changed.wait_for(condition, timeout=30)
+            return
+        while not condition():
+            message = reader.recv()
+            if "type" in message:
+                self.observe(message)
+
+
+class Bench:
+    def __init__(self, tables, turns):
+        self.tables = tables
+        self.turns = turns
+        self.syncs = {}
+        self.lock = threading.Lock()
+        self.tracker_moves = []
+        self.peer_moves = []
+        self.local_moves = []
+
+    def sync_for(self, game_id):
+        with self.lock:
+            return self.syncs.setdefault(game_id, TableSync())
+
+
+def run(peer_tables, tables, turns):
+    tracker = spawn_tracker(peer_tables)
+    try:
+        bench = Bench(tables, turns)
+        bots = [Bot(i, bench) for i in range(tables * TABLE_SIZE)]
+        for bot in bots:
+            bot.register()
+        cpu_before = cpu_seconds(tracker.pid)
+        started = time.perf_counter()
+        errors = []
+
+        def play(bot):
+            try:
+                bot.play()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=play, args=(bot,)) for bot in bots]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        cpu = cpu_seconds(tracker.pid) - cpu_before
+        for bot in bots:
+            bot.sock.close()
+        return bench, elapsed, cpu, errors
+    finally:
+        tracker.terminate()
+        tracker.wait()
+
+
+def main():
+    tables = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    if tables * TABLE_SIZE > 499:
+        sys.exit("At most 124 tables: every bot needs its own p_port in 7501-7999.")
+    moves = tables * TABLE_SIZE * turns * 2
+    print(f"{tables} tables of {TABLE_SIZE}, {turns} turns each: {moves} moves per mode")
+    print(f"{'mode':<9}{'wall s':>8}{'tracker CPU s':>15}{'us/move':>9}   move latency ms p50 / p99")
+    for peer_tables in (False, True):
+        bench, elapsed, cpu, errors = run(peer_tables, tables, turns)
+        remote = sorted(bench.peer_moves if peer_tables else bench.tracker_moves)
+        line = (f"{'peer' if peer_tables else 'tracker':<9}{elapsed:>8.2f}{cpu:>15.2f}{cpu / moves * 1e6:>9.0f}"
+                f"   via {'host' if peer_tables else 'tracker'}: {percentile(remote, 50) * 1000:.2f} / "
+                f"{percentile(remote, 99) * 1000:.2f}")
+        if peer_tables:
+            local = sorted(bench.local_moves)
+            line += f"; host's own: {percentile(local, 50) * 1000:.3f} / {percentile(local, 99) * 1000:.3f}"
+        print(line)
+        if errors:
+            print(f"  {len(errors)} bots failed, e.g. {errors[0]!r}")
+
+
+if __name__ == "__main__":
+    main()
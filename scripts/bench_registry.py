@@ -0,0 +1,102 @@
+"""Stress PlayerRegistry with 100k players and concurrent register/deregister/query/claim traffic.
+
+Also times the old full-scan free-player selection for comparison.
+Usage: python bench_registry.py [players] [seconds]
+"""
+import random
+import sys
+import threading
+import time
+from player_registry import PlayerRegistry
+
+
+def name_for(i):
+    letters = []
+    i += 1
+    while i:
+        i, rem = divmod(i - 1, 26)
+        letters.append(chr(97 + rem))
+    return "".join(reversed(letters))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def churn(registry, base, deadline, counts):
+    ops = 0
+    i = 0
+    while time.perf_counter() < deadline:
+        name = name_for(base + i % 1000)
+        registry.register(name, "10.0.0.1", 7501, 7502)
+        registry.deregister(name)
+        ops += 2
+        i += 1
+    counts["churn"] += ops
+
+
+def matchmaker(registry, deadline, counts, latencies):
+    ops = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        dealer = registry.free.items[random.randrange(registry.free_count())] if registry.free_count() else None
+        players = registry.claim(dealer, 3) if dealer else None
+        latencies.append(time.perf_counter() - started)
+        if players:
+            registry.assign_game(players, "game")
+            registry.release(players)
+        ops += 1
+    counts["claim"] += ops
+
+
+def querier(registry, deadline, counts, latencies):
+    ops = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        registry.snapshot()
+        latencies.append(time.perf_counter() - started)
+        ops += 1
+    counts["query"] += ops
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    registry = PlayerRegistry()
+    started = time.perf_counter()
+    for i in range(players):
+        registry.register(name_for(i), "10.0.0.1", 7501, 7502)
+    print(f"Registered {players} players in {time.perf_counter() - started:.2f}s")
+
+    # The old start_game path: scan every player to build the free list.
+    legacy = {name: dict(record) for name, record in registry.snapshot()}
+    started = time.perf_counter()
+    for _ in range(20):
+        free = [p for p in legacy if legacy[p].get("status") == "free"]
+        random.sample(free, 3)
+    print(f"Full-scan free-player pick: {(time.perf_counter() - started) / 20 * 1000:.2f} ms")
+
+    counts = {"churn": 0, "claim": 0, "query": 0}
+    claim_latencies = []
+    query_latencies = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=churn, args=(registry, players + 1000 * t, deadline, counts)) for t in range(2)]
+    threads += [threading.Thread(target=matchmaker, args=(registry, deadline, counts, claim_latencies)) for _ in range(2)]
+    threads += [threading.Thread(target=querier, args=(registry, deadline, counts, query_latencies))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"register/deregister: {counts['churn'] / seconds:>10.0f} ops/s")
+    print(f"claim + release:     {counts['claim'] / seconds:>10.0f} ops/s  "
+          f"p50 {percentile(claim_latencies, 50) * 1e6:.1f} us  p99 {percentile(claim_latencies, 99) * 1e6:.1f} us")
+    print(f"full query:          {counts['query'] / seconds:>10.0f} ops/s  "
+          f"p50 {percentile(query_latencies, 50) * 1000:.2f} ms  p99 {percentile(query_latencies, 99) * 1000:.2f} ms")
+    assert len(registry) == players and registry.free_count() == players
+
+
+if __name__ == "__main__":
+    main()
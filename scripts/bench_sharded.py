@@ -0,0 +1,92 @@
+"""Measure how game throughput scales with the worker count of sharded_server.py.
+
+For each worker count a sharded server is started on localhost and driven
+by several loadgen.py processes at once, since one client process cannot
+load more than one core. The single-process async server under the same
+load is the baseline. Throughput is moves (draw_card + discard_card) per
+second over the slowest generator's run time.
+
+Scaling stops at the core count: the front, the workers and the load
+generators all share the machine's cores.
+
+Usage: python bench_sharded.py [clients per generator] [generators] [max workers]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from loadgen import spawn_server
+
+HOST = "127.0.0.1"
+FIRST_PORT = 7730
+
+
+def drive(port, clients, generators, workdir):
+    """Run generators loadgen processes against host:port; returns (moves/sec, commands, errors)."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    outputs = [os.path.join(workdir, f"gen{i}.json") for i in range(generators)]
+    processes = [subprocess.Popen([sys.executable, os.path.join(here, "loadgen.py"), "run", "--host", HOST,
+                                   "--port", str(port), "--clients", str(clients),
+                                   "--name-offset", str(i * clients), "--holes", str(1 + i % 9),
+                                   "--out", outputs[i]],
+                                  stdout=subprocess.DEVNULL)
+                 for i in range(generators)]
+    for process in processes:
+        process.wait()
+    moves = 0
+    commands = 0
+    errors = 0
+    duration = 0.0
+    for path in outputs:
+        with open(path) as f:
+            report = json.load(f)
+        duration = max(duration, report["duration_s"])
+        for command, stats in report["commands"].items():
+            commands += stats["count"]
+            errors += round(stats["error_rate"] * stats["count"])
+            if command in ("draw_card", "discard_card"):
+                moves += stats["count"]
+        errors += sum(report["aborted"].values())
+    return moves / duration, commands, errors
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    generators = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, os.cpu_count() // 2)
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else max(2, os.cpu_count())
+    worker_counts = []
+    n = 1
+    while n <= max_workers:
+        worker_counts.append(n)
+        n *= 2
+    if worker_counts[-1] != max_workers:
+        worker_counts.append(max_workers)
+
+    os.environ.setdefault("GOLF_LOG_LEVEL", "ERROR")
+    workdir = tempfile.mkdtemp()
+    print(f"{os.cpu_count()} cores; {generators} load generators x {clients} clients, 4-player tables")
+    print(f"{'server':<18}{'moves/sec':>12}{'speedup':>10}{'efficiency':>12}{'commands':>10}{'errors':>8}")
+    runs = [("async", None)] + [("sharded", workers) for workers in worker_counts]
+    base = None
+    for i, (kind, workers) in enumerate(runs):
+        port = FIRST_PORT + i
+        server = spawn_server(kind, HOST, port, workers)
+        try:
+            rate, commands, errors = drive(port, clients, generators, workdir)
+        finally:
+            server.terminate()
+            server.wait()
+        label = kind if workers is None else f"sharded x{workers}"
+        if workers is None:
+            print(f"{label:<18}{rate:>12,.0f}{'':>22}{commands:>10}{errors:>8}")
+            continue
+        if base is None:
+            base = rate
+        note = "  (more workers than cores)" if workers > os.cpu_count() else ""
+        print(f"{label:<18}{rate:>12,.0f}{rate / base:>9.2f}x{rate / base / workers:>11.0%}"
+              f"{commands:>10}{errors:>8}{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""Soak the async tracker with churning connections; memory should stay flat and broadcasts prompt.
+
+A resident population of registered clients pings the tracker every third
+of its idle timeout. Every second some residents leave and as many new
+ones connect and register, so the population stays the same size while
+its members change. A leaving resident either
+
+    closes   closes its socket
+    aborts   resets its socket (no FIN)
+    silent   stops pinging but keeps its socket open, for the reaper to find
+
+and one new pair of players per second is seated at a table and then goes
+silent, so the reaper has to end the table and free its seats as well.
+Probe tables play on throughout: the latency of a draw is the time from
+sending it to the other player receiving its delta. Ping round trips are
+timed too.
+
+Every sample prints the tracker's RSS (from /proc) and its connection,
+player, table and eviction counts (from its metrics endpoint), with the
+latencies of the sample window. The summary compares the first sample
+after warm-up with the last.
+
+The full soak is 50k connections for an hour:
+
+    python bench_soak.py 50000 3600
+
+which needs an open-file limit above 50k for each process. The defaults
+are sized for a small machine.
+
+Usage: python bench_soak.py [connections] [seconds] [churn per second] [idle timeout]
+"""
+import asyncio
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import deque
+from loadgen import name_for, percentile
+from protocol import MAX_FRAME_SIZE, decode_payload, encode_message, frame_length
+
+HOST = "127.0.0.1"
+PORT = 7750
+METRICS_PORT = 9750
+PROBE_TABLES = 20
+SAMPLE_EVERY = 10.0
+WARM_UP_SAMPLES = 2
+CONNECT_CONCURRENCY = 200
+TIMEOUT = 10.0
+LEAVE_KINDS = ("close", "abort", "silent")
+GAUGES = ("golf_connections", "golf_players", "golf_tables", "golf_idle_evictions")
+
+
+def spawn_tracker(idle_timeout, max_connections):
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = ("import asyncio; from async_server import AsyncGameServer; "
+            f"asyncio.run(AsyncGameServer({HOST!r}, {PORT}, max_connections={max_connections}, metrics_port={METRICS_PORT}, "
+            f"idle_timeout={idle_timeout}).serve_forever())")
+    env = dict(os.environ, GOLF_LOG_LEVEL="ERROR")
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=here, env=env)
+    for _ in range(200):
+        try:
+            socket.create_connection((HOST, PORT), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Tracker did not start.")
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def tracker_gauges():
+    with urllib.request.urlopen(f"http://{HOST}:{METRICS_PORT}/metrics", timeout=TIMEOUT) as response:
+        text = response.read().decode()
+    values = {}
+    for line in text.splitlines():
+        name, _, value = line.partition(" ")
+        if name in GAUGES:
+            values[name] = float(value)
+    return values
+
+
+class SoakClient:
+    def __init__(self, name):
+        self.name = name
+        self.pending = deque()
+        self.changed = asyncio.Event()
+        self.writer = None
+        self.read_task = None
+        self.ping_task = None
+        self.silent = False
+        self.closed = asyncio.Event()
+        self.seat = None
+        self.current_player = None
+        self.drawn = None
+        self.saw_draw = None
+        self.over = False
+
+    async def connect(self):
+        reader, self.writer = await asyncio.open_connection(HOST, PORT)
+        self.read_task = asyncio.get_running_loop().create_task(self.read_loop(reader))
+
+    async def read_loop(self, reader):
+        try:
+            while True:
+                header = await reader.readexactly(4)
+                message = decode_payload(await reader.readexactly(frame_length(header, MAX_FRAME_SIZE)))
+                if message is None or "type" not in message:
+                    if self.pending:
+                        future = self.pending.popleft()
+                        if not future.done():
+                            future.set_result(message)
+                else:
+                    self.on_broadcast(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in self.pending:
+                if not future.done():
+                    future.set_exception(ConnectionError("Tracker closed the connection."))
+            self.closed.set()
+            self.changed.set()
+
+    def on_broadcast(self, message):
+        kind = message["type"]
+        if kind == "game_state":
+            for seat, name in message["players"].items():
+                if name == self.name:
+                    self.seat = seat
+            self.current_player = message["current_player"]
+        elif kind == "delta":
+            if message["op"] == "draw":
+                if message["seat"] == self.seat:
+                    self.drawn = message["card"]
+                else:
+                    self.saw_draw = time.perf_counter()
+            if "current_player" in message:
+                self.current_player = message["current_player"]
+        elif kind in ("final_result", "game_abandoned"):
+            self.over = True
+        self.changed.set()
+
+    def send(self, message):
+        self.writer.write(encode_message(message))
+
+    async def request(self, message):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(future)
+        self.send(message)
+        return await asyncio.wait_for(future, TIMEOUT)
+
+    async def wait_until(self, condition):
+        deadline = time.perf_counter() + TIMEOUT
+        while not condition():
+            self.changed.clear()
+            if condition():
+                break
+            if self.closed.is_set():
+                raise ConnectionError("Tracker closed the connection.")
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def join(self, index):
+        await self.connect()
+        reply = await self.request({"type": "register", "name": self.name, "ipv4": HOST,
+                                    "t_port": 7501 + index % 400, "p_port": 7501 + index % 400})
+        if reply.get("status") != "SUCCESS":
+            raise ConnectionError(f"Registration failed: {reply}")
+
+    def go_silent(self):
+        self.silent = True
+        if self.ping_task is not None:
+            self.ping_task.cancel()
+
+    def close(self, abort=False):
+        self.go_silent()
+        if self.writer is not None:
+            if abort:
+                self.writer.transport.abort()
+            else:
+                self.writer.close()
+
+
+class Soak:
+    def __init__(self, connections, seconds, churn, idle_timeout):
+        self.connections = connections
+        self.seconds = seconds
+        self.churn = churn
+        self.idle_timeout = idle_timeout
+        self.heartbeat = idle_timeout / 3
+        self.next_name = 0
+        self.residents = []
+        self.connect_slots = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        # Probes queue one pair at a time, so each pair is matched with itself.
+        self.matching = asyncio.Lock()
+        self.pings = []
+        self.draws = []
+        self.eviction_delays = []
+        self.left = dict.fromkeys(LEAVE_KINDS, 0)
+        self.failures = {}
+        # Residents the tracker dropped although they kept pinging
+        self.dropped = {}
+        self.running = True
+
+    def count(self, counts, what, error):
+        key = f"{what} {type(error).__name__}"
+        counts[key] = counts.get(key, 0) + 1
+
+    def new_client(self):
+        client = SoakClient(name_for(self.next_name))
+        self.next_name += 1
+        return client
+
+    async def add_resident(self):
+        client = self.new_client()
+        try:
+            async with self.connect_slots:
+                await client.join(self.next_name)
+        except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+            self.count(self.failures, "join", e)
+            client.close(abort=True)
+            return
+        client.ping_task = asyncio.get_running_loop().create_task(self.ping(client))
+        self.residents.append(client)
+
+    async def ping(self, client):
+        await asyncio.sleep(random.uniform(0, self.heartbeat))
+        try:
+            # The flag as well as the cancel: wait_for can swallow a cancel that races its reply.
+            while not client.silent:
+                started = time.perf_counter()
+                await client.request({"type": "ping"})
+                self.pings.append(time.perf_counter() - started)
+                await asyncio.sleep(self.heartbeat)
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            if not client.silent:
+                self.count(self.dropped, "ping", e)
+
+    async def watch_eviction(self, client):
+        """Time from a client going silent to the tracker dropping it."""
+        started = time.monotonic()
+        client.go_silent()
+        try:
+            await asyncio.wait_for(client.closed.wait(), self.idle_timeout * 3)
+            self.eviction_delays.append(time.monotonic() - started)
+        except asyncio.TimeoutError as e:
+            self.count(self.failures, "eviction", e)
+        client.close()
+
+    async def seat_silent_pair(self):
+        """Seat two new players at a table, then let both go silent."""
+        pair = [self.new_client(), self.new_client()]
+        try:
+            for client in pair:
+                await client.join(self.next_name)
+            for client in pair:
+                await client.request({"type": "matchmake", "player": client.name, "size": 2, "holes": 2})
+            for client in pair:
+                await client.wait_until(lambda client=client: client.seat is not None)
+        except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+            self.count(self.failures, "seating", e)
+            for client in pair:
+                client.close(abort=True)
+            return
+        await asyncio.gather(*(self.watch_eviction(client) for client in pair))
+
+    def leave(self):
+        """One resident leaves in one of the LEAVE_KINDS ways."""
+        index = random.randrange(len(self.residents))
+        client = self.residents[index]
+        self.residents[index] = self.residents[-1]
+        self.residents.pop()
+        kind = random.choice(LEAVE_KINDS)
+        self.left[kind] += 1
+        if kind == "silent":
+            return asyncio.get_running_loop().create_task(self.watch_eviction(client))
+        client.close(abort=kind == "abort")
+        return None
+
+    async def churn_forever(self):
+        tasks = set()
+        while self.running:
+            await asyncio.sleep(1)
+            for _ in range(min(self.churn, len(self.residents))):
+                task = self.leave()
+                if task is not None:
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                task = asyncio.get_running_loop().create_task(self.add_resident())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            task = asyncio.get_running_loop().create_task(self.seat_silent_pair())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def probe(self):
+        """Play 1-hole tables between two clients for the whole soak, timing each draw's delta."""
+        pair = [self.new_client(), self.new_client()]
+        for client in pair:
+            await client.join(self.next_name)
+            # Pinging too, since a player can wait longer than the timeout for its turn at the queue.
+            client.ping_task = asyncio.get_running_loop().create_task(self.ping(client))
+        while self.running:
+            async with self.matching:
+                for client in pair:
+                    client.seat = None
+                    client.over = False
+                    await client.request({"type": "matchmake", "player": client.name, "size": 2, "holes": 1})
+                for client in pair:
+                    await client.wait_until(lambda client=client: client.seat is not None)
+            while self.running:
+                mover, other = pair if pair[0].current_player == pair[0].seat else pair[::-1]
+                mover.drawn = None
+                other.saw_draw = None
+                started = time.perf_counter()
+                mover.send({"type": "draw_card", "player": mover.name})
+                await mover.wait_until(lambda: mover.over or mover.drawn is not None)
+                await other.wait_until(lambda: other.over or other.saw_draw is not None)
+                if mover.over or other.over:
+                    break
+                self.draws.append(other.saw_draw - started)
+                await mover.request({"type": "discard_card", "player": mover.name, "card": mover.drawn})
+            for client in pair:
+                await client.wait_until(lambda client=client: client.over)
+
+    def sample(self, process, elapsed):
+        gauges = tracker_gauges()
+        pings, self.pings = sorted(self.pings), []
+        draws, self.draws = sorted(self.draws), []
+        row = {
+            "elapsed": elapsed,
+            "rss": rss_mb(process.pid),
+            "pings": pings,
+            "draws": draws,
+            **{name: int(gauges.get(name, 0)) for name in GAUGES},
+        }
+        print(f"{elapsed:>6.0f}{row['rss']:>9.1f}{row['golf_connections']:>8}{row['golf_players']:>8}"
+              f"{row['golf_tables']:>7}{row['golf_idle_evictions']:>9}"
+              f"{percentile(pings, 50) * 1000:>9.2f}{percentile(pings, 99) * 1000:>9.2f}"
+              f"{percentile(draws, 50) * 1000:>9.2f}{percentile(draws, 99) * 1000:>9.2f}{len(draws):>7}",
+              flush=True)
+        return row
+
+    async def run(self, process):
+        loop = asyncio.get_running_loop()
+        residents = self.connections - 2 * PROBE_TABLES
+        started = time.perf_counter()
+        await asyncio.gather(*(self.add_resident() for _ in range(residents)))
+        print(f"{len(self.residents)} residents registered in {time.perf_counter() - started:.1f}s; "
+              f"idle timeout {self.idle_timeout}s, heartbeat {self.heartbeat:.1f}s, churn {self.churn}/s")
+        probes = [loop.create_task(self.probe()) for _ in range(PROBE_TABLES)]
+        churn = loop.create_task(self.churn_forever())
+        print(f"{'sec':>6}{'rss MB':>9}{'conns':>8}{'players':>8}{'tables':>7}{'evicted':>9}"
+              f"{'ping p50':>9}{'p99':>9}{'draw p50':>9}{'p99':>9}{'draws':>7}   ms")
+        samples = []
+        started = time.perf_counter()
+        while time.perf_counter() - started < self.seconds:
+            await asyncio.sleep(SAMPLE_EVERY)
+            samples.append(await asyncio.to_thread(self.sample, process, time.perf_counter() - started))
+            for task in probes + [churn]:
+                if task.done() and task.exception() is not None:
+                    raise task.exception()
+        self.running = False
+        for task in probes + [churn]:
+            task.cancel()
+        await asyncio.gather(*probes, churn, return_exceptions=True)
+        for client in self.residents:
+            client.close()
+        return samples
+
+    def summary(self, samples):
+        if len(samples) <= WARM_UP_SAMPLES:
+            print("Too short for a summary; run for longer.")
+            return
+        first, last = samples[WARM_UP_SAMPLES], samples[-1]
+        peak = max(row["rss"] for row in samples[WARM_UP_SAMPLES:])
+        delays = sorted(self.eviction_delays)
+        print(f"left: {self.left}; failures: {self.failures or 'none'}; "
+              f"live residents dropped: {self.dropped or 'none'}")
+        print(f"eviction after going silent: p50 {percentile(delays, 50):.2f}s, "
+              f"max {delays[-1] if delays else 0:.2f}s (timeout {self.idle_timeout}s)")
+        print(f"rss after warm-up {first['rss']:.1f} MB, last {last['rss']:.1f} MB "
+              f"({last['rss'] - first['rss']:+.1f} MB), peak {peak:.1f} MB")
+        for key, label in (("draws", "draw->delta"), ("pings", "ping")):
+            print(f"{label} p99: first window {percentile(first[key], 99) * 1000:.2f} ms, "
+                  f"last {percentile(last[key], 99) * 1000:.2f} ms")
+
+
+def main():
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 120
+    churn = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    idle_timeout = float(sys.argv[4]) if len(sys.argv) > 4 else 6.0
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # Zombie pairs and connections on their way out come on top of the population.
+    wanted = connections + 4 * churn * int(idle_timeout) + 1000
+    if hard < wanted:
+        sys.exit(f"Open-file limit {hard} is too low for {connections} connections; raise it to {wanted}.")
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, wanted), hard))
+    process = spawn_tracker(idle_timeout, wanted)
+    soak = Soak(connections, seconds, churn, idle_timeout)
+    try:
+        soak.summary(asyncio.run(soak.run(process)))
+    finally:
+        process.kill()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
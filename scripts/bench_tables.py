@@ -0,0 +1,76 @@
+"""Drive N concurrent GameManager tables with scripted moves and report moves/sec.
+
+Worker threads each own a slice of the tables, so the only shared lock is the
+manager's create/remove lock when a finished table is replaced.
+Usage: python bench_tables.py [seconds] [threads]
+"""
+import sys
+import threading
+import time
+from game_manager import GameManager
+
+TABLE_COUNTS = [1, 10, 100, 1000, 10000]
+
+
+def new_table(manager, index):
+    players = [f"p{index}x{seat}" for seat in range(4)]
+    return manager.create_table(players[0], players, 9)
+
+
+def play_move(table, turn):
+    """One scripted turn: draw, then alternate between swapping and discarding."""
+    player = table.players[table.game.current_player - 1]
+    drawn = table.draw_card(player).get("card")
+    if drawn is None:
+        return 1, False
+    if turn % 2:
+        response = table.swap_card(player, table.hand(player)[0], drawn)
+    else:
+        response = table.discard_card(player, drawn)
+    assert response["status"] == "SUCCESS", response
+    return 2, True
+
+
+def worker(manager, indexes, seconds, ready, counts):
+    tables = [new_table(manager, i) for i in indexes]
+    ready.wait()
+    deadline = time.perf_counter() + seconds
+    moves = 0
+    turn = 0
+    while time.perf_counter() < deadline:
+        turn += 1
+        for slot, table in enumerate(tables):
+            made, alive = play_move(table, turn)
+            moves += made
+            if not alive:
+                manager.remove_table(table.game_id)
+                tables[slot] = new_table(manager, indexes[slot])
+    counts.append(moves)
+
+
+def run(table_count, seconds, threads):
+    manager = GameManager()
+    counts = []
+    thread_count = min(threads, table_count)
+    ready = threading.Barrier(thread_count)
+    workers = [
+        threading.Thread(target=worker, args=(manager, range(t, table_count, threads), seconds, ready, counts))
+        for t in range(thread_count)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sum(counts) / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f"{'tables':>8}{'moves/sec':>14}")
+    for table_count in TABLE_COUNTS:
+        print(f"{table_count:>8}{run(table_count, seconds, threads):>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
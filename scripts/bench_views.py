@@ -0,0 +1,213 @@
+"""Check that clients polling the lobby views leave gameplay latency on the async tracker alone.
+
+Gameplay is loadgen.py's game scenario with 2-player tables, so 2 * tables
+clients keep about `tables` tables in play. It runs once on its own and
+then again while the pollers poll: each poller asks for a page of the
+lobby, the game list or the leaderboard in turn, once every poll interval.
+The pollers run in their own processes and only read the reply frames,
+so they load the tracker and not the gameplay generator.
+
+loadgen.compare() then prints the change in each gameplay command's
+throughput and latency; the benchmark exits with status 1 if any of them
+regresses past the threshold. The tracker's golf_views gauges show how
+many pages were encoded against how many were served.
+
+The full run is 10k pollers against 1k tables:
+
+    python bench_views.py 10000 1000
+
+which needs an open-file limit above 12k for the tracker. With more than
+one core the tracker gets a core to itself and the pollers and the
+generator share the rest; on a single core the pollers' own CPU shows up
+as gameplay latency too.
+
+Usage: python bench_views.py [pollers] [tables] [poll interval] [threshold %]
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from loadgen import compare, percentile
+from protocol import encode_message, frame_length
+
+HOST = "127.0.0.1"
+PORT = 7760
+METRICS_PORT = 9760
+POLLERS_PER_PROCESS = 5000
+CONNECT_CONCURRENCY = 200
+TIMEOUT = 10.0
+TURNS = 15
+QUERIES = [encode_message({"type": command, "page": page})
+           for command in ("query_players", "query_games", "leaderboard") for page in range(3)]
+
+
+def spawn_tracker(max_connections):
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = ("import asyncio; from async_server import AsyncGameServer; from metrics import configure_logging; "
+            f"configure_logging(); asyncio.run(AsyncGameServer({HOST!r}, {PORT}, max_connections={max_connections}, "
+            f"metrics_port={METRICS_PORT}).serve_forever())")
+    env = dict(os.environ, GOLF_LOG_LEVEL="ERROR")
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=here, env=env)
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) > 1:
+        # This process, its pollers and the generators it starts keep the other cores.
+        os.sched_setaffinity(process.pid, {cores[0]})
+        os.sched_setaffinity(0, cores[1:])
+    for _ in range(200):
+        try:
+            socket.create_connection((HOST, PORT), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Tracker did not start.")
+
+
+def view_gauges():
+    with urllib.request.urlopen(f"http://{HOST}:{METRICS_PORT}/metrics", timeout=TIMEOUT) as response:
+        text = response.read().decode()
+    values = {}
+    for line in text.splitlines():
+        name, _, value = line.partition(" ")
+        if name.startswith("golf_views_"):
+            values[name[len("golf_views_"):]] = int(float(value))
+    return values
+
+
+def play(tables, name_offset, out):
+    """Run one loadgen game scenario with tables 2-player tables; returns its JSON report."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run([sys.executable, os.path.join(here, "loadgen.py"), "run", "--host", HOST, "--port", str(PORT),
+                    "--clients", str(2 * tables), "--size", "2", "--holes", "1", "--turns", str(TURNS),
+                    "--name-offset", str(name_offset), "--out", out],
+                   check=True, stdout=subprocess.DEVNULL)
+    with open(out) as f:
+        return json.load(f)
+
+
+# Pollers
+
+async def poll(reader, writer, interval, latencies, errors, stopping):
+    # Spread the pollers over the interval instead of having them poll in step.
+    await asyncio.sleep(random.uniform(0, interval))
+    try:
+        while not stopping.is_set():
+            started = time.perf_counter()
+            writer.write(random.choice(QUERIES))
+            try:
+                header = await asyncio.wait_for(reader.readexactly(4), TIMEOUT)
+                await reader.readexactly(frame_length(header))
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                errors.append(1)
+                return
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            await asyncio.sleep(max(0.0, interval - elapsed))
+    finally:
+        writer.close()
+
+
+async def run_pollers(count, interval, ready, stop):
+    latencies = []
+    errors = []
+    stopping = asyncio.Event()
+    slots = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def start_one():
+        async with slots:
+            reader, writer = await asyncio.open_connection(HOST, PORT)
+        return asyncio.get_running_loop().create_task(poll(reader, writer, interval, latencies, errors, stopping))
+
+    tasks = await asyncio.gather(*(start_one() for _ in range(count)))
+    # Let every poller connect before the gameplay run starts.
+    await asyncio.sleep(interval)
+    ready.set()
+    while not stop.is_set():
+        await asyncio.sleep(0.1)
+    stopping.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return latencies, len(errors)
+
+
+def poller_process(count, interval, ready, stop, results):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    latencies, errors = asyncio.run(run_pollers(count, interval, ready, stop))
+    results.put((sorted(latencies), errors))
+
+
+def main():
+    pollers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tables = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    interval = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+    threshold = float(sys.argv[4]) if len(sys.argv) > 4 else 25.0
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = pollers + 2 * tables + 1000
+    if hard < wanted:
+        sys.exit(f"Open-file limit {hard} is too low for {pollers} pollers and {tables} tables; raise it to {wanted}.")
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, wanted), hard))
+    tracker = spawn_tracker(wanted)
+    workdir = tempfile.mkdtemp(prefix="bench_views_")
+    processes = []
+    try:
+        print(f"{tables} tables, no pollers ...", flush=True)
+        base = play(tables, 0, os.path.join(workdir, "base.json"))
+
+        context = multiprocessing.get_context("fork")
+        stop = context.Event()
+        results = context.Queue()
+        readies = []
+        for start in range(0, pollers, POLLERS_PER_PROCESS):
+            ready = context.Event()
+            process = context.Process(target=poller_process, daemon=True,
+                                      args=(min(POLLERS_PER_PROCESS, pollers - start), interval, ready, stop, results))
+            process.start()
+            processes.append(process)
+            readies.append(ready)
+        for ready in readies:
+            if not ready.wait(120):
+                raise RuntimeError("Pollers did not connect in time.")
+        before = view_gauges()
+        print(f"{tables} tables, {pollers} pollers every {interval:.1f}s ...", flush=True)
+        polled = play(tables, 2 * tables, os.path.join(workdir, "polled.json"))
+        after = view_gauges()
+        stop.set()
+        latencies = []
+        errors = 0
+        for _ in processes:
+            samples, failed = results.get(timeout=120)
+            latencies.extend(samples)
+            errors += failed
+        latencies.sort()
+    finally:
+        for process in processes:
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+        tracker.kill()
+        tracker.wait()
+
+    print(f"polls: {len(latencies)}, errors {errors}, p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms")
+    for view in ("players", "games", "leaders"):
+        served = after.get(f"{view}_served", 0) - before.get(f"{view}_served", 0)
+        encoded = after.get(f"{view}_encoded", 0) - before.get(f"{view}_encoded", 0)
+        print(f"{view:<8} served {served:>9}  encoded {encoded:>7}  "
+              f"({served / encoded if encoded else 0:.0f} served per encode)")
+    regressions = compare(base, polled, threshold, gate="p99")
+    if regressions:
+        print(f"Gameplay regressed beyond {threshold:.0f}% with pollers: {regressions}")
+        sys.exit(1)
+    print(f"Gameplay within {threshold:.0f}% with pollers.")
+
+
+if __name__ == "__main__":
+    main()
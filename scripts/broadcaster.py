@@ -0,0 +1,331 @@
+"""Non-blocking fan-out of server messages to connected clients.
+
+Each message is encoded once and the same frame is queued on a bounded
+per-client ClientChannel. One sender thread drains every channel through a
+selector, writing with MSG_DONTWAIT, so a client that stops reading only
+fills its own queue and never delays anyone else.
+
+When a channel is full the broadcaster applies its slow-consumer policy:
+
+    drop        discard the new message
+    coalesce    replace a queued message with the same key (e.g. the latest
+                game_state of a table); otherwise discard the oldest
+                message that is not a reply
+    disconnect  close the client's connection
+
+Replies are never dropped, but a client may have at most max_replies of
+them queued beyond max_queue; one that sends requests without reading the
+replies is disconnected.
+"""
+import logging
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from time import perf_counter_ns
+from metrics import Histogram, log_event
+from protocol import encode_message
+
+log = logging.getLogger("golf.broadcaster")
+
+POLICIES = ("drop", "coalesce", "disconnect")
+FANOUT_SAMPLE_EVERY = 16
+
+ACCEPTED = "accepted"
+DROPPED = "dropped"
+DISCONNECT = "disconnect"
+
+
+class ClientChannel:
+    """Bounded outbound queue for one client connection."""
+
+    def __init__(self, name, sock, max_queue, policy, max_replies=64):
+        self.name = name
+        self.sock = sock
+        self.max_queue = max_queue
+        self.max_replies = max_replies
+        self.policy = policy
+        self.queue = deque()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.scheduled = False
+        # Frame currently being written: (memoryview, offset, enqueued_at)
+        self.current = None
+        self.dropped = 0
+        self.coalesced = 0
+
+    def offer(self, frame, key=None, reliable=False):
+        """Queue a frame, applying the slow-consumer policy if the queue is full.
+
+        Replies to a client's own requests are sent with reliable=True; they
+        are bounded by the client's request rate and are never dropped.
+        """
+        entry = (frame, time.perf_counter(), key, reliable)
+        with self.lock:
+            if self.closed:
+                return DROPPED
+            queue = self.queue
+            if key is not None and self.policy == "coalesce":
+                for index, queued in enumerate(queue):
+                    if queued[2] == key:
+                        queue[index] = entry
+                        self.coalesced += 1
+                        return ACCEPTED
+            if reliable and len(queue) >= self.max_queue + self.max_replies:
+                return DISCONNECT
+            if len(queue) >= self.max_queue and not reliable:
+                if self.policy == "disconnect":
+                    return DISCONNECT
+                if self.policy == "drop":
+                    self.dropped += 1
+                    return DROPPED
+                # Evict the oldest broadcast; a queue of nothing but replies has nothing to give up.
+                for index, queued in enumerate(queue):
+                    if not queued[3]:
+                        del queue[index]
+                        break
+                else:
+                    return DISCONNECT
+                self.dropped += 1
+            queue.append(entry)
+            return ACCEPTED
+
+    def pop(self):
+        with self.lock:
+            return self.queue.popleft() if self.queue else None
+
+    def depth(self):
+        return len(self.queue) + (1 if self.current else 0)
+
+
+class Broadcaster:
+    def __init__(self, max_queue=256, policy="coalesce", on_disconnect=None, latency_samples=4096, instrument=True,
+                 max_replies=64):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy '{policy}'.")
+        self.max_queue = max_queue
+        self.max_replies = max_replies
+        self.policy = policy
+        self.on_disconnect = on_disconnect
+        self.channels = {}
+        self.by_socket = {}
+        self.lock = threading.Lock()
+        self.send_latencies = deque(maxlen=latency_samples)
+        self.messages_sent = 0
+        self.disconnected = 0
+        self.publishes = 0
+        self.bytes_published = 0
+        # Time to encode and queue one publish for every recipient, and its frame
+        # size, sampled on one publish in FANOUT_SAMPLE_EVERY to keep publish cheap.
+        self.fanout_time = Histogram() if instrument else None
+        self.frame_bytes = Histogram() if instrument else None
+        self.thread = None
+        self.ready = deque()
+        self.selector = None
+        self.wake_r = self.wake_w = None
+
+    # Channel registry
+
+    def add(self, name, sock):
+        """Route messages for name to sock, replacing any earlier connection."""
+        channel = ClientChannel(name, sock, self.max_queue, self.policy, self.max_replies)
+        with self.lock:
+            old = self.channels.get(name)
+            self.channels[name] = channel
+            self.by_socket[sock] = channel
+        if old is not None and old.sock is not sock:
+            self.close_channel(old)
+        self.start()
+        return channel
+
+    def remove_socket(self, sock):
+        """Forget the channel of a connection that has closed."""
+        with self.lock:
+            channel = self.by_socket.pop(sock, None)
+            if channel is not None and self.channels.get(channel.name) is channel:
+                del self.channels[channel.name]
+        if channel is not None:
+            with channel.lock:
+                channel.closed = True
+                channel.queue.clear()
+
+    def detach(self, sock, timeout=1.0):
+        """Stop routing to sock once the frames already queued for it are written.
+
+        For handing a live connection to another process: nothing this
+        process still owes the client is lost or sent out of order.
+        """
+        channel = self.by_socket.get(sock)
+        if channel is None:
+            return
+        deadline = time.perf_counter() + timeout
+        while channel.depth() and not channel.closed and time.perf_counter() < deadline:
+            time.sleep(0.0005)
+        if channel.depth():
+            log_event(log, logging.WARNING, "detach_timeout", player=channel.name, queued=channel.depth())
+        self.remove_socket(sock)
+        if self.selector is not None:
+            self.unwatch(channel)
+
+    def names(self):
+        return list(self.channels)
+
+    # Publishing
+
+    def publish(self, names, message, key=None):
+        """Encode message once and queue it for every named client that is connected.
+
+        message may also be a frame that encode_message already produced.
+        """
+        sampled = not self.publishes % FANOUT_SAMPLE_EVERY and self.fanout_time is not None
+        self.publishes += 1
+        if sampled:
+            started = perf_counter_ns()
+        frame = message if type(message) is bytes else encode_message(message)
+        channels = self.channels
+        for name in names:
+            channel = channels.get(name)
+            if channel is not None:
+                self.enqueue(channel, frame, key)
+        self.bytes_published += len(frame)
+        if sampled:
+            self.fanout_time.record(perf_counter_ns() - started)
+            self.frame_bytes.record(len(frame))
+        return frame
+
+    def reply(self, sock, message):
+        """Send a response (a message, or an encoded frame) on sock, behind anything already queued for that client."""
+        frame = message if type(message) is bytes else encode_message(message)
+        channel = self.by_socket.get(sock)
+        if channel is None:
+            sock.sendall(frame)
+        else:
+            self.enqueue(channel, frame, reliable=True)
+
+    def enqueue(self, channel, frame, key=None, reliable=False):
+        result = channel.offer(frame, key, reliable)
+        if result == DISCONNECT:
+            log_event(log, logging.WARNING, "slow_client_disconnected", player=channel.name, queued=channel.depth())
+            self.close_channel(channel)
+        elif result == ACCEPTED:
+            self.schedule(channel)
+
+    def close_channel(self, channel):
+        with channel.lock:
+            if channel.closed:
+                return
+            channel.closed = True
+            channel.queue.clear()
+        self.disconnected += 1
+        try:
+            channel.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if self.on_disconnect is not None and self.channels.get(channel.name) is channel:
+            self.on_disconnect(channel.name)
+
+    # Sender thread
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.selector = selectors.DefaultSelector()
+            self.wake_r, self.wake_w = socket.socketpair()
+            self.wake_r.setblocking(False)
+            self.wake_w.setblocking(False)
+            self.selector.register(self.wake_r, selectors.EVENT_READ)
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def schedule(self, channel):
+        """Ask the sender thread to flush channel; cheap if it is already pending."""
+        if channel.scheduled:
+            return
+        channel.scheduled = True
+        self.ready.append(channel)
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, AttributeError):
+            pass  # A wakeup is already pending, or the thread is not running yet
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select():
+                if key.fileobj is self.wake_r:
+                    try:
+                        while self.wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self.flush(key.data)
+            while self.ready:
+                self.flush(self.ready.popleft())
+
+    def flush(self, channel):
+        """Write as much of channel's queue as the socket accepts without blocking."""
+        channel.scheduled = False
+        while not channel.closed:
+            if channel.current is None:
+                entry = channel.pop()
+                if entry is None:
+                    break
+                channel.current = (memoryview(entry[0]), 0, entry[1])
+            view, offset, enqueued_at = channel.current
+            try:
+                offset += channel.sock.send(view[offset:], socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                self.watch(channel)
+                return
+            except Exception as e:
+                # Any other failure only costs this client its connection, never the sender thread.
+                log_event(log, logging.WARNING, "send_failed", player=channel.name, error=e)
+                self.unwatch(channel)
+                self.close_channel(channel)
+                return
+            if offset < len(view):
+                channel.current = (view, offset, enqueued_at)
+                continue
+            channel.current = None
+            self.messages_sent += 1
+            self.send_latencies.append(time.perf_counter() - enqueued_at)
+        self.unwatch(channel)
+
+    def watch(self, channel):
+        try:
+            self.selector.register(channel.sock, selectors.EVENT_WRITE, channel)
+        except KeyError:
+            pass  # Already registered
+
+    def unwatch(self, channel):
+        try:
+            self.selector.unregister(channel.sock)
+        except (KeyError, ValueError, OSError):
+            pass
+
+    # Metrics
+
+    def metrics(self):
+        channels = list(self.channels.values())
+        depths = [channel.depth() for channel in channels]
+        latencies = sorted(self.send_latencies)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000 if latencies else 0.0
+
+        return {
+            "channels": len(channels),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "publishes": self.publishes,
+            "bytes_published": self.bytes_published,
+            "messages_sent": self.messages_sent,
+            "dropped": sum(channel.dropped for channel in channels),
+            "coalesced": sum(channel.coalesced for channel in channels),
+            "disconnected": self.disconnected,
+            "send_latency_ms": {"p50": pct(50), "p99": pct(99), "max": pct(100)},
+        }
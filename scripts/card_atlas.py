@@ -0,0 +1,267 @@
+"""Card image atlas: every card face and back packed into one file and read through mmap.
+
+Build it once from the PNGs in images/:
+
+    python card_atlas.py [images dir] [atlas file]
+
+The atlas is a header, a fixed-size name index and one RGBA slot per image.
+Every slot has the same size, so the pixels of card code c start at
+data_offset + c * slot_size. Codes 0-51 are the cards.CARD_NAMES codes and
+the backs follow from BACK_CODE. CardAtlas maps the file and hands out NumPy
+views into the mapping, so fetching a card copies nothing; SpriteCache keeps
+the scaled variants for the current window size in an LRU.
+
+Decoding the PNGs uses Pillow when it is installed and a small zlib + NumPy
+decoder otherwise. Loading the atlas only needs NumPy.
+"""
+import mmap
+import os
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+import numpy as np
+from cards import CARD_NAMES
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MAGIC = b"GOLFATL1"
+HEADER = struct.Struct("<8sHHHI")  # magic, image count, width, height, data offset
+NAME = struct.Struct("<16s")
+CHANNELS = 4
+SLOT_ALIGNMENT = 64
+PAGE_SIZE = 4096
+
+BACKS = ["blue", "gray", "green", "purple", "red", "yellow"]
+BACK_CODE = len(CARD_NAMES)
+IMAGE_NAMES = CARD_NAMES + [f"{color}_back" for color in BACKS]
+
+DEFAULT_IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "images")
+DEFAULT_ATLAS = os.path.join(DEFAULT_IMAGES, "cards.atlas")
+
+
+def _align(n, alignment):
+    return -(-n // alignment) * alignment
+
+
+# PNG decoding
+
+def png_size(path):
+    """(width, height) from the PNG's IHDR chunk, without decoding it."""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    return struct.unpack(">II", header[16:24])
+
+
+def _unfilter_sequential(kind, line, prev, bpp):
+    """Undo the Average (3) or Paeth (4) filter; each byte depends on the one to its left."""
+    row = bytearray(line)
+    if kind == 3:
+        for i in range(bpp):
+            row[i] = (row[i] + (prev[i] >> 1)) & 0xFF
+        for i in range(bpp, len(row)):
+            row[i] = (row[i] + ((row[i - bpp] + prev[i]) >> 1)) & 0xFF
+    else:
+        for i in range(bpp):
+            row[i] = (row[i] + prev[i]) & 0xFF
+        for i in range(bpp, len(row)):
+            a = row[i - bpp]
+            b = prev[i]
+            c = prev[i - bpp]
+            pa = abs(b - c)
+            pb = abs(a - c)
+            pc = abs(a + b - 2 * c)
+            if pa <= pb and pa <= pc:
+                row[i] = (row[i] + a) & 0xFF
+            elif pb <= pc:
+                row[i] = (row[i] + b) & 0xFF
+            else:
+                row[i] = (row[i] + c) & 0xFF
+    return row
+
+
+def decode_png(path):
+    """Decode an 8-bit, non-interlaced RGB or RGBA PNG to an (h, w, 4) uint8 array."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError(f"{path} is not a PNG file.")
+    pos = 8
+    idat = []
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IHDR":
+            width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", body)
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+    if depth != 8 or color not in (2, 6) or interlace:
+        raise ValueError(f"{path}: only 8-bit non-interlaced RGB/RGBA PNGs are supported; install Pillow.")
+    bpp = 4 if color == 6 else 3
+    raw = zlib.decompress(b"".join(idat))
+
+    stride = width * bpp
+    pixels = np.empty((height, stride), dtype=np.uint8)
+    prev = np.zeros(stride, dtype=np.uint8)
+    for y in range(height):
+        start = y * (stride + 1)
+        kind = raw[start]
+        line = np.frombuffer(raw, np.uint8, stride, start + 1)
+        if kind == 0:
+            pixels[y] = line
+        elif kind == 1:
+            pixels[y] = np.cumsum(line.reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+        elif kind == 2:
+            pixels[y] = line + prev
+        else:
+            pixels[y] = np.frombuffer(_unfilter_sequential(kind, line, prev.tobytes(), bpp), np.uint8)
+        prev = pixels[y]
+    pixels = pixels.reshape(height, width, bpp)
+    if bpp == 3:
+        pixels = np.dstack([pixels, np.full((height, width), 255, dtype=np.uint8)])
+    return pixels
+
+
+def read_png(path):
+    if Image is not None:
+        with Image.open(path) as image:
+            return np.asarray(image.convert("RGBA"))
+    return decode_png(path)
+
+
+def resize(pixels, width, height):
+    """Scale an RGBA array: area average when shrinking, nearest neighbour when growing."""
+    src_height, src_width = pixels.shape[:2]
+    rows = np.arange(height) * src_height // height
+    cols = np.arange(width) * src_width // width
+    if width > src_width or height > src_height:
+        return pixels[rows[:, None], cols]
+    sums = np.add.reduceat(np.add.reduceat(pixels, rows, axis=0, dtype=np.uint32), cols, axis=1)
+    counts = np.diff(np.append(rows, src_height))[:, None] * np.diff(np.append(cols, src_width))[None, :]
+    return (sums // counts[..., None]).astype(np.uint8)
+
+
+def letterbox(pixels, width, height):
+    """Scale an RGBA array to fit width x height without changing its shape, centred on transparent pixels."""
+    src_height, src_width = pixels.shape[:2]
+    scale = min(width / src_width, height / src_height)
+    fit_width = min(width, max(1, round(src_width * scale)))
+    fit_height = min(height, max(1, round(src_height * scale)))
+    if (fit_height, fit_width) != (src_height, src_width):
+        pixels = resize(pixels, fit_width, fit_height)
+    if (fit_height, fit_width) == (height, width):
+        return pixels
+    cell = np.zeros((height, width, CHANNELS), dtype=np.uint8)
+    top = (height - fit_height) // 2
+    left = (width - fit_width) // 2
+    cell[top:top + fit_height, left:left + fit_width] = pixels
+    return cell
+
+
+# Build step
+
+def build_atlas(images_dir=DEFAULT_IMAGES, path=DEFAULT_ATLAS, width=None, height=None):
+    """Pack the IMAGE_NAMES PNGs into one atlas; images of another size are letterboxed to fit.
+
+    The slot size defaults to the largest width and height. Returns (width, height).
+    """
+    paths = [os.path.join(images_dir, name + ".png") for name in IMAGE_NAMES]
+    sizes = [png_size(p) for p in paths]
+    width = width or max(w for w, _ in sizes)
+    height = height or max(h for _, h in sizes)
+    image_size = width * height * CHANNELS
+    slot_size = _align(image_size, SLOT_ALIGNMENT)
+    index_size = HEADER.size + NAME.size * len(IMAGE_NAMES)
+    data_offset = _align(index_size, PAGE_SIZE)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(IMAGE_NAMES), width, height, data_offset))
+        for name in IMAGE_NAMES:
+            f.write(NAME.pack(name.encode()))
+        f.write(bytes(data_offset - index_size))
+        for p in paths:
+            pixels = read_png(p)
+            if pixels.shape[:2] != (height, width):
+                pixels = letterbox(pixels, width, height)
+            f.write(np.ascontiguousarray(pixels).tobytes())
+            f.write(bytes(slot_size - image_size))
+    os.replace(temp_path, path)
+    return width, height
+
+
+# Loading
+
+class CardAtlas:
+    """Read-only view of an atlas file; pixels() returns views into the mapping."""
+
+    def __init__(self, path=DEFAULT_ATLAS):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, self.width, self.height, data_offset = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a card atlas.")
+        self.names = [NAME.unpack_from(self.map, HEADER.size + i * NAME.size)[0].rstrip(b"\0").decode()
+                      for i in range(count)]
+        self.codes = {name: code for code, name in enumerate(self.names)}
+        image_size = self.width * self.height * CHANNELS
+        slot_size = _align(image_size, SLOT_ALIGNMENT)
+        slots = np.frombuffer(self.map, np.uint8, count * slot_size, data_offset).reshape(count, slot_size)
+        self.slots = slots[:, :image_size].reshape(count, self.height, self.width, CHANNELS)
+
+    def pixels(self, card):
+        """(height, width, 4) RGBA view of a card, by code or name ('10D', 'blue_back')."""
+        return self.slots[card if type(card) is int else self.codes[card]]
+
+    def back(self, color="blue"):
+        return self.slots[BACK_CODE + BACKS.index(color)]
+
+    def close(self):
+        self.slots = None
+        self.map.close()
+        self.file.close()
+
+
+class SpriteCache:
+    """LRU of scaled card images keyed by (code, width, height).
+
+    A client asks for the sprite size that fits its window; after a resize
+    the old size simply ages out.
+    """
+
+    def __init__(self, atlas, max_sprites=256):
+        self.atlas = atlas
+        self.max_sprites = max_sprites
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, card, width, height):
+        code = card if type(card) is int else self.atlas.codes[card]
+        key = (code, width, height)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = resize(self.atlas.slots[code], width, height)
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_sprites:
+            self.sprites.popitem(last=False)
+        return sprite
+
+
+# Main execution
+if __name__ == "__main__":
+    images_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_IMAGES
+    atlas_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_ATLAS
+    width, height = build_atlas(images_dir, atlas_path)
+    print(f"Packed {len(IMAGE_NAMES)} images of {width}x{height} into {atlas_path} "
+          f"({os.path.getsize(atlas_path) / 1e6:.1f} MB)")
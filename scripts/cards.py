@@ -0,0 +1,14 @@
+SUITS = ['C', 'D', 'H', 'S']
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+
+# Card codes 0-51 are suit-major, rank-minor; decks.py shuffles permutations of them.
+CARD_NAMES = [rank + suit for suit in SUITS for rank in RANKS]
+CARD_CODES = {name: code for code, name in enumerate(CARD_NAMES)}
+
+# Score of each rank: number cards at face value, J/Q/K 10, A 1.
+RANK_VALUES = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 1]
+CARD_VALUES = bytes(RANK_VALUES[code % len(RANKS)] for code in range(len(CARD_NAMES)))
+# Score of a card string, for keeping a hand's score current one card at a time.
+CARD_SCORES = {name: CARD_VALUES[code] for code, name in enumerate(CARD_NAMES)}
+# 256-entry table for bytes.translate(): maps a buffer of card codes to their scores.
+CARD_VALUE_TABLE = CARD_VALUES + bytes(256 - len(CARD_VALUES))
@@ -1,12 +1,25 @@
 import socket
 import threading
-import pickle
 import sys
+import time
 from game_logic import SixCardGolfGame
+from peer import PeerHost, PeerLink, host_address
+from protocol import HEARTBEAT_INTERVAL, ConnectionClosed, MessageReader, send_message
+from state_sync import GameMirror
 
 class CardGameClient:
     def __init__(self, host, port):
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.reader = MessageReader(self.client_socket)
+        self.mirror = GameMirror()
+        # The tracker connection is also written by a PeerHost's thread.
+        self.send_lock = threading.Lock()
+        self.last_sent = time.monotonic()
+        # Peer mode: the table this client hosts, or its link to the host
+        self.peer_host = None
+        self.peer_link = None
+        # The game ID this client is spectating
+        self.spectating = None
 
         # Connect to the specified host and port
         try:
@@ -23,15 +36,15 @@ class CardGameClient:
             self.t_port = int(input("Enter your tracker port (7500-7999): "))
             self.p_port = int(input("Enter your player port (7500-7999): "))
 
-            self.client_socket.send(pickle.dumps({
+            self.send({
                 "type": "register",
                 "name": self.player_name,
                 "ipv4": self.ipv4,
                 "t_port": self.t_port,
                 "p_port": self.p_port
-            }))
+            })
 
-            response = pickle.loads(self.client_socket.recv(1024))
+            response = self.reader.recv()
             if response["status"] == "SUCCESS":
                 print("Registration successful!")
                 break
@@ -41,16 +54,51 @@ class CardGameClient:
 
         # Start a thread to listen for server messages
         threading.Thread(target=self.receive_messages, daemon=True).start()
+        threading.Thread(target=self.send_heartbeats, daemon=True).start()
 
         # Start the command input loop
         self.run_console_input()
 
+    def send(self, message):
+        with self.send_lock:
+            send_message(self.client_socket, message)
+            self.last_sent = time.monotonic()
+
+    def send_heartbeats(self):
+        """Ping the server whenever nothing else has been sent for a heartbeat interval."""
+        while True:
+            idle = time.monotonic() - self.last_sent
+            if idle < HEARTBEAT_INTERVAL:
+                time.sleep(HEARTBEAT_INTERVAL - idle)
+                continue
+            try:
+                self.send({"type": "ping"})
+            except OSError:
+                return
+
     def run_console_input(self):
         while True:
-            command = input("Enter a command (query_players, query_games, deregister <player name>, start_game <player> <n> <holes>, end_game <game-identifer> <dealer>): ").strip()
+            command = input("Enter a command (query_players [page], query_games [page], leaderboard [page], spectate <game-id>, unspectate, deregister <player name>, start_game <player> <n> <holes>, matchmake <size> <holes>, cancel_match, draw, discard <card>, swap <card> <drawn card>, end_hole, end_game <game-identifer> <dealer>): ").strip()
 
-            if command in ["query_players", "query_games"]:
-                self.client_socket.send(pickle.dumps({"type": command}))
+            if command.startswith(("query_players", "query_games", "leaderboard")):
+                parts = command.split()
+                if len(parts) > 2 or (len(parts) == 2 and not parts[1].isdigit()):
+                    print(f"Invalid command format. Use: {parts[0]} [page]")
+                    continue
+                message = {"type": parts[0]}
+                if len(parts) == 2:
+                    message["page"] = int(parts[1])
+                self.send(message)
+            elif command.startswith("spectate"):
+                parts = command.split()
+                if len(parts) != 2:
+                    print("Invalid command format. Use: spectate <game-id>")
+                    continue
+                self.spectating = parts[1]
+                self.send({"type": "spectate", "player": self.player_name, "game_id": parts[1]})
+            elif command == "unspectate":
+                self.spectating = None
+                self.send({"type": "unspectate", "player": self.player_name})
             elif command.startswith("deregister"):
                 parts = command.split()
                 if len(parts) != 2:
@@ -58,7 +106,7 @@ class CardGameClient:
                     continue
 
                 player_name = parts[1]
-                self.client_socket.send(pickle.dumps({"type": "deregister", "name": player_name}))
+                self.send({"type": "deregister", "name": player_name})
             elif command.startswith("start_game"):
                 parts = command.split()
                 if len(parts) != 4:
@@ -76,32 +124,73 @@ class CardGameClient:
                     print("Both n and holes must be integers.")
                     continue
 
-                self.client_socket.send(pickle.dumps({
+                self.send({
                     "type": "start_game",
                     "player": player,
                     "n": n,
                     "holes": holes
-                }))
+                })
                 
                 while True:
                     print(" enter : draw', 'discard <card>', swap <card> <desired card> ,or 'de-register' to leave the game.")
                     command = input("> ").strip().lower()
                     if command == 'draw':
-                        self.client_socket.send(pickle.dumps({"type": "draw_card"}))
+                        self.send({"type": "draw_card"})
                     elif command.startswith('discard'):
                         try:
                             card = command.split(" ")[1].upper()
-                            self.client_socket.send(pickle.dumps({"type": "discard_card", "card": card}))
+                            self.send({"type": "discard_card", "card": card})
                         except IndexError:
                             print("Please specify a card to discard (e.g., discard 5H)")
                     elif command == 'de-register':
-                        self.client_socket.send(pickle.dumps({"type": "de-register"}))
+                        self.send({"type": "de-register"})
                         print("You have left the game. Disconnecting...")
                         self.client_socket.close()
                         break
                     else:
                         print("Invalid command. Use 'draw', 'discard <card>', or 'de-register' to leave the game.")  
 
+            elif command.startswith("matchmake"):
+                parts = command.split()
+                if len(parts) != 3:
+                    print("Invalid command format. Use: matchmake <size> <holes>")
+                    continue
+
+                try:
+                    size = int(parts[1])
+                    holes = int(parts[2])
+                except ValueError:
+                    print("Both size and holes must be integers.")
+                    continue
+
+                self.send({
+                    "type": "matchmake",
+                    "player": self.player_name,
+                    "size": size,
+                    "holes": holes
+                })
+            elif command == "cancel_match":
+                self.send({"type": "cancel_match", "player": self.player_name})
+            elif command == "draw":
+                self.send_move({"type": "draw_card", "player": self.player_name})
+            elif command.startswith("discard"):
+                parts = command.split()
+                if len(parts) != 2:
+                    print("Invalid command format. Use: discard <card>")
+                    continue
+                self.send_move({"type": "discard_card", "player": self.player_name, "card": parts[1].upper()})
+            elif command.startswith("swap"):
+                parts = command.split()
+                if len(parts) != 3:
+                    print("Invalid command format. Use: swap <card> <drawn card>")
+                    continue
+                self.send_move({"type": "swap_card", "player": self.player_name,
+                                "your_card": parts[1].upper(), "drawn_card": parts[2].upper()})
+            elif command == "end_hole":
+                if self.peer_host is None:
+                    print("Only the host of a peer table can end a hole.")
+                    continue
+                self.peer_host.end_hole()
             elif command.startswith("end"):
                 parts = command.split()
                 if len(parts) != 3:
@@ -111,15 +200,80 @@ class CardGameClient:
                 game_id = parts[1]
                 player = parts[2]
 
-                self.client_socket.send(pickle.dumps({
+                self.send({
                     "type": "end",
                     "game_id": game_id,
                     "player": player
-                }))
+                })
 
             else:
                 print("Invalid command. Try again.")
     
+    def send_move(self, message):
+        """Send an in-game move to wherever the game runs: this client, the host, or the tracker."""
+        if self.peer_host is not None:
+            response = self.peer_host.move(self.player_name, message)
+            if response is not None:
+                print(f"Host response: {response}")
+        elif self.peer_link is not None:
+            self.peer_link.send(message)
+        else:
+            self.send(message)
+
+    def on_matched(self, matched):
+        """Join a peer table: host it if this client deals, otherwise connect to its host."""
+        if "host" not in matched:
+            return
+        players = [info["name"] for info in matched["players"]]
+        if matched["host"] == self.player_name:
+            self.peer_host = PeerHost(matched["game_id"], self.player_name, players, matched["holes"],
+                                      self.p_port, self.send, on_message=self.handle_game_message).start()
+            print(f"Hosting {matched['game_id']} on port {self.p_port}")
+        else:
+            ipv4, p_port = host_address(matched)
+            self.peer_link = PeerLink(ipv4, p_port, matched["game_id"], self.player_name)
+            threading.Thread(target=self.receive_peer_messages, daemon=True).start()
+            print(f"Joined {matched['game_id']} hosted by {matched['host']} at {ipv4}:{p_port}")
+
+    def receive_peer_messages(self):
+        link = self.peer_link
+        while True:
+            try:
+                message = link.recv()
+            except ConnectionClosed:
+                print("The host closed the connection.")
+                break
+            except OSError as e:
+                print(f"Lost the connection to the host: {e}")
+                break
+            print(f"Host response: {message}")
+            if message and message.get("type") == "final_result":
+                break
+            self.handle_game_message(message, link.send)
+        self.peer_link = None
+        link.close()
+
+    def handle_game_message(self, message, send=None):
+        """Keep the mirror current from a game_state or delta, from the tracker or a host."""
+        if not message or "type" not in message:
+            return
+        if message.get("game_id") is not None and message.get("game_id") == self.spectating:
+            # Spectators see only the public state; there is no hand to mirror.
+            if message["type"] == "game_ended":
+                self.spectating = None
+            return
+        if message["type"] == "game_state":
+            self.mirror.load(message)
+            self.display_game_state(self.mirror.state)
+        elif message["type"] == "delta":
+            if self.mirror.apply(message):
+                self.display_game_state(self.mirror.state)
+            elif send is not None:
+                # Missed an update: fetch a full snapshot instead of guessing.
+                send({"type": "resync", "game_id": message["game_id"]})
+        elif message["type"] == "final_result" and self.peer_host is not None:
+            self.peer_host = None
+
     def display_game_state(self, game_state):
         """Display the current game state in the console."""
         current_player = game_state["current_player"]
@@ -141,11 +295,18 @@ class CardGameClient:
     def receive_messages(self):
         while True:
             try:
-                response = pickle.loads(self.client_socket.recv(1024))
+                response = self.reader.recv()
+                if isinstance(response, dict) and response.get("pong"):
+                    continue
                 print(f"Server response: {response}")
-                if "type" in response:
-                    if response["type"] == "game_state":
-                        self.display_game_state(response)
+                if isinstance(response, dict) and "type" in response:
+                    if response["type"] == "matched":
+                        self.on_matched(response)
+                    else:
+                        self.handle_game_message(response, self.send)
+            except ConnectionClosed:
+                print("Server closed the connection.")
+                break
             except Exception as e:
                 print(f"Error receiving message: {e}")
                 break
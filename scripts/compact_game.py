@@ -0,0 +1,121 @@
+from cards import CARD_CODES, CARD_NAMES, CARD_VALUE_TABLE
+from decks import DECK_SIZE, HAND_SIZE, new_seed, shuffled_deck
+
+
+class CompactGolfGame:
+    """SixCardGolfGame with cards stored as 0-51 codes in preallocated byte buffers.
+
+    The deck and discard pile are fixed 52-byte buffers with a length index,
+    and each hand is a bytearray, so moves never allocate card objects. The
+    methods accept either card strings ('10D') or codes and the string-facing
+    ones (draw_card, get_top_discard_card, players_cards) render strings, so
+    the server and clients can use this class in place of SixCardGolfGame.
+    """
+
+    __slots__ = ("num_players", "deck", "deck_len", "hands", "discard_pile", "discard_len", "current_player")
+
+    def __init__(self, num_players=2, deck=None):
+        self.num_players = num_players
+        self.deck = bytearray(DECK_SIZE)
+        self.discard_pile = bytearray(DECK_SIZE)
+        self.hands = {i: bytearray(HAND_SIZE) for i in range(1, num_players + 1)}
+        self.deal(shuffled_deck(new_seed()) if deck is None else deck)
+
+    def deal(self, deck, first_player=1):
+        """Deal a hole from deck into the existing buffers, so a redeal allocates nothing."""
+        dealt = self.num_players * HAND_SIZE
+        for i, hand in self.hands.items():
+            hand[:] = deck[(i - 1) * HAND_SIZE:i * HAND_SIZE]
+        self.current_player = first_player
+        # draw_code takes cards from deck_len downwards, so the buffer holds the permutation reversed.
+        self.deck[:] = deck[::-1]
+        self.deck_len = DECK_SIZE - dealt - 1
+        self.discard_len = 0
+        self.discard_code(deck[dealt])  # Start the discard pile with one card
+
+    def draw_code(self):
+        """Draw a card code from the deck, or None if the deck is empty."""
+        if self.deck_len:
+            self.deck_len -= 1
+            return self.deck[self.deck_len]
+        return None
+
+    def draw_card(self):
+        """Draw a card from the deck."""
+        code = self.draw_code()
+        return None if code is None else CARD_NAMES[code]
+
+    def add_card(self, player_id, card):
+        """Add a drawn card to the player's hand."""
+        self.hands[player_id].append(card if type(card) is int else CARD_CODES[card])
+
+    def discard_code(self, code):
+        self.discard_pile[self.discard_len] = code
+        self.discard_len += 1
+
+    def discard_card(self, player_id, card):
+        """Discard a card from the player's hand."""
+        code = card if type(card) is int else CARD_CODES.get(card)
+        hand = self.hands[player_id]
+        if code is not None and code in hand:
+            hand.remove(code)
+            self.discard_code(code)
+
+    def has_card(self, player_id, card):
+        """Return True if the card is in the player's hand; an unknown card string is in no hand."""
+        code = card if type(card) is int else CARD_CODES.get(card)
+        return code is not None and code in self.hands[player_id]
+
+    def hand_size(self, player_id):
+        """Return the number of cards in the player's hand."""
+        return len(self.hands[player_id])
+
+    def swap_card(self, player_id, your_card, drawn_card):
+        """Put the drawn card in place of your_card and discard your_card.
+
+        Returns False, changing nothing, unless they are two different cards in the hand.
+        """
+        your_code = your_card if type(your_card) is int else CARD_CODES.get(your_card)
+        drawn_code = drawn_card if type(drawn_card) is int else CARD_CODES.get(drawn_card)
+        hand = self.hands[player_id]
+        if (your_code is None or drawn_code is None or your_code == drawn_code
+                or your_code not in hand or drawn_code not in hand):
+            return False
+        hand.remove(drawn_code)
+        hand[hand.index(your_code)] = drawn_code
+        self.discard_code(your_code)
+        return True
+
+    def end_turn(self):
+        """Switch to the next player."""
+        self.current_player = (self.current_player % self.num_players) + 1
+
+    def get_top_discard_card(self):
+        """Return the top card from the discard pile."""
+        return CARD_NAMES[self.discard_pile[self.discard_len - 1]] if self.discard_len else None
+
+    def score(self, player_id):
+        """Sum of the rank values in the player's hand, using the precomputed table."""
+        return sum(self.hands[player_id].translate(CARD_VALUE_TABLE))
+
+    def calculate_scores(self):
+        return {player_id: self.score(player_id) for player_id in self.hands}
+
+    def dump_codes(self):
+        """Deck, discard pile and hands as card-code bytes, for journal snapshots."""
+        hands = {player_id: bytes(hand) for player_id, hand in self.hands.items()}
+        return bytes(self.deck[:self.deck_len]), bytes(self.discard_pile[:self.discard_len]), hands
+
+    def load_codes(self, deck, discard_pile, hands, current_player):
+        """Restore the state written by dump_codes."""
+        self.deck[:len(deck)] = deck
+        self.deck_len = len(deck)
+        self.discard_pile[:len(discard_pile)] = discard_pile
+        self.discard_len = len(discard_pile)
+        self.hands = {player_id: bytearray(hand) for player_id, hand in hands.items()}
+        self.current_player = current_player
+
+    @property
+    def players_cards(self):
+        """Hands rendered as card strings, e.g. {1: ['AS', '10D', ...]}."""
+        return {player_id: [CARD_NAMES[code] for code in hand] for player_id, hand in self.hands.items()}
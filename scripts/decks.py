@@ -0,0 +1,129 @@
+"""Seeded deck shuffles and a background-refilled pool of shuffled decks.
+
+A deck is a bytes permutation of the 52 card codes, in the order the cards
+come off the deck. The shuffle for a seed reads a SHAKE-128 stream keyed
+by the seed, takes one 32-bit key per card and sorts the codes by key.
+This gives each table its own stream, with no shared generator state, and
+the same seed always gives the same deck on every platform and Python
+version. Ties between keys keep code order; they happen about once in
+three million decks.
+
+Deals are replayable: a table's seed is enough to rebuild its opening
+deal with SixCardGolfGame(num_players, shuffled_deck(seed)). A seed gives
+away every card, so it must never be sent to players.
+
+Usage: python decks.py <seed> [players]    (prints the deal for a seed)
+"""
+import hashlib
+import os
+import struct
+import sys
+import threading
+from collections import deque
+from cards import CARD_NAMES
+
+DECK_SIZE = len(CARD_NAMES)
+HAND_SIZE = 6
+SORT_KEYS = struct.Struct(f"<{DECK_SIZE}I")
+CODES = range(DECK_SIZE)
+
+
+def new_seed():
+    """A fresh 64-bit seed from the OS."""
+    return int.from_bytes(os.urandom(8), "little")
+
+
+def shuffled_deck(seed):
+    """The deck for seed, as a bytes permutation of the card codes."""
+    stream = hashlib.shake_128(seed.to_bytes(8, "little")).digest(SORT_KEYS.size)
+    return bytes(sorted(CODES, key=SORT_KEYS.unpack(stream).__getitem__))
+
+
+def split_deal(deck, num_players):
+    """Hands, first discard and the rest of the deck, each one slice of the permutation."""
+    dealt = num_players * HAND_SIZE
+    hands = [deck[start:start + HAND_SIZE] for start in range(0, dealt, HAND_SIZE)]
+    return hands, deck[dealt], deck[dealt + 1:]
+
+
+class DeckPool:
+    """Shuffled decks made ahead of time by a background thread.
+
+    take() pops a (seed, deck) pair and wakes the refill thread once the
+    pool falls below low_water; if the pool is empty it shuffles a deck
+    itself. With a base seed the seeds are base, base + 1, ... in the order
+    the decks were made, so a run can be repeated; otherwise they come from
+    os.urandom. The thread starts on the first take(), so a pool can be
+    created before a fork.
+    """
+
+    def __init__(self, size=1024, low_water=None, seed=None):
+        self.size = size
+        self.low_water = size // 4 if low_water is None else low_water
+        self.decks = deque()
+        self.lock = threading.Lock()
+        self.wanted = threading.Event()
+        self.thread = None
+        self.next_seed = seed
+        self.taken = 0
+        self.misses = 0
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        self.wanted.set()
+
+    def seed(self):
+        with self.lock:
+            if self.next_seed is None:
+                return new_seed()
+            seed = self.next_seed
+            self.next_seed += 1
+            return seed
+
+    def make(self):
+        seed = self.seed()
+        return seed, shuffled_deck(seed)
+
+    def fill(self):
+        """Top the pool up to size; the refill thread does this whenever take() asks."""
+        while len(self.decks) < self.size:
+            self.decks.append(self.make())
+
+    def run(self):
+        while True:
+            self.wanted.wait()
+            self.wanted.clear()
+            self.fill()
+
+    def take(self):
+        """Return (seed, deck) for a new table."""
+        if self.thread is None:
+            self.start()
+        self.taken += 1
+        try:
+            entry = self.decks.popleft()
+        except IndexError:
+            self.misses += 1
+            entry = self.make()
+        if len(self.decks) < self.low_water:
+            self.wanted.set()
+        return entry
+
+    def stats(self):
+        return {"pooled": len(self.decks), "taken": self.taken, "misses": self.misses}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python decks.py <seed> [players]")
+    hands, discard, rest = split_deal(shuffled_deck(int(sys.argv[1])), int(sys.argv[2]) if len(sys.argv) > 2 else 4)
+    for seat, hand in enumerate(hands, 1):
+        print(f"seat {seat}: {' '.join(CARD_NAMES[code] for code in hand)}")
+    print(f"discard: {CARD_NAMES[discard]}")
+    print(f"deck ({len(rest)}): {' '.join(CARD_NAMES[code] for code in rest)}")
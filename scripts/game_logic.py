@@ -1,24 +1,21 @@
-import random
+from cards import CARD_CODES, CARD_NAMES, CARD_SCORES
+from decks import HAND_SIZE, new_seed, shuffled_deck
 
 class SixCardGolfGame:
-    def __init__(self, num_players=2):
+    def __init__(self, num_players=2, deck=None):
+        """deck is a shuffled permutation of card codes (see decks.py); a fresh one is shuffled if omitted."""
         self.num_players = num_players
-        self.deck = self.create_deck()
-        random.shuffle(self.deck)
-        self.players_cards = {i: self.deal_cards() for i in range(1, num_players + 1)}
-        self.current_player = 1  # Player 1 starts
-        self.discard_pile = [self.deck.pop()]  # Start the discard pile with one card
-
-    def create_deck(self):
-        """Create a deck of cards."""
-        suits = ['C', 'D', 'H', 'S']
-        ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-        deck = [rank + suit for suit in suits for rank in ranks]
-        return deck
-
-    def deal_cards(self):
-        """Deal six cards to a player."""
-        return [self.deck.pop() for _ in range(6)]
+        self.deal(shuffled_deck(new_seed()) if deck is None else deck)
+
+    def deal(self, deck, first_player=1):
+        """Deal a hole from deck: every hand, the first discard and the draw pile are slices of it."""
+        cards = [CARD_NAMES[code] for code in deck]
+        dealt = self.num_players * HAND_SIZE
+        self.players_cards = {i: cards[(i - 1) * HAND_SIZE:i * HAND_SIZE] for i in range(1, self.num_players + 1)}
+        self.current_player = first_player
+        self.discard_pile = [cards[dealt]]  # Start the discard pile with one card
+        # Draws pop from the end, so the rest of the deck is stored reversed.
+        self.deck = cards[:dealt:-1]
 
     def draw_card(self):
         """Draw a card from the deck."""
@@ -26,12 +23,41 @@ class SixCardGolfGame:
             return self.deck.pop()
         return None  # Deck is empty
 
+    def add_card(self, player_id, card):
+        """Add a drawn card to the player's hand."""
+        self.players_cards[player_id].append(card)
+
     def discard_card(self, player_id, card):
         """Discard a card from the player's hand."""
         if card in self.players_cards[player_id]:
             self.players_cards[player_id].remove(card)
             self.discard_pile.append(card)
 
+    def has_card(self, player_id, card):
+        """Return True if the card is in the player's hand."""
+        return card in self.players_cards[player_id]
+
+    def hand_size(self, player_id):
+        """Return the number of cards in the player's hand."""
+        return len(self.players_cards[player_id])
+
+    def swap_card(self, player_id, your_card, drawn_card):
+        """Put the drawn card in place of your_card and discard your_card.
+
+        Returns False, changing nothing, unless they are two different cards in the hand.
+        """
+        hand = self.players_cards[player_id]
+        if your_card == drawn_card or your_card not in hand or drawn_card not in hand:
+            return False
+        hand.remove(drawn_card)
+        hand[hand.index(your_card)] = drawn_card
+        self.discard_pile.append(your_card)
+        return True
+
+    def score(self, player_id):
+        """Sum of the rank values in the player's hand."""
+        return sum(CARD_SCORES[card] for card in self.players_cards[player_id])
+
     def end_turn(self):
         """Switch to the next player."""
         self.current_player = (self.current_player % self.num_players) + 1
@@ -39,3 +65,15 @@ class SixCardGolfGame:
     def get_top_discard_card(self):
         """Return the top card from the discard pile."""
         return self.discard_pile[-1] if self.discard_pile else None
+
+    def dump_codes(self):
+        """Deck, discard pile and hands as card-code bytes, for journal snapshots."""
+        hands = {player_id: bytes(CARD_CODES[c] for c in cards) for player_id, cards in self.players_cards.items()}
+        return bytes(CARD_CODES[c] for c in self.deck), bytes(CARD_CODES[c] for c in self.discard_pile), hands
+
+    def load_codes(self, deck, discard_pile, hands, current_player):
+        """Restore the state written by dump_codes."""
+        self.deck = [CARD_NAMES[c] for c in deck]
+        self.discard_pile = [CARD_NAMES[c] for c in discard_pile]
+        self.players_cards = {player_id: [CARD_NAMES[c] for c in cards] for player_id, cards in hands.items()}
+        self.current_player = current_player
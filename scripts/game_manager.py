@@ -0,0 +1,296 @@
+import itertools
+import threading
+from cards import CARD_SCORES
+from decks import DeckPool
+from game_logic import SixCardGolfGame
+
+
+class Table:
+    """One game table: its SixCardGolfGame plus the lock that serializes its moves.
+
+    A table plays a match of `holes` holes. Each seat's score for the hole
+    in play is kept current by the move methods, one card at a time, and
+    sent in every delta; totals hold the holes already scored, so a seat's
+    standing is totals[seat] + scores[seat]. end_hole() scores a hole and
+    deals the next, with the dealer and first player one seat further on.
+    """
+
+    def __init__(self, game_id, dealer, players, holes, game, listeners=()):
+        self.game_id = game_id
+        self.dealer = dealer
+        self.players = players
+        self.holes = holes
+        self.status = "in-play"
+        self.game = game
+        # Seats are the 1-based player ids SixCardGolfGame uses for players_cards.
+        self.seats = {name: seat for seat, name in enumerate(players, 1)}
+        self.lock = threading.Lock()
+        # Bumped by every move; clients use it to spot a missed delta.
+        self.version = 0
+        # In peer mode the host's client runs the game; the tracker only keeps hole results.
+        self.host = None
+        self.hole_scores = []
+        # Seed of the current hole's deal (see decks.py); None for tables rebuilt from a journal.
+        self.seed = None
+        self.hole = 1
+        self.totals = dict.fromkeys(self.seats.values(), 0)
+        self.scores = {}
+        self.rescore()
+        self.listeners = listeners
+        # Names of the players watching the table's public state (see views.py). The
+        # set is replaced on every change, never mutated, so it can be read without a lock.
+        self.spectators = frozenset()
+
+    def info(self):
+        return {"game_id": self.game_id, "dealer": self.dealer, "players": self.players}
+
+    def hand(self, player):
+        return self.game.players_cards[self.seats[player]]
+
+    def hand_size(self, player):
+        return self.game.hand_size(self.seats[player])
+
+    def rescore(self):
+        """Recompute every seat's hole score from its hand, after a deal or a replay."""
+        for seat in self.seats.values():
+            self.scores[seat] = self.game.score(seat)
+
+    def hole_dealer(self):
+        """The dealer of the hole in play: the table's dealer moves one seat on each hole."""
+        return self.players[(self.seats[self.dealer] + self.hole - 2) % len(self.players)]
+
+    def first_player(self):
+        """The seat that plays first in the hole in play: the one after the hole's dealer."""
+        return self.seats[self.hole_dealer()] % len(self.players) + 1
+
+    def standings(self):
+        return {seat: total + self.scores[seat] for seat, total in self.totals.items()}
+
+    def by_name(self, values):
+        """{seat: value} as {player name: value}, for messages about the whole table."""
+        return {self.players[seat - 1]: value for seat, value in values.items()}
+
+    def snapshot(self):
+        """Full game state at the current version, for new members and resyncs."""
+        with self.lock:
+            return {
+                "type": "game_state",
+                "game_id": self.game_id,
+                "version": self.version,
+                "hole": self.hole,
+                "holes": self.holes,
+                "hole_dealer": self.hole_dealer(),
+                "current_player": self.game.current_player,
+                "players": {seat: name for name, seat in self.seats.items()},
+                "discard_pile": self.game.get_top_discard_card(),
+                "player_cards": {seat: list(cards) for seat, cards in self.game.players_cards.items()},
+                "scores": dict(self.scores),
+                "totals": dict(self.totals)
+            }
+
+    def public_state(self):
+        """What spectators may see at the current version: no cards in hand. Called with the table lock held."""
+        return {
+            "type": "spectate_state",
+            "game_id": self.game_id,
+            "version": self.version,
+            "hole": self.hole,
+            "holes": self.holes,
+            "hole_dealer": self.hole_dealer(),
+            "current_player": self.game.current_player,
+            "players": {seat: name for name, seat in self.seats.items()},
+            "discard_pile": self.game.get_top_discard_card(),
+            "hand_sizes": {seat: self.game.hand_size(seat) for seat in self.seats.values()},
+            "totals": dict(self.totals)
+        }
+
+    def emit(self, op, seat, **fields):
+        """Bump the version and hand a delta for one move to the listeners.
+
+        Called with the table lock held, so listeners see deltas in version order.
+        """
+        self.version += 1
+        delta = {"type": "delta", "game_id": self.game_id, "version": self.version, "op": op, "seat": seat,
+                 "score": self.scores[seat]}
+        delta.update(fields)
+        for listener in self.listeners:
+            listener(self, delta)
+
+    def pass_turn(self):
+        """Move the turn on to the next seat that still holds cards. Called with the table lock held."""
+        for _ in self.seats:
+            self.game.end_turn()
+            if self.game.hand_size(self.game.current_player):
+                return
+
+    def draw_card(self, player):
+        """Draw a card into the player's hand on their turn.
+
+        Once the deck is empty the reply has hole_over set: the hole ends
+        with the cards still in hand.
+        """
+        with self.lock:
+            seat = self.seats[player]
+            if self.game.current_player != seat:
+                return {"status": "FAILURE", "reason": "It's not your turn."}
+            card = self.game.draw_card()
+            if not card:
+                return {"status": "FAILURE", "reason": "The deck is empty; the hole is over.", "hole_over": True}
+            self.game.add_card(seat, card)
+            self.scores[seat] += CARD_SCORES[card]
+            self.emit("draw", seat, card=card)
+            return {"status": "SUCCESS", "card": card}
+
+    def discard_card(self, player, card):
+        with self.lock:
+            seat = self.seats[player]
+            if self.game.current_player != seat:
+                return {"status": "FAILURE", "reason": "It's not your turn."}
+            # Cards are named on the wire; the compact engine would also take an int code for one.
+            if type(card) is not str or not self.game.has_card(seat, card):
+                return {"status": "FAILURE", "reason": "Card not in player's hand."}
+            self.game.discard_card(seat, card)
+            self.scores[seat] -= CARD_SCORES[card]
+            self.pass_turn()
+            self.emit("discard", seat, card=card, current_player=self.game.current_player)
+            return {"status": "SUCCESS"}
+
+    def swap_card(self, player, your_card, drawn_card):
+        with self.lock:
+            seat = self.seats[player]
+            if self.game.current_player != seat:
+                return {"status": "FAILURE", "reason": "It's not your turn."}
+            if your_card == drawn_card or type(your_card) is not str or type(drawn_card) is not str:
+                return {"status": "FAILURE", "reason": "Invalid card swap."}
+            if not (self.game.has_card(seat, your_card) and self.game.has_card(seat, drawn_card)):
+                return {"status": "FAILURE", "reason": "Invalid card swap."}
+            self.game.swap_card(seat, your_card, drawn_card)
+            # The drawn card was counted when it was drawn; only your_card leaves the hand.
+            self.scores[seat] -= CARD_SCORES[your_card]
+            self.pass_turn()
+            self.emit("swap", seat, your_card=your_card, drawn_card=drawn_card,
+                      current_player=self.game.current_player)
+            return {"status": "SUCCESS"}
+
+    def all_hands_empty(self):
+        return all(self.game.hand_size(seat) == 0 for seat in self.seats.values())
+
+    def end_hole(self, hole, seed=None, deck=None):
+        """Add hole's scores to the totals and, given a deck, deal the next hole from it.
+
+        Called with the table lock held. Returns the hole's {seat: score}, or
+        None if that hole has already been scored by another move or the
+        match is over.
+        """
+        if hole != self.hole or self.match_over():
+            return None
+        scores = dict(self.scores)
+        for seat, score in scores.items():
+            self.totals[seat] += score
+        self.hole += 1
+        if deck is not None:
+            self.seed = seed
+            self.game.deal(deck, self.first_player())
+            self.rescore()
+            self.version += 1
+        return scores
+
+    def match_over(self):
+        return self.hole > self.holes
+
+
+class GameManager:
+    """Owns every table on the server, one SixCardGolfGame per game ID.
+
+    The manager lock only guards creating and removing tables; moves take the
+    table's own lock, so tables never wait on each other. Every listener is
+    called as listener(table, delta) after each move, and every table
+    listener as listener(table) when a table is created, restored or removed
+    (its status is then "ended"). With a journal
+    attached, table starts, moves and ends are also logged to it. New tables
+    are dealt from deck_pool, which shuffles their decks ahead of time.
+    """
+
+    def __init__(self, game_factory=SixCardGolfGame, deck_pool=None):
+        self.game_factory = game_factory
+        self.deck_pool = deck_pool or DeckPool()
+        self.listeners = []
+        self.table_listeners = []
+        self.tables = {}
+        self.player_tables = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.journal = None
+
+    def use_journal(self, journal):
+        self.journal = journal
+        self.listeners.append(journal.log_move)
+
+    def restore(self, tables, last_game=0):
+        """Adopt tables rebuilt from a journal; new IDs continue after last_game."""
+        with self._lock:
+            for table in tables:
+                self.tables[table.game_id] = table
+                for p in table.players:
+                    self.player_tables[p] = table
+            self._ids = itertools.count(last_game + 1)
+        for table in tables:
+            self.notify(table)
+
+    def create_table(self, dealer, players, holes, game_id=None):
+        """Create and register a table; game_id is given when another process numbered the table."""
+        seed, deck = self.deck_pool.take()
+        game = self.game_factory(len(players), deck)
+        with self._lock:
+            # IDs come from a counter, so an ID is never reused after its game ends.
+            if game_id is None:
+                game_id = f"game_{next(self._ids)}"
+            table = Table(game_id, dealer, players, holes, game, self.listeners)
+            table.seed = seed
+            game.current_player = table.first_player()
+            if self.journal is not None:
+                self.journal.log_start(table)
+            self.tables[game_id] = table
+            for p in players:
+                self.player_tables[p] = table
+        self.notify(table)
+        return table
+
+    def end_hole(self, table, hole):
+        """Score a finished hole and, unless it was the last, deal the next from the pool.
+
+        Returns the hole's {seat: score}, or None if it was already scored.
+        """
+        seed, deck = self.deck_pool.take() if hole < table.holes else (None, None)
+        with table.lock:
+            scores = table.end_hole(hole, seed, deck)
+            if scores is not None and deck is not None and self.journal is not None:
+                self.journal.log_snapshot(table)
+        return scores
+
+    def get(self, game_id):
+        return self.tables.get(game_id)
+
+    def table_for(self, player):
+        return self.player_tables.get(player)
+
+    def remove_table(self, game_id):
+        with self._lock:
+            table = self.tables.pop(game_id, None)
+            if table is None:
+                return None
+            table.status = "ended"
+            if self.journal is not None:
+                self.journal.log_end(table)
+            for p in table.players:
+                if self.player_tables.get(p) is table:
+                    del self.player_tables[p]
+        self.notify(table)
+        return table
+
+    def notify(self, table):
+        for listener in self.table_listeners:
+            listener(table)
+
+    def __len__(self):
+        return len(self.tables)
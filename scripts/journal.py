@@ -0,0 +1,337 @@
+"""Append-only binary journal of table events, for crash recovery and replay.
+
+Every record is
+
+    crc32 (4) | kind (1) | game number (4) | payload length (2) | payload
+
+little-endian, with the CRC covering everything after itself. Move records
+carry a seat and one or two card codes; START and SNAPSHOT records carry the
+whole table, including the hole in play and the match totals. A snapshot
+is logged every `snapshot_interval` versions of a table and after every
+redeal, so recovery only applies the moves after each table's last snapshot.
+
+Appends only copy the record into a buffer. A writer thread group-commits
+the buffer with one write and one fsync per `commit_interval`, so a crash
+loses at most the last commit window. A caller that must not acknowledge a
+move before it is on disk can wait_for() the offset that append returned.
+
+Usage: python journal.py <journal file>    (rebuilds every table offline)
+"""
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from cards import CARD_CODES, CARD_NAMES
+from game_logic import SixCardGolfGame
+from game_manager import Table
+from metrics import log_event
+
+log = logging.getLogger("golf.journal")
+
+# LAST_GAME carries no table: its game number is the highest one ever used, kept across checkpoints.
+START, DRAW, DISCARD, SWAP, SNAPSHOT, END, LAST_GAME = range(1, 8)
+MOVE_KINDS = {"draw": DRAW, "discard": DISCARD, "swap": SWAP}
+
+HEADER = struct.Struct("<IBIH")
+BODY = struct.Struct("<BIH")
+CRC = struct.Struct("<I")
+TABLE_HEADER = struct.Struct("<IBBB")
+MATCH_HOLE = struct.Struct("<B")
+
+
+class JournalError(ValueError):
+    pass
+
+
+def game_number(game_id):
+    """GameManager IDs are "game_N"; the journal stores N."""
+    return int(game_id[5:])
+
+
+def encode_record(kind, number, payload):
+    body = BODY.pack(kind, number, len(payload)) + payload
+    return CRC.pack(zlib.crc32(body)) + body
+
+
+def _pack_bytes(parts, data):
+    parts.append(bytes((len(data),)))
+    parts.append(data)
+
+
+def encode_table(table):
+    """START/SNAPSHOT payload: everything needed to rebuild the Table.
+
+    The caller must hold the table lock or own the table outright.
+    """
+    deck, discard_pile, hands = table.game.dump_codes()
+    parts = [TABLE_HEADER.pack(table.version, table.holes, table.game.current_player, len(table.players))]
+    for name in [table.dealer] + list(table.players):
+        _pack_bytes(parts, name.encode())
+    _pack_bytes(parts, deck)
+    _pack_bytes(parts, discard_pile)
+    for seat in range(1, len(table.players) + 1):
+        _pack_bytes(parts, hands[seat])
+    parts.append(MATCH_HOLE.pack(table.hole))
+    parts.append(struct.pack(f"<{len(table.players)}H", *table.totals.values()))
+    return b"".join(parts)
+
+
+def decode_table(number, payload, game_factory=SixCardGolfGame, listeners=()):
+    version, holes, current_player, count = TABLE_HEADER.unpack_from(payload)
+    offset = TABLE_HEADER.size
+    fields = []
+    for _ in range(count + 3 + count):
+        length = payload[offset]
+        fields.append(payload[offset + 1:offset + 1 + length])
+        offset += 1 + length
+    names = [field.decode() for field in fields[:count + 1]]
+    deck, discard_pile = fields[count + 1], fields[count + 2]
+    hands = {seat: hand for seat, hand in enumerate(fields[count + 3:], 1)}
+
+    game = game_factory(count)
+    game.load_codes(deck, discard_pile, hands, current_player)
+    table = Table(f"game_{number}", names[0], names[1:], holes, game, listeners)
+    table.version = version
+    # Journals written before multi-hole matches end here.
+    if offset < len(payload):
+        table.hole = MATCH_HOLE.unpack_from(payload, offset)[0]
+        totals = struct.unpack_from(f"<{count}H", payload, offset + MATCH_HOLE.size)
+        table.totals = dict(enumerate(totals, 1))
+    return table
+
+
+def apply_move(table, kind, payload):
+    """Redo one logged move on a table, the way Table's move methods did it."""
+    game = table.game
+    seat = payload[0]
+    if kind == DRAW:
+        card = game.draw_card()
+        if card is None or CARD_CODES[card] != payload[1]:
+            raise JournalError(f"{table.game_id} v{table.version + 1}: drew {card}, journal has "
+                               f"{CARD_NAMES[payload[1]]}.")
+        game.add_card(seat, card)
+    elif kind == DISCARD:
+        game.discard_card(seat, CARD_NAMES[payload[1]])
+        table.pass_turn()
+    elif kind == SWAP:
+        game.swap_card(seat, CARD_NAMES[payload[1]], CARD_NAMES[payload[2]])
+        table.pass_turn()
+    else:
+        raise JournalError(f"Unknown journal record kind {kind}.")
+    table.version += 1
+
+
+def recover(path, game_factory=SixCardGolfGame, listeners=()):
+    """Rebuild the live tables logged in path.
+
+    Returns ({game_id: Table}, stats). Reading stops at the first torn or
+    corrupt record, which is where an interrupted commit left the file.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = b""
+    view = memoryview(data)
+    end = len(data)
+    header_size = HEADER.size
+    unpack = HEADER.unpack_from
+    crc32 = zlib.crc32
+    snapshots = {}
+    tails = {}
+    records = 0
+    last_game = 0
+    offset = 0
+    # One pass that only keeps, per table, its last snapshot and the moves after it.
+    while offset + header_size <= end:
+        crc, kind, number, length = unpack(data, offset)
+        stop = offset + header_size + length
+        if stop > end or crc32(view[offset + 4:stop]) != crc:
+            break
+        payload = data[offset + header_size:stop]
+        if kind == START or kind == SNAPSHOT:
+            snapshots[number] = payload
+            tails[number] = []
+        elif kind == END:
+            snapshots.pop(number, None)
+            tails.pop(number, None)
+        elif kind == LAST_GAME:
+            pass
+        else:
+            tail = tails.get(number)
+            if tail is not None:
+                tail.append((kind, payload))
+        offset = stop
+        records += 1
+        if number > last_game:
+            last_game = number
+
+    tables = {}
+    for number, payload in snapshots.items():
+        table = decode_table(number, payload, game_factory, listeners)
+        for kind, move in tails[number]:
+            apply_move(table, kind, move)
+        table.rescore()
+        tables[table.game_id] = table
+    stats = {
+        "records": records,
+        "tables": len(tables),
+        "moves_replayed": sum(len(tail) for tail in tails.values()),
+        "last_game": last_game,
+        "valid_bytes": offset,
+        "torn_bytes": end - offset,
+    }
+    return tables, stats
+
+
+class Journal:
+    """Group-committed append-only journal; GameManager calls the log_* methods."""
+
+    def __init__(self, path, commit_interval=0.005, snapshot_interval=64, sync=True):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+        self.sync = sync
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+        self.durable_changed = threading.Condition(self.lock)
+        # Serializes commits, so batches reach the file in append order.
+        self.commit_lock = threading.Lock()
+        self.appended = 0
+        self.durable = 0
+        self.records = 0
+        self.commits = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def append(self, kind, number, payload):
+        """Buffer one record; returns the offset wait_for() needs to see it on disk."""
+        record = encode_record(kind, number, payload)
+        with self.lock:
+            self.buffer += record
+            self.appended += len(record)
+            self.records += 1
+            return self.appended
+
+    # GameManager hooks
+
+    def log_start(self, table):
+        return self.append(START, game_number(table.game_id), encode_table(table))
+
+    def log_snapshot(self, table):
+        """A snapshot outside the regular interval, e.g. after a redeal; call with the table lock held."""
+        return self.append(SNAPSHOT, game_number(table.game_id), encode_table(table))
+
+    def log_end(self, table):
+        return self.append(END, game_number(table.game_id), b"")
+
+    def log_move(self, table, delta):
+        """Table listener; runs under the table lock, so records are in version order."""
+        kind = MOVE_KINDS[delta["op"]]
+        number = game_number(table.game_id)
+        if kind == SWAP:
+            payload = bytes((delta["seat"], CARD_CODES[delta["your_card"]], CARD_CODES[delta["drawn_card"]]))
+        else:
+            payload = bytes((delta["seat"], CARD_CODES[delta["card"]]))
+        offset = self.append(kind, number, payload)
+        if self.snapshot_interval and table.version % self.snapshot_interval == 0:
+            offset = self.append(SNAPSHOT, number, encode_table(table))
+        return offset
+
+    # Group commit
+
+    def run(self):
+        while not self.closed:
+            time.sleep(self.commit_interval)
+            try:
+                self.commit()
+            except OSError as e:
+                log_event(log, logging.ERROR, "journal_commit_failed", path=self.path, error=e)
+
+    def commit(self):
+        """Write and fsync everything appended so far in one batch."""
+        with self.commit_lock:
+            with self.lock:
+                if not self.buffer:
+                    return
+                data, self.buffer = self.buffer, bytearray()
+                end = self.appended
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.fd, view):]
+            if self.sync:
+                os.fsync(self.fd)
+            with self.lock:
+                self.durable = end
+                self.commits += 1
+                self.durable_changed.notify_all()
+
+    def wait_for(self, offset):
+        """Block until everything up to offset has been committed."""
+        with self.lock:
+            while self.durable < offset:
+                self.durable_changed.wait()
+
+    def checkpoint(self, tables, last_game=0):
+        """Replace the file with one snapshot per table.
+
+        Used after recovery, before the tables take new moves, so the journal
+        does not keep growing across restarts. A LAST_GAME record keeps the
+        highest game number ever used, so IDs are not reused.
+        """
+        records = [encode_record(SNAPSHOT, game_number(table.game_id), encode_table(table)) for table in tables]
+        if last_game:
+            records.append(encode_record(LAST_GAME, last_game, b""))
+        data = b"".join(records)
+        temp_path = self.path + ".tmp"
+        with self.commit_lock:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            os.close(self.fd)
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            with self.lock:
+                self.buffer = bytearray()
+                self.durable = self.appended
+                self.durable_changed.notify_all()
+
+    def close(self):
+        self.closed = True
+        self.commit()
+        os.close(self.fd)
+
+    def metrics(self):
+        return {
+            "records": self.records,
+            "bytes": self.appended,
+            "commits": self.commits,
+            "pending_bytes": len(self.buffer),
+        }
+
+
+# Main execution
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python journal.py <journal file>")
+        sys.exit(1)
+    started = time.perf_counter()
+    tables, stats = recover(sys.argv[1])
+    elapsed = time.perf_counter() - started
+    print(f"Read {stats['records']} records ({stats['valid_bytes']} bytes) in {elapsed * 1000:.1f} ms")
+    if stats["torn_bytes"]:
+        print(f"Ignored a torn tail of {stats['torn_bytes']} bytes")
+    print(f"Rebuilt {stats['tables']} tables, replaying {stats['moves_replayed']} moves after their snapshots")
+    ordered = sorted(tables.items(), key=lambda item: game_number(item[0]))
+    for game_id, table in ordered[:20]:
+        sizes = ", ".join(f"{name}: {table.hand_size(name)} cards" for name in table.players)
+        print(f"  {game_id} v{table.version} hole {table.hole}/{table.holes} dealer {table.dealer}, "
+              f"turn of seat {table.game.current_player} ({sizes})")
+    if len(ordered) > 20:
+        print(f"  ... and {len(ordered) - 20} more")
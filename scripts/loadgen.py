@@ -0,0 +1,430 @@
+"""Scriptable load generator for the tracker server.
+
+Runs thousands of synthetic asyncio clients against a server on localhost
+and reports throughput, p50/p95/p99 latency and error rate per command.
+
+Scenarios:
+    game    register -> matchmake -> play draw/discard turns -> dealer ends
+            the game -> deregister
+    lobby   register -> query_players/query_games -> deregister
+
+Results are written as JSON so runs can be compared across commits:
+
+    python loadgen.py run --clients 1000 --repeat 5 --spawn async --out base.json
+    python loadgen.py run --clients 1000 --repeat 5 --spawn async --out new.json
+    python loadgen.py compare base.json new.json --threshold 15 --gate p95
+
+compare prints the change in throughput, p50/p95/p99 and error rate per
+command and exits with status 1 when one of them regresses past the
+threshold. Tail latency on a shared machine moves by tens of percent
+between identical runs, so the gate is p95 by default and --repeat pools
+several runs so the percentiles settle.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+from protocol import MAX_FRAME_SIZE, decode_payload, encode_message, frame_length
+
+SCENARIOS = ("game", "lobby")
+
+
+def name_for(i):
+    """Alphabetic player names (the server rejects digits): a, b, ..., z, aa, ab, ..."""
+    letters = []
+    i += 1
+    while i:
+        i, rem = divmod(i - 1, 26)
+        letters.append(chr(97 + rem))
+    return "".join(reversed(letters))
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+class TableState:
+    """What the clients seated at one table share to finish the game together."""
+
+    def __init__(self, size):
+        self.size = size
+        self.finished = 0
+        self.all_done = asyncio.Event()
+        self.ended = asyncio.Event()
+
+
+class SyntheticClient:
+    def __init__(self, harness, name):
+        self.harness = harness
+        self.name = name
+        self.pending = deque()
+        self.changed = asyncio.Event()
+        self.game_id = None
+        self.dealer = None
+        self.seat = None
+        self.current_player = None
+        self.drawn = None
+        self.writer = None
+        self.read_task = None
+
+    async def connect(self, host, port):
+        reader, self.writer = await asyncio.open_connection(host, port)
+        self.read_task = asyncio.get_running_loop().create_task(self.read_loop(reader))
+
+    async def read_loop(self, reader):
+        try:
+            while True:
+                header = await reader.readexactly(4)
+                message = decode_payload(await reader.readexactly(frame_length(header, MAX_FRAME_SIZE)))
+                if message is None or "type" not in message:
+                    # Replies come back in request order, behind any queued broadcasts.
+                    if self.pending:
+                        future = self.pending.popleft()
+                        if not future.done():
+                            future.set_result(message)
+                else:
+                    self.on_broadcast(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in self.pending:
+                if not future.done():
+                    future.set_exception(ConnectionError("Server closed the connection."))
+            self.changed.set()
+
+    def on_broadcast(self, message):
+        kind = message["type"]
+        if kind == "matched":
+            self.game_id = message["game_id"]
+            self.dealer = message["dealer"]
+        elif kind == "game_state":
+            for seat, name in message["players"].items():
+                if name == self.name:
+                    self.seat = seat
+            self.current_player = message["current_player"]
+        elif kind == "delta":
+            if message["op"] == "draw" and message["seat"] == self.seat:
+                self.drawn = message["card"]
+            if "current_player" in message:
+                self.current_player = message["current_player"]
+        self.changed.set()
+
+    async def request(self, message):
+        """Send one command and wait for its reply; latency and outcome go to the harness."""
+        command = message["type"]
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(future)
+        started = time.perf_counter()
+        self.writer.write(encode_message(message))
+        try:
+            reply = await asyncio.wait_for(future, self.harness.timeout)
+        except asyncio.TimeoutError:
+            self.harness.record(command, time.perf_counter() - started, "timeout")
+            raise
+        failed = isinstance(reply, dict) and reply.get("status") == "FAILURE"
+        self.harness.record(command, time.perf_counter() - started, "failure" if failed else None)
+        return reply
+
+    async def wait_until(self, condition):
+        deadline = time.perf_counter() + self.harness.timeout
+        while not condition():
+            self.changed.clear()
+            if condition():
+                break
+            if self.read_task.done():
+                raise ConnectionError("Server closed the connection.")
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    # Scenarios
+
+    async def register(self):
+        reply = await self.request({"type": "register", "name": self.name, "ipv4": "127.0.0.1",
+                                    "t_port": 7501, "p_port": 7502})
+        return reply.get("status") == "SUCCESS"
+
+    async def deregister(self):
+        await self.request({"type": "deregister", "name": self.name})
+
+    async def play_game(self, size, holes, turns):
+        reply = await self.request({"type": "matchmake", "player": self.name, "size": size, "holes": holes})
+        if reply.get("status") != "SUCCESS":
+            return
+        await self.wait_until(lambda: self.seat is not None)
+        table = self.harness.table(self.game_id, size)
+        try:
+            for _ in range(turns):
+                await self.wait_until(lambda: self.current_player == self.seat)
+                self.drawn = None
+                await self.request({"type": "draw_card", "player": self.name})
+                await self.wait_until(lambda: self.drawn is not None)
+                await self.request({"type": "discard_card", "player": self.name, "card": self.drawn})
+        finally:
+            table.finished += 1
+            if table.finished == table.size:
+                table.all_done.set()
+        if self.name == self.dealer:
+            await asyncio.wait_for(table.all_done.wait(), self.harness.timeout)
+            await self.request({"type": "end", "game_id": self.game_id, "player": self.name})
+            table.ended.set()
+        else:
+            await asyncio.wait_for(table.ended.wait(), self.harness.timeout)
+
+    async def lobby(self, queries):
+        for i in range(queries):
+            await self.request({"type": "query_players" if i % 2 else "query_games"})
+
+
+class LoadHarness:
+    def __init__(self, args):
+        self.args = args
+        self.timeout = args.timeout
+        self.latencies = {}
+        self.errors = {}
+        self.tables = {}
+        self.aborted = {}
+        self.completed = 0
+
+    def record(self, command, elapsed, error=None):
+        self.latencies.setdefault(command, []).append(elapsed)
+        if error is not None:
+            counts = self.errors.setdefault(command, {})
+            counts[error] = counts.get(error, 0) + 1
+
+    def table(self, game_id, size):
+        table = self.tables.get(game_id)
+        if table is None:
+            table = self.tables[game_id] = TableState(size)
+        return table
+
+    def abort(self, reason):
+        self.aborted[reason] = self.aborted.get(reason, 0) + 1
+
+    async def run_client(self, index, connect_slots):
+        args = self.args
+        client = SyntheticClient(self, name_for(index))
+        try:
+            async with connect_slots:
+                await client.connect(args.host, args.port)
+            if not await client.register():
+                self.abort("register_failed")
+                return
+            if args.scenario == "game":
+                await client.play_game(args.size, args.holes, args.turns)
+            else:
+                await client.lobby(args.queries)
+            await client.deregister()
+            self.completed += 1
+        except asyncio.TimeoutError:
+            self.abort("timeout")
+        except (ConnectionError, OSError) as e:
+            self.abort(type(e).__name__)
+        finally:
+            if client.writer is not None:
+                client.writer.close()
+            if client.read_task is not None:
+                client.read_task.cancel()
+
+    async def run(self, first_name=0):
+        connect_slots = asyncio.Semaphore(self.args.connect_concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(self.run_client(first_name + i, connect_slots) for i in range(self.args.clients)))
+        return time.perf_counter() - started
+
+    def report(self, duration):
+        commands = {}
+        total = 0
+        total_errors = 0
+        for command, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            errors = sum(self.errors.get(command, {}).values())
+            total += len(samples)
+            total_errors += errors
+            commands[command] = {
+                "count": len(samples),
+                "throughput": len(samples) / duration,
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+                "errors": self.errors.get(command, {}),
+                "error_rate": errors / len(samples),
+            }
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "args": vars(self.args),
+            },
+            "duration_s": duration,
+            "clients": self.args.clients * self.args.repeat,
+            "completed": self.completed,
+            "aborted": self.aborted,
+            "total": {
+                "count": total,
+                "throughput": total / duration,
+                "error_rate": total_errors / total if total else 0.0,
+            },
+            "commands": commands,
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def spawn_server(kind, host, port, workers=None):
+    """Start async_server.py, sharded_server.py or the threaded GameServer as a child process
+    and wait for it to listen."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    if kind == "async":
+        command = [sys.executable, os.path.join(here, "async_server.py"), host, str(port)]
+    elif kind == "sharded":
+        command = [sys.executable, os.path.join(here, "sharded_server.py"), host, str(port)]
+        if workers:
+            command.append(str(workers))
+    else:
+        command = [sys.executable, "-c", f"from server import GameServer; GameServer({host!r}, {port})"]
+    env = dict(os.environ, GOLF_LOG_LEVEL=os.environ.get("GOLF_LOG_LEVEL", "WARNING"))
+    process = subprocess.Popen(command, cwd=here, env=env)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"Server did not start listening on {host}:{port}.")
+
+
+def print_report(report):
+    print(f"{report['clients']} clients, {report['completed']} completed in {report['duration_s']:.2f}s; "
+          f"aborted: {report['aborted'] or 'none'}")
+    print(f"{'command':<15}{'count':>9}{'per sec':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}")
+    for command, stats in report["commands"].items():
+        print(f"{command:<15}{stats['count']:>9}{stats['throughput']:>11,.0f}{stats['p50_ms']:>9.2f}"
+              f"{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['error_rate']:>8.1%}")
+    total = report["total"]
+    print(f"{'total':<15}{total['count']:>9}{total['throughput']:>11,.0f}{'':>27}{total['error_rate']:>8.1%}")
+
+
+def compare(base, new, threshold, gate="p95"):
+    """Print the per-command change from base to new; returns the list of regressions.
+
+    A command regresses when its throughput falls, or its gate percentile
+    latency rises, by more than threshold percent, or its error rate rises
+    by more than a tenth of threshold percentage points.
+    """
+    regressions = []
+    print(f"base {base['meta']['commit']} ({base['meta']['timestamp']})  ->  "
+          f"new {new['meta']['commit']} ({new['meta']['timestamp']})")
+    print(f"{'command':<15}{'per sec':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>10}")
+    for command in sorted(set(base["commands"]) | set(new["commands"])):
+        old = base["commands"].get(command)
+        cur = new["commands"].get(command)
+        if old is None or cur is None:
+            print(f"{command:<15} only in {'new' if old is None else 'base'}")
+            continue
+        changes = {"throughput": (cur["throughput"] - old["throughput"]) / old["throughput"] * 100}
+        for p in ("p50", "p95", "p99"):
+            key = p + "_ms"
+            changes[p] = (cur[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+        errors = (cur["error_rate"] - old["error_rate"]) * 100
+        flags = []
+        if changes["throughput"] < -threshold:
+            flags.append("throughput")
+        if changes[gate] > threshold:
+            flags.append(gate)
+        if errors > threshold / 10:
+            flags.append("errors")
+        if flags:
+            regressions.append((command, flags))
+        print(f"{command:<15}" + "".join(f"{changes[key]:>+9.0f}%" for key in ("throughput", "p50", "p95", "p99"))
+              + f"{errors:>+9.1f}pt{'  REGRESSION: ' + ', '.join(flags) if flags else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="mode", required=True)
+
+    run = commands.add_parser("run", help="Generate load and report the results.")
+    run.add_argument("--host", default="127.0.0.1")
+    run.add_argument("--port", type=int, default=7500)
+    run.add_argument("--spawn", choices=("async", "threaded", "sharded"), help="Start a server on host:port for this run.")
+    run.add_argument("--workers", type=int, help="Worker processes for --spawn sharded (default: one per core).")
+    run.add_argument("--scenario", choices=SCENARIOS, default="game")
+    run.add_argument("--clients", type=int, default=1000)
+    run.add_argument("--size", type=int, default=4, help="Players per table (game scenario).")
+    run.add_argument("--holes", type=int, default=9)
+    run.add_argument("--turns", type=int, default=6, help="Draw/discard turns per player (game scenario).")
+    run.add_argument("--queries", type=int, default=10, help="Queries per client (lobby scenario).")
+    run.add_argument("--connect-concurrency", type=int, default=200)
+    run.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for any reply or turn.")
+    run.add_argument("--name-offset", type=int, default=0,
+                     help="First player name index, to run generators side by side. Give each generator its own "
+                          "--holes too: a table's clients agree on when the game ends within one generator.")
+    run.add_argument("--repeat", type=int, default=1, help="Run the scenario this many times and pool the samples.")
+    run.add_argument("--out", help="Write the JSON report here.")
+
+    diff = commands.add_parser("compare", help="Compare two JSON reports.")
+    diff.add_argument("base")
+    diff.add_argument("new")
+    diff.add_argument("--threshold", type=float, default=15.0, help="Percent change that counts as a regression.")
+    diff.add_argument("--gate", choices=("p50", "p95", "p99"), default="p95",
+                      help="Latency percentile checked against the threshold.")
+    args = parser.parse_args()
+
+    if args.mode == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        regressions = compare(base, new, args.threshold, args.gate)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0f}%")
+            sys.exit(1)
+        return
+
+    left = 52 - 6 * args.size - 1
+    if args.scenario == "game" and args.turns * args.size > left:
+        parser.error(f"turns * size must be at most {left}, the cards left in the deck after the deal.")
+    harness = LoadHarness(args)
+    duration = 0.0
+    for i in range(args.repeat):
+        # Samples are pooled across repeats; each repeat gets a fresh server when spawning.
+        server = spawn_server(args.spawn, args.host, args.port, args.workers) if args.spawn else None
+        try:
+            harness.tables.clear()
+            duration += asyncio.run(harness.run(args.name_offset + i * args.clients))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+    report = harness.report(duration)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Non-blocking matchmaking: players queue with table preferences and a
+scheduler forms tables in batches.
+
+Requests are bucketed by (table size, holes) and served first-in first-out
+within each bucket. Cancelled requests are left in place and skipped when
+they reach the head of their bucket. All requests share one timeout, so the
+oldest request of a bucket always expires first and expiry only touches the
+requests that actually expired.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from metrics import log_event
+
+log = logging.getLogger("golf.matchmaking")
+
+TABLE_SIZES = (2, 3, 4)
+HOLE_COUNTS = range(1, 10)
+
+
+class MatchRequest:
+    __slots__ = ("player", "size", "holes", "enqueued_at", "deadline", "status")
+
+    def __init__(self, player, size, holes, enqueued_at, deadline):
+        self.player = player
+        self.size = size
+        self.holes = holes
+        self.enqueued_at = enqueued_at
+        self.deadline = deadline
+        self.status = "waiting"
+
+
+class MatchmakingQueue:
+    """FIFO matchmaking buckets drained by a periodic scheduler.
+
+    form_table(requests) is called with each group of matched requests,
+    oldest first, outside the queue lock. on_expired(request) is called for
+    each request that timed out.
+    """
+
+    def __init__(self, form_table, on_expired=None, timeout=60.0, interval=0.02, latency_samples=10000):
+        self.form_table = form_table
+        self.on_expired = on_expired
+        self.timeout = timeout
+        self.interval = interval
+        self.buckets = {}
+        self.waiting = {}
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.time_to_table = deque(maxlen=latency_samples)
+        self.tables_formed = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    def enqueue(self, player, size, holes):
+        if size not in TABLE_SIZES:
+            return {"status": "FAILURE", "reason": "Table size must be 2, 3 or 4."}
+        if holes not in HOLE_COUNTS:
+            return {"status": "FAILURE", "reason": "Invalid number of holes."}
+        now = time.monotonic()
+        bucket = (size, holes)
+        with self.lock:
+            if player in self.requests:
+                return {"status": "FAILURE", "reason": "Player is already queued."}
+            request = MatchRequest(player, size, holes, now, now + self.timeout)
+            self.requests[player] = request
+            self.buckets.setdefault(bucket, deque()).append(request)
+            self.waiting[bucket] = self.waiting.get(bucket, 0) + 1
+            position = self.waiting[bucket]
+        if position >= size:
+            self.wakeup.set()
+        return {"status": "SUCCESS", "position": position}
+
+    def cancel(self, player):
+        """Withdraw a waiting request; returns False if the player is not queued."""
+        with self.lock:
+            request = self.requests.pop(player, None)
+            if request is None:
+                return False
+            request.status = "cancelled"
+            self.waiting[(request.size, request.holes)] -= 1
+            self.cancelled += 1
+        return True
+
+    def is_queued(self, player):
+        return player in self.requests
+
+    def form_tables(self, now=None):
+        """One scheduler pass: expire old requests and form every complete table.
+
+        Returns the number of tables formed.
+        """
+        now = time.monotonic() if now is None else now
+        groups = []
+        expired = []
+        with self.lock:
+            for bucket, queue in self.buckets.items():
+                size = bucket[0]
+                while queue and (queue[0].status != "waiting" or queue[0].deadline <= now):
+                    request = queue.popleft()
+                    if request.status == "waiting":
+                        request.status = "expired"
+                        del self.requests[request.player]
+                        self.waiting[bucket] -= 1
+                        expired.append(request)
+                while self.waiting[bucket] >= size:
+                    group = []
+                    while len(group) < size:
+                        request = queue.popleft()
+                        if request.status == "waiting":
+                            request.status = "matched"
+                            del self.requests[request.player]
+                            group.append(request)
+                    self.waiting[bucket] -= size
+                    groups.append(group)
+            self.expired += len(expired)
+            self.tables_formed += len(groups)
+
+        for request in expired:
+            if self.on_expired is not None:
+                self.on_expired(request)
+        for group in groups:
+            for request in group:
+                self.time_to_table.append(now - request.enqueued_at)
+            self.form_table(group)
+        return len(groups)
+
+    def start(self):
+        """Run the scheduler on a background thread."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.form_tables()
+            except Exception as e:
+                log_event(log, logging.ERROR, "matchmaking_failed", error=e)
+
+    def metrics(self):
+        samples = sorted(self.time_to_table)
+
+        def pct(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000 if samples else 0.0
+
+        return {
+            "waiting": sum(self.waiting.values()),
+            "tables_formed": self.tables_formed,
+            "expired": self.expired,
+            "cancelled": self.cancelled,
+            "time_to_table_ms": {"p50": pct(50), "p99": pct(99)},
+        }
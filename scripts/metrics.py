@@ -0,0 +1,212 @@
+"""Server instrumentation: latency histograms, counters, gauges and structured logs.
+
+Histograms are HDR-style: values land in log-linear buckets, 2**HALF_BITS (16)
+per power of two, so a bucket is at most 1/16 of its lower bound wide and every
+recorded value is kept to within about 6% at any magnitude. Recording is a bit_length, a shift and a list increment with no
+lock and no allocation. Concurrent threads can very occasionally lose an
+increment; for metrics that is an acceptable trade for a lock-free hot path.
+
+Metrics.render() returns a plain-text snapshot, one "name value" per line in
+the Prometheus text format. MetricsEndpoint serves it over HTTP on a local
+port and MetricsDumper writes it to a file at a fixed interval.
+
+log_event(logger, level, event, **fields) logs "event key=value ..." only if
+the level is enabled, so a disabled debug event costs one check.
+"""
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUB_BUCKET_BITS = 5
+HALF_BITS = SUB_BUCKET_BITS - 1
+MAX_EXPONENT = 40
+BUCKETS = (MAX_EXPONENT + 2) << HALF_BITS
+QUANTILES = (("0.5", 50), ("0.9", 90), ("0.99", 99), ("0.999", 99.9))
+
+
+class Histogram:
+    """Log-linear histogram of non-negative integers (latencies in ns, sizes in bytes)."""
+
+    __slots__ = ("counts", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        if shift > 0:
+            index = (shift << HALF_BITS) + (value >> shift)
+            if index >= BUCKETS:
+                index = BUCKETS - 1
+            self.counts[index] += 1
+        else:
+            self.counts[value] += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    @staticmethod
+    def bucket_value(index):
+        """Lowest value that falls in bucket index."""
+        shift = (index >> HALF_BITS) - 1
+        if shift <= 0:
+            return index
+        return (index - (shift << HALF_BITS)) << shift
+
+    def percentile(self, p):
+        count = self.count
+        if not count:
+            return 0
+        if p >= 100:
+            return self.max
+        target = max(1, -(-count * p // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self.bucket_value(index), self.max)
+        return self.max
+
+    def mean(self):
+        count = self.count
+        return self.total / count if count else 0.0
+
+    def reset(self):
+        self.counts = [0] * BUCKETS
+        self.total = self.max = 0
+
+
+class Metrics:
+    """Named counters, histograms and gauges, rendered together as text.
+
+    Histograms are registered with the unit they record and the unit they
+    are rendered in, e.g. ("ns", "us") for latencies. Gauges are callables
+    evaluated at render time; a gauge may return a dict of sub-values.
+    """
+
+    UNITS = {"ns": 1, "us": 1000, "ms": 1000000, "bytes": 1}
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def histogram(self, name, histogram=None, unit="ns", render_unit="us"):
+        """Get or register the histogram called name."""
+        entry = self.histograms.get(name)
+        if entry is None:
+            entry = (histogram or Histogram(), self.UNITS[unit] / self.UNITS[render_unit])
+            self.histograms[name] = entry
+        return entry[0]
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def _render_value(self, lines, name, value):
+        if isinstance(value, dict):
+            for key, sub in value.items():
+                self._render_value(lines, f"{name}_{key}", sub)
+        else:
+            lines.append(f"{name} {value}")
+
+    def render(self):
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name} {value}")
+        for name, fn in sorted(self.gauges.items()):
+            try:
+                value = fn()
+            except Exception as e:
+                lines.append(f"# {name} unavailable: {e}")
+                continue
+            self._render_value(lines, name, value)
+        for name, (histogram, scale) in sorted(self.histograms.items()):
+            base, _, labels = name.partition("{")
+            labels = labels.rstrip("}")
+            suffix = f"{{{labels}}}" if labels else ""
+            sep = "," if labels else ""
+            lines.append(f"{base}_count{suffix} {histogram.count}")
+            lines.append(f"{base}_sum{suffix} {histogram.total * scale:.1f}")
+            for quantile, p in QUANTILES:
+                lines.append(f'{base}{{{labels}{sep}quantile="{quantile}"}} {histogram.percentile(p) * scale:.1f}')
+            lines.append(f"{base}_max{suffix} {histogram.max * scale:.1f}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsEndpoint:
+    """Serve Metrics.render() at http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, metrics, host="127.0.0.1", port=9100):
+        metrics_ref = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics_ref.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsDumper:
+    """Write Metrics.render() to path every interval seconds, replacing the file atomically."""
+
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.dump()
+
+    def dump(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.metrics.render())
+        os.replace(temp_path, self.path)
+
+
+# Structured logging
+
+def log_event(logger, level, event, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, "%s %s", event, " ".join(f"{key}={value}" for key, value in fields.items()))
+
+
+def configure_logging(level=None):
+    """Log to stderr at level, or $GOLF_LOG_LEVEL, or INFO."""
+    level = level or os.environ.get("GOLF_LOG_LEVEL", "INFO")
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s %(message)s")
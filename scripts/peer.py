@@ -0,0 +1,217 @@
+"""Peer mode: the dealer's client hosts its table and the other players connect to it directly.
+
+When the tracker runs with peer tables, the "matched" message of a new table
+names its dealer as host. The dealer's client starts a PeerHost on its
+registered p_port; every other player opens a PeerLink to the host's ipv4
+and p_port from the same message and joins. The host is authoritative: it
+deals, applies every move, and fans the deltas out to the peers. The
+tracker hears a hole_result after each hole and the dealer's end after the
+last one, so in-game moves never reach it.
+
+The p_port speaks the tracker's framing and message shapes. A peer sends
+{"type": "join", "game_id", "player"} first; after that its moves
+(draw_card, discard_card, swap_card, resync) need no player field, since
+the connection already says who is moving. A hole ends when every hand is
+empty, when a draw finds the deck empty or when the host calls end_hole();
+the host then broadcasts hole_over with the hole and running totals and
+deals the next hole, or sends final_result after the last one. Scoring and
+redeals are the Table's, as on the tracker.
+"""
+import logging
+import socket
+import threading
+import time
+from broadcaster import Broadcaster
+from decks import new_seed, shuffled_deck
+from game_logic import SixCardGolfGame
+from game_manager import Table
+from metrics import log_event
+from protocol import MessageReader, send_message
+
+log = logging.getLogger("golf.peer")
+
+CONNECT_TIMEOUT = 5.0
+
+
+class PeerHost:
+    """Runs one table on the dealer's client and serves its peers on the p_port.
+
+    notify(message) sends a message to the tracker over the dealer's tracker
+    connection. on_message(message), if given, receives everything the peers
+    receive, so the dealer's own display stays in step.
+    """
+
+    def __init__(self, game_id, dealer, players, holes, port, notify, on_message=None, host="0.0.0.0",
+                 game_factory=SixCardGolfGame):
+        self.game_id = game_id
+        self.dealer = dealer
+        self.players = players
+        self.holes = holes
+        self.notify = notify
+        self.on_message = on_message
+        self.lock = threading.Lock()
+        self.broadcaster = Broadcaster()
+        self.table = Table(game_id, dealer, players, holes, game_factory(len(players)), [self.publish_delta])
+        self.table.game.current_player = self.table.first_player()
+        self.finished = threading.Event()
+        self.server_socket = socket.create_server((host, port))
+        self.moves = 0
+
+    def start(self):
+        self.publish(self.table.snapshot())
+        threading.Thread(target=self.accept_peers, daemon=True).start()
+        return self
+
+    def close(self):
+        self.finished.set()
+        try:
+            self.server_socket.close()
+        except OSError:
+            pass
+
+    # Fan-out
+
+    def publish(self, message, key=None):
+        self.broadcaster.publish(self.broadcaster.names(), message, key)
+        if self.on_message is not None:
+            self.on_message(message)
+
+    def publish_delta(self, table, delta):
+        """Table listener: send each move's delta to every peer."""
+        self.publish(delta)
+
+    # Peers
+
+    def accept_peers(self):
+        while not self.finished.is_set():
+            try:
+                sock, addr = self.server_socket.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self.handle_peer, args=(sock,), daemon=True).start()
+
+    def handle_peer(self, sock):
+        reader = MessageReader(sock)
+        player = None
+        try:
+            message = reader.recv()
+            player = message.get("player")
+            if message.get("type") != "join" or message.get("game_id") != self.game_id:
+                send_message(sock, {"status": "FAILURE", "reason": "Join this table first."})
+                raise ConnectionError("Peer did not join.")
+            if player not in self.players or player == self.dealer or player in self.broadcaster.channels:
+                send_message(sock, {"status": "FAILURE", "reason": "Player is not seated at this table."})
+                raise ConnectionError("Unknown player.")
+            with self.lock:
+                # Under the lock so the reply and the snapshot reach the peer before any delta.
+                self.broadcaster.add(player, sock)
+                self.broadcaster.reply(sock, {"status": "SUCCESS"})
+                self.broadcaster.publish([player], self.table.snapshot(), key=("game_state", self.game_id))
+            log_event(log, logging.INFO, "peer_joined", game_id=self.game_id, player=player)
+
+            while True:
+                message = reader.recv()
+                self.broadcaster.reply(sock, self.move(player, message))
+        except Exception as e:
+            log_event(log, logging.INFO, "peer_left", game_id=self.game_id, player=player, reason=e)
+            self.broadcaster.remove_socket(sock)
+            sock.close()
+
+    # Game
+
+    def move(self, player, message):
+        """Apply one move for player; the dealer's own moves are called directly."""
+        command = message.get("type")
+        with self.lock:
+            table = self.table
+            if command == "draw_card":
+                response = table.draw_card(player)
+                self.moves += 1
+                if response.get("hole_over"):
+                    self.finish_hole()
+                return response
+            if command == "discard_card":
+                response = table.discard_card(player, message.get("card"))
+                self.moves += 1
+                if response["status"] == "SUCCESS" and table.all_hands_empty():
+                    self.finish_hole()
+                return response
+            if command == "swap_card":
+                self.moves += 1
+                return table.swap_card(player, message.get("your_card"), message.get("drawn_card"))
+            if command == "resync":
+                return table.snapshot()
+        return {"status": "FAILURE", "reason": "Unknown command."}
+
+    def end_hole(self):
+        """End the current hole now, e.g. once the deck has run out; scores count the cards left."""
+        with self.lock:
+            self.finish_hole()
+
+    def finish_hole(self):
+        """Score the hole, report it to the tracker and deal the next one. Called with the lock held."""
+        table = self.table
+        hole = table.hole
+        seed = deck = None
+        if hole < self.holes:
+            seed = new_seed()
+            deck = shuffled_deck(seed)
+        with table.lock:
+            scores = table.end_hole(hole, seed, deck)
+        if scores is None:
+            return
+        scores = table.by_name(scores)
+        totals = table.by_name(table.totals)
+        self.publish({"type": "hole_over", "game_id": self.game_id, "hole": hole, "scores": scores,
+                      "totals": totals})
+        self.notify({"type": "hole_result", "game_id": self.game_id, "player": self.dealer, "hole": hole,
+                     "scores": scores})
+        log_event(log, logging.INFO, "hole_finished", game_id=self.game_id, hole=hole, scores=scores)
+        if not table.match_over():
+            self.publish(table.snapshot(), key=("game_state", self.game_id))
+            return
+        winner = min(totals, key=totals.get)
+        self.publish({"type": "final_result", "game_id": self.game_id, "totals": totals,
+                      "message": f"Game Over! Totals: {totals}. {winner} wins!"})
+        self.notify({"type": "end", "game_id": self.game_id, "player": self.dealer})
+        self.close()
+
+
+class PeerLink:
+    """A non-dealer's connection to the host of its table."""
+
+    def __init__(self, ipv4, p_port, game_id, player, timeout=CONNECT_TIMEOUT):
+        self.game_id = game_id
+        self.player = player
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.sock = socket.create_connection((ipv4, p_port), timeout=timeout)
+                break
+            except ConnectionRefusedError:
+                # The host starts listening when its own "matched" arrives, which may be after ours.
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = MessageReader(self.sock)
+        send_message(self.sock, {"type": "join", "game_id": game_id, "player": player})
+
+    def send(self, message):
+        send_message(self.sock, message)
+
+    def recv(self):
+        return self.reader.recv()
+
+    def close(self):
+        self.sock.close()
+
+
+def host_address(matched):
+    """(ipv4, p_port) of the host named in a "matched" message."""
+    for info in matched["players"]:
+        if info["name"] == matched["host"]:
+            return info["ipv4"], info["p_port"]
+    raise ValueError(f"Host {matched['host']} is not one of the table's players.")
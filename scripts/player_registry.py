@@ -0,0 +1,197 @@
+import random
+import threading
+
+
+class IndexedSet:
+    """Set with O(1) add, discard and random sampling (a list plus a position map)."""
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        index = self.positions.pop(item, None)
+        if index is None:
+            return
+        last = self.items.pop()
+        if index < len(self.items):
+            self.items[index] = last
+            self.positions[last] = index
+
+    def sample(self, k, rng=random):
+        return [self.items[i] for i in rng.sample(range(len(self.items)), k)]
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __len__(self):
+        return len(self.items)
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = {}
+        self.snapshot = ()
+
+
+class PlayerRegistry:
+    """Registered players, sharded by name, with status and game indexes.
+
+    Player records are dicts that are replaced, never mutated, so a reader
+    holding one always sees a consistent record. Each shard also publishes an
+    immutable tuple of its (name, record) pairs, rebuilt lazily after a
+    write, so queries never wait on writers for longer than one rebuild.
+
+    The free-player index and the player->game index share one lock, which
+    makes claiming players for a table atomic: two tables can never be
+    given the same free player.
+
+    Every listener is called as listener(name, record) after a player
+    registers or their record changes, and with record None after they
+    deregister. It runs under the player's shard lock, so a player's
+    changes reach it in order.
+    """
+
+    def __init__(self, shards=16):
+        self.shards = [_Shard() for _ in range(shards)]
+        self.status_lock = threading.Lock()
+        self.free = IndexedSet()
+        self.player_games = {}
+        self.listeners = []
+
+    def _shard(self, name):
+        return self.shards[hash(name) % len(self.shards)]
+
+    def _replace(self, name, **changes):
+        shard = self._shard(name)
+        with shard.lock:
+            record = shard.records.get(name)
+            if record is None:
+                return None
+            record = dict(record, **changes)
+            shard.records[name] = record
+            shard.snapshot = None
+            self._notify(name, record)
+            return record
+
+    def _notify(self, name, record):
+        for listener in self.listeners:
+            listener(name, record)
+
+    # Registration
+
+    def register(self, name, ipv4, t_port, p_port):
+        """Add a free player; returns False if the name is taken."""
+        shard = self._shard(name)
+        with shard.lock:
+            if name in shard.records:
+                return False
+            record = {"ipv4": ipv4, "t_port": t_port, "p_port": p_port, "status": "free"}
+            shard.records[name] = record
+            shard.snapshot = None
+            self._notify(name, record)
+        with self.status_lock:
+            self.free.add(name)
+        return True
+
+    def deregister(self, name):
+        """Remove a player; returns the removed record, or None if unknown."""
+        shard = self._shard(name)
+        with shard.lock:
+            record = shard.records.pop(name, None)
+            if record is None:
+                return None
+            shard.snapshot = None
+            self._notify(name, None)
+        with self.status_lock:
+            self.free.discard(name)
+            self.player_games.pop(name, None)
+        return record
+
+    # Lookups
+
+    def get(self, name):
+        return self._shard(name).records.get(name)
+
+    def __contains__(self, name):
+        return name in self._shard(name).records
+
+    def __len__(self):
+        return sum(len(shard.records) for shard in self.shards)
+
+    def game_of(self, name):
+        """The game a player is seated in, or None."""
+        return self.player_games.get(name)
+
+    def free_count(self):
+        return len(self.free)
+
+    def snapshot(self):
+        """All (name, record) pairs, assembled from the shards' immutable snapshots."""
+        items = []
+        for shard in self.shards:
+            snapshot = shard.snapshot
+            if snapshot is None:
+                with shard.lock:
+                    if shard.snapshot is None:
+                        shard.snapshot = tuple(shard.records.items())
+                    snapshot = shard.snapshot
+            items.extend(snapshot)
+        return items
+
+    # Status changes
+
+    def claim(self, dealer, n, rng=random):
+        """Atomically pick n random free players other than the dealer and mark
+        them and the dealer in-play. Returns the list with the dealer last, or
+        None if the dealer is not free or not enough other players are.
+        """
+        with self.status_lock:
+            if dealer not in self.free:
+                return None
+            self.free.discard(dealer)
+            if len(self.free) < n:
+                self.free.add(dealer)
+                return None
+            selected = self.free.sample(n, rng)
+            for name in selected:
+                self.free.discard(name)
+        selected.append(dealer)
+        for name in selected:
+            self._replace(name, status="in-play")
+        return selected
+
+    def reserve(self, name):
+        """Take a free player out of the free pool while they wait in matchmaking."""
+        with self.status_lock:
+            if name not in self.free:
+                return False
+            self.free.discard(name)
+        self._replace(name, status="queued")
+        return True
+
+    def seat(self, names, game_id):
+        """Mark reserved players in-play at game_id."""
+        for name in names:
+            self._replace(name, status="in-play")
+        self.assign_game(names, game_id)
+
+    def assign_game(self, names, game_id):
+        with self.status_lock:
+            for name in names:
+                self.player_games[name] = game_id
+
+    def release(self, names):
+        """Mark players free again and drop their game."""
+        for name in names:
+            if self._replace(name, status="free") is None:
+                continue
+            with self.status_lock:
+                self.player_games.pop(name, None)
+                self.free.add(name)
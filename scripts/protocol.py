@@ -0,0 +1,302 @@
+"""Length-prefixed binary wire protocol shared by the server and the client.
+
+Every frame is a 4-byte big-endian payload length followed by one encoded
+value (normally a message dict). Values use a one-byte tag:
+
+    0x00-0x08  None, True, False, int, str, list, dict, float, bytes
+    0x20-0x3F  small ints 0-31
+    0x40-0x73  cards 0-51 (see cards.CARD_NAMES)
+    0x80-0xFF  atoms: message types, field names and common string values
+
+Cards and atoms decode back to the same strings they were encoded from, so a
+message round-trips unchanged apart from tuples, which come back as lists.
+"""
+import struct
+from collections import deque
+from cards import CARD_NAMES
+
+MAX_FRAME_SIZE = 1024 * 1024
+# Lists and dicts nested deeper than this are rejected rather than recursed into.
+MAX_DEPTH = 32
+# A varint carries at most 70 bits in 10 bytes: enough for a 64-bit int and its sign.
+MAX_VARINT_BYTES = 10
+# A client with nothing else to send pings this often; the server drops a
+# connection that has been silent for IDLE_TIMEOUT.
+HEARTBEAT_INTERVAL = 20.0
+IDLE_TIMEOUT = 3 * HEARTBEAT_INTERVAL
+
+T_NONE = 0x00
+T_TRUE = 0x01
+T_FALSE = 0x02
+T_INT = 0x03
+T_STR = 0x04
+T_LIST = 0x05
+T_DICT = 0x06
+T_FLOAT = 0x07
+T_BYTES = 0x08
+
+SMALL_INT_BASE = 0x20
+SMALL_INT_COUNT = 32
+CARD_BASE = 0x40
+ATOM_BASE = 0x80
+
+# Append only: an atom's position is its wire value.
+ATOMS = [
+    # Field names
+    "type", "name", "ipv4", "t_port", "p_port", "player", "card", "your_card",
+    "drawn_card", "n", "holes", "game_id", "status", "reason", "players",
+    "games", "dealer", "message", "current_player", "discard_pile", "player_cards",
+    # Commands
+    "register", "draw_card", "swap_card", "discard_card", "query_players",
+    "query_games", "start_game", "end", "deregister", "de-register",
+    # Broadcasts and status values
+    "start", "game_state", "player_left", "game_over", "final_result",
+    "SUCCESS", "FAILURE", "free", "in-play",
+    # Delta updates
+    "delta", "version", "op", "seat", "draw", "discard", "swap", "resync",
+    # Matchmaking
+    "matchmake", "cancel_match", "matched", "match_timeout", "size", "position", "queued",
+    # Peer mode
+    "host", "join", "hole", "scores", "totals", "hole_result", "hole_over",
+    # Heartbeats
+    "ping", "pong", "game_abandoned",
+    # Views and spectators
+    "page", "page_size", "pages", "leaderboard", "leaders", "played", "wins", "best",
+    "spectate", "unspectate", "spectate_state", "hand_sizes", "hole_dealer", "game_ended",
+]
+
+_FRAME_HEADER = struct.Struct(">I")
+_FLOAT = struct.Struct(">d")
+
+_STRING_BYTES = {}
+_BYTE_VALUES = [None] * 256
+for _i in range(SMALL_INT_COUNT):
+    _BYTE_VALUES[SMALL_INT_BASE + _i] = _i
+for _code, _name in enumerate(CARD_NAMES):
+    _STRING_BYTES[_name] = CARD_BASE + _code
+    _BYTE_VALUES[CARD_BASE + _code] = _name
+for _index, _atom in enumerate(ATOMS):
+    _STRING_BYTES[_atom] = ATOM_BASE + _index
+    _BYTE_VALUES[ATOM_BASE + _index] = _atom
+
+
+class ProtocolError(ValueError):
+    """Raised when a peer sends a malformed or oversized frame."""
+
+
+class ConnectionClosed(ConnectionError):
+    """Raised by MessageReader.recv once the peer has closed the connection.
+
+    A message can itself decode to None, so end of stream is not a return value.
+    """
+
+
+def _write_varint(out, value):
+    if value >> (7 * MAX_VARINT_BYTES):
+        raise ProtocolError(f"Integer {value} does not fit in {MAX_VARINT_BYTES} varint bytes.")
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 7 * MAX_VARINT_BYTES:
+            raise ProtocolError(f"Varint longer than {MAX_VARINT_BYTES} bytes.")
+
+
+def _encode_value(value, out):
+    kind = type(value)
+    if kind is str:
+        code = _STRING_BYTES.get(value)
+        if code is not None:
+            out.append(code)
+        else:
+            data = value.encode("utf-8")
+            out.append(T_STR)
+            _write_varint(out, len(data))
+            out += data
+    elif kind is int:
+        if 0 <= value < SMALL_INT_COUNT:
+            out.append(SMALL_INT_BASE + value)
+        else:
+            out.append(T_INT)
+            _write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+    elif kind is dict:
+        out.append(T_DICT)
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            _encode_value(key, out)
+            _encode_value(item, out)
+    elif kind is list or kind is tuple:
+        out.append(T_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _encode_value(item, out)
+    elif value is None:
+        out.append(T_NONE)
+    elif value is True:
+        out.append(T_TRUE)
+    elif value is False:
+        out.append(T_FALSE)
+    elif kind is float:
+        out.append(T_FLOAT)
+        out += _FLOAT.pack(value)
+    elif kind is bytes or kind is bytearray:
+        out.append(T_BYTES)
+        _write_varint(out, len(value))
+        out += value
+    else:
+        raise ProtocolError(f"Cannot encode value of type {kind.__name__}.")
+
+
+def _decode_value(data, pos, depth=0):
+    tag = data[pos]
+    pos += 1
+    if tag >= SMALL_INT_BASE:
+        value = _BYTE_VALUES[tag]
+        if value is None:
+            raise ProtocolError(f"Unknown tag 0x{tag:02x}.")
+        return value, pos
+    if tag == T_STR:
+        length, pos = _read_varint(data, pos)
+        return bytes(data[pos:pos + length]).decode("utf-8"), pos + length
+    if tag == T_DICT or tag == T_LIST:
+        if depth >= MAX_DEPTH:
+            raise ProtocolError(f"Value nested deeper than {MAX_DEPTH} levels.")
+        count, pos = _read_varint(data, pos)
+        if tag == T_LIST:
+            result = []
+            for _ in range(count):
+                item, pos = _decode_value(data, pos, depth + 1)
+                result.append(item)
+            return result, pos
+        result = {}
+        for _ in range(count):
+            if data[pos] == T_DICT or data[pos] == T_LIST:
+                raise ProtocolError("Dict keys must be scalar values.")
+            key, pos = _decode_value(data, pos, depth + 1)
+            result[key], pos = _decode_value(data, pos, depth + 1)
+        return result, pos
+    if tag == T_INT:
+        raw, pos = _read_varint(data, pos)
+        return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1), pos
+    if tag == T_NONE:
+        return None, pos
+    if tag == T_TRUE:
+        return True, pos
+    if tag == T_FALSE:
+        return False, pos
+    if tag == T_FLOAT:
+        return _FLOAT.unpack_from(data, pos)[0], pos + 8
+    if tag == T_BYTES:
+        length, pos = _read_varint(data, pos)
+        return bytes(data[pos:pos + length]), pos + length
+    raise ProtocolError(f"Unknown tag 0x{tag:02x}.")
+
+
+def encode_payload(message):
+    """Encode a message without the length prefix."""
+    out = bytearray()
+    _encode_value(message, out)
+    return bytes(out)
+
+
+def decode_payload(data, start=0, end=None):
+    """Decode one message from data[start:end]."""
+    if end is None:
+        end = len(data)
+    try:
+        message, pos = _decode_value(data, start)
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise ProtocolError(f"Truncated or corrupt payload: {e}") from e
+    if pos != end:
+        raise ProtocolError("Payload length does not match frame length.")
+    return message
+
+
+def encode_message(message):
+    """Encode a message as a complete length-prefixed frame."""
+    out = bytearray(4)
+    _encode_value(message, out)
+    _FRAME_HEADER.pack_into(out, 0, len(out) - 4)
+    return bytes(out)
+
+
+def decode_message(frame):
+    """Decode a single complete frame produced by encode_message."""
+    (length,) = _FRAME_HEADER.unpack_from(frame)
+    if length + 4 != len(frame):
+        raise ProtocolError("Frame length does not match header.")
+    return decode_payload(frame, 4)
+
+
+def frame_length(header, max_frame_size=MAX_FRAME_SIZE):
+    """Return the payload length announced by a 4-byte frame header."""
+    (length,) = _FRAME_HEADER.unpack(header)
+    if length > max_frame_size:
+        raise ProtocolError(f"Frame of {length} bytes exceeds limit of {max_frame_size}.")
+    return length
+
+
+class FrameDecoder:
+    """Incremental decoder: feed it whatever recv() returned, get back whole messages."""
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE, frame_sizes=None):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+        # Optional metrics.Histogram of incoming frame lengths
+        self.frame_sizes = frame_sizes
+
+    def feed(self, data):
+        """Buffer data and return every message it completes, in order."""
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        pos = 0
+        available = len(buffer)
+        while available - pos >= 4:
+            length = frame_length(buffer[pos:pos + 4], self.max_frame_size)
+            end = pos + 4 + length
+            if end > available:
+                break
+            messages.append(decode_payload(buffer, pos + 4, end))
+            if self.frame_sizes is not None:
+                self.frame_sizes.record(length)
+            pos = end
+        if pos:
+            del buffer[:pos]
+        return messages
+
+
+class MessageReader:
+    """Blocking message reader for a plain socket."""
+
+    def __init__(self, sock, bufsize=4096, max_frame_size=MAX_FRAME_SIZE, frame_sizes=None):
+        self.sock = sock
+        self.bufsize = bufsize
+        self.decoder = FrameDecoder(max_frame_size, frame_sizes)
+        self.pending = deque()
+
+    def recv(self):
+        """Return the next message; raises ConnectionClosed once the peer has closed the connection."""
+        while not self.pending:
+            data = self.sock.recv(self.bufsize)
+            if not data:
+                raise ConnectionClosed("Connection closed by peer.")
+            self.pending.extend(self.decoder.feed(data))
+        return self.pending.popleft()
+
+
+def send_message(sock, message):
+    """Encode message and write the whole frame to sock."""
+    sock.sendall(encode_message(message))
@@ -1,175 +1,399 @@
+import logging
 import socket
+import sys
 import threading
-import pickle
-import random
-from game_logic import SixCardGolfGame
+import time
+from time import perf_counter_ns
+from game_manager import GameManager
+from journal import Journal, recover
+from matchmaking import MatchmakingQueue
+from player_registry import PlayerRegistry
+from broadcaster import Broadcaster
+from metrics import Metrics, MetricsDumper, MetricsEndpoint, configure_logging, log_event
+from protocol import IDLE_TIMEOUT, MessageReader
+from timer_wheel import TimerWheel
+from views import Views, public_delta
+
+log = logging.getLogger("golf.server")
+
+# Command latencies are timed on one dispatch in COMMAND_SAMPLE_EVERY; every
+# dispatch is still counted in golf_commands.
+COMMAND_SAMPLE_EVERY = 4
+# A reported hole score; nine of them still fit the journal's unsigned 16-bit totals.
+MAX_HOLE_SCORE = 0xFFFF // 9
 
 class GameServer:
-    def __init__(self, host='192.168.1.160', port=7500):
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind((host, port))
-        self.games = {}
-        self.server_socket.listen(5)
-        print(f"Server started on {host}:{port}")
-
-        self.players = {}
-        self.clients = []
-
-        self.game_started = False
-        self.game_logic = None
-        
-        # Start accepting client connections
-        self.start_server()
+    def __init__(self, host='192.168.1.160', port=7500, serve=True, game_manager=None,
+                 max_queue=256, slow_client_policy="coalesce", journal_path=None,
+                 metrics_port=None, metrics_file=None, instrument=True, peer_tables=False,
+                 idle_timeout=IDLE_TIMEOUT, max_replies=64):
+        self.instrument = instrument
+        self.peer_tables = peer_tables
+        self.max_replies = max_replies
+        # Connections silent for idle_timeout are dropped; None keeps them forever.
+        self.reaper = TimerWheel(idle_timeout) if idle_timeout else None
+        self.evictions = 0
+        self.metrics = Metrics()
+        self.open_connections = 0
+        self.dispatched = 0
+        self.game_manager = game_manager or GameManager()
+        self.views = Views()
+        self.game_manager.table_listeners.append(self.views.on_table)
+        # Spectator name -> the game ID they are watching; the lock orders changes to a table's spectators.
+        self.spectating = {}
+        self.spectator_lock = threading.Lock()
+        self.journal = None
+        if journal_path:
+            self.open_journal(journal_path)
+        self.game_manager.listeners.append(self.publish_delta)
+        self.registry = PlayerRegistry()
+        self.registry.listeners.append(self.views.on_player)
+        self.broadcaster = self.create_broadcaster(max_queue, slow_client_policy)
+        self.matchmaking = MatchmakingQueue(self.form_matched_table, self.on_match_expired)
+
+        self.command_handlers = {
+            "register": self.on_register,
+            "draw_card": self.on_draw_card,
+            "swap_card": self.on_swap_card,
+            "discard_card": self.on_discard_card,
+            "query_players": self.on_query_players,
+            "query_games": self.on_query_games,
+            "start_game": self.on_start_game,
+            "end": self.on_end,
+            "deregister": self.on_deregister,
+            "resync": self.on_resync,
+            "matchmake": self.on_matchmake,
+            "cancel_match": self.on_cancel_match,
+            "hole_result": self.on_hole_result,
+            "ping": self.on_ping,
+            "leaderboard": self.on_leaderboard,
+            "spectate": self.on_spectate,
+            "unspectate": self.on_unspectate,
+        }
+        self.command_latency = {}
+        self.request_bytes = None
+        if instrument:
+            self.register_metrics()
+        if metrics_port:
+            MetricsEndpoint(self.metrics, port=metrics_port).start()
+        if metrics_file:
+            MetricsDumper(self.metrics, metrics_file).start()
+
+        if serve:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server_socket.bind((host, port))
+            self.server_socket.listen(5)
+            log_event(log, logging.INFO, "server_started", host=host, port=port)
+
+            # Start accepting client connections
+            self.start_server()
+
+    def open_journal(self, path):
+        """Rebuild the tables logged in path, then journal every table event from here on."""
+        tables, stats = recover(path, self.game_manager.game_factory, self.game_manager.listeners)
+        self.game_manager.restore(tables.values(), stats["last_game"])
+        self.journal = Journal(path)
+        self.journal.checkpoint(tables.values(), stats["last_game"])
+        self.game_manager.use_journal(self.journal)
+        log_event(log, logging.INFO, "journal_recovered", path=path, tables=stats["tables"],
+                  moves_replayed=stats["moves_replayed"])
+
+    def register_metrics(self):
+        """Latency histograms per command, message sizes, fan-out time and live gauges."""
+        for command in self.command_handlers:
+            self.command_latency[command] = self.metrics.histogram(f'golf_command_latency_us{{command="{command}"}}')
+        self.request_bytes = self.metrics.histogram("golf_request_bytes", unit="bytes", render_unit="bytes")
+        self.metrics.histogram("golf_broadcast_fanout_us", self.broadcaster.fanout_time)
+        self.metrics.histogram("golf_broadcast_frame_bytes", self.broadcaster.frame_bytes, "bytes", "bytes")
+        self.metrics.gauge("golf_commands", lambda: self.dispatched)
+        self.metrics.gauge("golf_connections", self.active_connections)
+        self.metrics.gauge("golf_idle_evictions", lambda: self.evictions)
+        self.metrics.gauge("golf_players", lambda: len(self.registry))
+        self.metrics.gauge("golf_tables", lambda: len(self.game_manager))
+        self.metrics.gauge("golf_broadcast", self.broadcaster.metrics)
+        self.metrics.gauge("golf_matchmaking", self.matchmaking.metrics)
+        self.metrics.gauge("golf_views", self.views.metrics)
+        if self.journal is not None:
+            self.metrics.gauge("golf_journal", self.journal.metrics)
+
+    def active_connections(self):
+        return self.open_connections
 
     def start_server(self):
+        if self.reaper is not None:
+            threading.Thread(target=self.run_reaper, daemon=True).start()
         while True:
             client_socket, addr = self.server_socket.accept()
-            print(f"Connection from {addr}")
+            # Replies and broadcasts are small frames; don't hold them back for Nagle.
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            log_event(log, logging.DEBUG, "connection_opened", peer=addr)
 
             # Start a new thread to handle the client
             threading.Thread(target=self.handle_client, args=(client_socket,)).start()
 
     def handle_client(self, client_socket):
+        reader = MessageReader(client_socket, frame_sizes=self.request_bytes)
+        reaper = self.reaper
+        self.open_connections += 1
+        if reaper is not None:
+            reaper.add(client_socket)
         while True:
             try:
-                message = pickle.loads(client_socket.recv(1024))
-                command_type = message.get("type")
-
-                if command_type == "register":
-                    player_name = message.get("name")
-                    ipv4 = message.get("ipv4")
-                    t_port = message.get("t_port")
-                    p_port = message.get("p_port")
-                    response = self.register_player(player_name, client_socket, ipv4, t_port, p_port)
-                    client_socket.send(pickle.dumps(response))
-                elif command_type == "draw_card":
-                    player = message.get("player")
-                    response = self.handle_draw_card(player)
-                    client_socket.send(pickle.dumps(response))
-                elif command_type == "swap_card":
-                    your_card = message.get("your_card")
-                    drawn_card = message.get("drawn_card")
-                    player = message.get("player")
-                    response = self.handle_swap_card(player, your_card, drawn_card)
-                    client_socket.send(pickle.dumps(response))
-                elif command_type == "discard_card":
-                    card = message.get("card")
-                    player = message.get("player")
-                    response = self.handle_discard_card(player, card)
-                    client_socket.send(pickle.dumps(response))
-                elif command_type == "query_players":
-                    response = self.query_players()
-                    client_socket.send(pickle.dumps(response))
-                elif command_type == "start_game":
-                    print("Starting game...")
-                    player = message.get("player")
-                    n = message.get("n")
-                    holes = message.get("holes", 9)
-                    while True:
-                        try:
-                            self.num_players = int(input("Enter the number of players (2, 3, or 4): "))
-                            if self.num_players in [2, 3, 4]:
-                                break
-                            else:
-                                print("Please select a valid option: 2, 3, or 4")
-                        except ValueError:
-                            print("Invalid input. Please enter a number.")
-
-                    self.game_logic = SixCardGolfGame(self.num_players)
-                    response = self.start_game(player,n,holes)
-                    client_socket.send(pickle.dumps(response))
-                    while len(self.players) < self.num_players:
-                        print("Waiting for players to connect...")
-                        client_socket, client_address = self.server_socket.accept()
-                        print(f"Player connected from {client_address}")
-                        threading.Thread(target=self.handle_client, args=(client_socket,)).start()
-                    while True:
-                        data = client_socket.recv(4096)
-                        if data:
-                            action = pickle.loads(data)
-                        if action['type'] == 'draw_card':
-                            self.handle_draw_card(player)
-                        elif action['type'] == 'discard_card':
-                            self.handle_discard_card(player, action['card'])
-                        elif action['type'] == 'de-register':
-                            self.handle_de_register(player, client_socket)
-                        break
-                
-                elif command_type == "query_games":
-                    response = self.query_games()
-                    client_socket.send(pickle.dumps(response))
-                elif command_type == "end":
-                    game_id = message.get("game_id")
-                    player = message.get("player")
-                    response = self.end_game(game_id, player)
-                    client_socket.send(pickle.dumps(response))
-                elif command_type == "deregister":
-                    player_name = message.get("name")
-                    response = self.deregister_player(player_name)
-                    client_socket.send(pickle.dumps(response))
+                message = reader.recv()
+                if reaper is not None:
+                    reaper.touch(client_socket)
+                self.dispatch(message, client_socket)
 
             except Exception as e:
-                print(f"Error handling client message: {e}")
+                log_event(log, logging.INFO, "connection_closed", reason=e)
+                self.open_connections -= 1
+                self.connection_closed(client_socket)
                 client_socket.close()
                 break
 
+    def create_broadcaster(self, max_queue, policy):
+        return Broadcaster(max_queue, policy, on_disconnect=self.on_slow_client, instrument=self.instrument,
+                           max_replies=self.max_replies)
+
+    # Idle connections
+
+    def run_reaper(self):
+        while True:
+            time.sleep(self.reaper.resolution)
+            self.reap_idle()
+
+    def reap_idle(self):
+        """Drop every connection that has been silent for the idle timeout."""
+        for sock in self.reaper.expire():
+            self.evictions += 1
+            channel = self.broadcaster.by_socket.get(sock)
+            log_event(log, logging.INFO, "connection_idle", player=channel.name if channel else None)
+            self.drop_idle(sock)
+
+    def drop_idle(self, sock):
+        """Make the connection's reader see it close; its own cleanup then runs as for any close."""
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def connection_closed(self, sock):
+        """Forget a connection that has closed, and the player registered on it."""
+        channel = self.broadcaster.by_socket.get(sock)
+        self.broadcaster.remove_socket(sock)
+        if self.reaper is not None:
+            self.reaper.remove(sock)
+        if channel is not None and self.broadcaster.channels.get(channel.name) is None:
+            self.evict_player(channel.name)
+
+    def evict_player(self, player_name):
+        """Remove a player whose connection is gone, wherever they were.
+
+        A queued player leaves the queue. A seated player's table cannot go on
+        with an empty seat, so it ends and the others are told why. Unlike a
+        deregister, an eviction is not announced to every player.
+        """
+        table = self.game_manager.table_for(player_name)
+        if table is not None:
+            self.abandon_table(table, player_name)
+        self.stop_spectating(player_name)
+        if player_name not in self.registry:
+            return
+        self.matchmaking.cancel(player_name)
+        self.registry.deregister(player_name)
+        log_event(log, logging.INFO, "player_evicted", player=player_name)
+
+    def abandon_table(self, table, player_name):
+        self.broadcast_public(table, {"type": "game_abandoned", "game_id": table.game_id,
+                                     "message": f"Player {player_name} disconnected; the game has ended."})
+        self.end_game(table.game_id, table.dealer)
+
+    def on_slow_client(self, player_name):
+        """Broadcaster callback for a client it had to disconnect."""
+        self.deregister_player(player_name)
+
+    def dispatch(self, message, client_socket):
+        """Run the handler for a decoded message and send its response back."""
+        command = message.get("type")
+        handler = self.command_handlers.get(command)
+        if handler is None:
+            self.metrics.incr("golf_unknown_commands")
+            return
+        self.dispatched += 1
+        histogram = self.command_latency.get(command)
+        if histogram is None or self.dispatched % COMMAND_SAMPLE_EVERY:
+            self.broadcaster.reply(client_socket, handler(message, client_socket))
+            return
+        started = perf_counter_ns()
+        response = handler(message, client_socket)
+        self.broadcaster.reply(client_socket, response)
+        histogram.record(perf_counter_ns() - started)
+
+    def on_register(self, message, client_socket):
+        player_name = message.get("name")
+        ipv4 = message.get("ipv4")
+        t_port = message.get("t_port")
+        p_port = message.get("p_port")
+        return self.register_player(player_name, client_socket, ipv4, t_port, p_port)
+
+    def on_draw_card(self, message, client_socket):
+        player = message.get("player")
+        return self.handle_draw_card(player)
+
+    def on_swap_card(self, message, client_socket):
+        your_card = message.get("your_card")
+        drawn_card = message.get("drawn_card")
+        player = message.get("player")
+        return self.handle_swap_card(player, your_card, drawn_card)
+
+    def on_discard_card(self, message, client_socket):
+        card = message.get("card")
+        player = message.get("player")
+        return self.handle_discard_card(player, card)
+
+    def on_query_players(self, message, client_socket):
+        return self.query_view("players", message.get("page", 0), message.get("page_size"))
+
+    def on_query_games(self, message, client_socket):
+        return self.query_view("games", message.get("page", 0), message.get("page_size"))
+
+    def on_leaderboard(self, message, client_socket):
+        return self.query_view("leaders", message.get("page", 0), message.get("page_size"))
+
+    def on_spectate(self, message, client_socket):
+        player = message.get("player")
+        game_id = message.get("game_id")
+        return self.spectate(player, game_id)
+
+    def on_unspectate(self, message, client_socket):
+        player = message.get("player")
+        if not self.stop_spectating(player):
+            return {"status": "FAILURE", "reason": "Player is not spectating."}
+        return {"status": "SUCCESS"}
+
+    def on_start_game(self, message, client_socket):
+        player = message.get("player")
+        n = message.get("n")
+        holes = message.get("holes", 9)
+        return self.start_game(player, n, holes)
+
+    def on_end(self, message, client_socket):
+        game_id = message.get("game_id")
+        player = message.get("player")
+        return self.end_game(game_id, player)
+
+    def on_deregister(self, message, client_socket):
+        player_name = message.get("name")
+        return self.deregister_player(player_name)
+
+    def on_resync(self, message, client_socket):
+        table = self.game_manager.get(message.get("game_id"))
+        if table is None:
+            return {"status": "FAILURE", "reason": "Game identifier not found."}
+        return table.snapshot()
+
+    def on_matchmake(self, message, client_socket):
+        player = message.get("player")
+        size = message.get("size")
+        holes = message.get("holes", 9)
+        return self.matchmake(player, size, holes)
+
+    def on_cancel_match(self, message, client_socket):
+        player = message.get("player")
+        return self.cancel_match(player)
+
+    def on_ping(self, message, client_socket):
+        # The reader's touch already counted it; "pong" lets the client tell this reply apart.
+        return {"status": "SUCCESS", "pong": True}
+
+    def on_hole_result(self, message, client_socket):
+        game_id = message.get("game_id")
+        player = message.get("player")
+        return self.record_hole(game_id, player, message.get("hole"), message.get("scores"))
+
     def register_player(self, player_name, client_socket, ipv4, t_port, p_port):
         if len(player_name) > 15 or not player_name.isalpha():
             return {"status": "FAILURE", "reason": "Invalid player name."}
         if not (7501 <= t_port <= 7999 and 7501 <= p_port <= 7999):
             return {"status": "FAILURE", "reason": "Ports must be in the range [7501, 7999]."}
-        if player_name in self.players:
+        if not self.registry.register(player_name, ipv4, t_port, p_port):
             return {"status": "FAILURE", "reason": "Player already registered."}
 
-        self.players[player_name] = {
-            "ipv4": ipv4,
-            "t_port": t_port,
-            "p_port": p_port,
-            "status": "free"
-        }
-        self.clients.append((client_socket, player_name))
-        print(f"Player {player_name} registered with IP {ipv4}, T-port {t_port}, P-port {p_port}.")
+        self.broadcaster.add(player_name, client_socket)
+        table = self.game_manager.table_for(player_name)
+        if table is not None:
+            # Back at a table recovered from the journal
+            self.registry.reserve(player_name)
+            self.registry.seat([player_name], table.game_id)
+        log_event(log, logging.INFO, "player_registered", player=player_name, ipv4=ipv4, t_port=t_port, p_port=p_port)
         return {"status": "SUCCESS"}
 
     def deregister_player(self, player_name):
-        if player_name not in self.players:
+        if player_name not in self.registry:
             return {"status": "FAILURE", "reason": "Player not registered."}
 
-        # Check if the player is the dealer of any ongoing game
-        for game_id, game_info in self.games.items():
-            if player_name == game_info["dealer"]:
+        if self.matchmaking.cancel(player_name):
+            self.registry.release([player_name])
+
+        # Check if the player is the dealer of or playing in an ongoing game
+        table = self.game_manager.get(self.registry.game_of(player_name))
+        if table is not None:
+            if player_name == table.dealer:
                 return {"status": "FAILURE", "reason": "Player is the dealer of an ongoing game."}
-            elif player_name in game_info["players"]:
-                return {"status": "FAILURE", "reason": "Player is involved in an ongoing game."}
+            return {"status": "FAILURE", "reason": "Player is involved in an ongoing game."}
 
         # Remove the player
-        del self.players[player_name]
-        print(f"Player ({player_name}) has left the game.")
+        self.stop_spectating(player_name)
+        self.registry.deregister(player_name)
+        log_event(log, logging.INFO, "player_deregistered", player=player_name)
         self.broadcast({"type": "player_left", "message": f"Player {player_name} has left the game."})
         return {"status": "SUCCESS"}
 
-    def query_players(self):
-        player_info = list(self.players.items())
-        return {"status": len(player_info), "players": player_info}
+    def query_view(self, name, page, page_size):
+        """One page of the players, games or leaders view, as a frame encoded once per version of the view."""
+        if type(page) is not int or page < 0:
+            return {"status": "FAILURE", "reason": "Invalid page."}
+        if page_size is not None and (type(page_size) is not int or page_size < 1):
+            return {"status": "FAILURE", "reason": "Invalid page size."}
+        return self.read_views()[name].page(page, page_size)
 
-    def query_games(self):
-        if not self.games:
-            return {"status": 0, "games": []}
-        
-        ongoing_games = []
-        for game_id, game_info in self.games.items():
-            game_details = {
-                "game_id": game_id,
-                "dealer": game_info["dealer"],
-                "players": game_info["players"]
-            }
-            ongoing_games.append(game_details)
-        
-        return {"status": len(ongoing_games), "games": ongoing_games}
+    def read_views(self):
+        """The views that queries are answered from."""
+        return self.views
+
+    def spectate(self, player, game_id):
+        """Stream a table's public state to a registered player, instead of any table they watched before."""
+        if player not in self.registry:
+            return {"status": "FAILURE", "reason": "Player is not registered."}
+        table = self.game_manager.get(game_id)
+        if table is None:
+            return {"status": "FAILURE", "reason": "Game identifier not found."}
+        if table.host is not None:
+            return {"status": "FAILURE", "reason": "This table is hosted by its dealer; the tracker does not see its moves."}
+        self.stop_spectating(player)
+        with table.lock:
+            # Under the table lock the opening state and the deltas that follow it arrive in version order.
+            with self.spectator_lock:
+                table.spectators = table.spectators | {player}
+                self.spectating[player] = game_id
+            self.broadcaster.publish([player], self.views.public_frame(table))
+        log_event(log, logging.DEBUG, "spectator_joined", game_id=game_id, player=player)
+        return {"status": "SUCCESS", "game_id": game_id}
+
+    def stop_spectating(self, player):
+        """Stop streaming a table to player; returns False if they were not watching one."""
+        with self.spectator_lock:
+            game_id = self.spectating.pop(player, None)
+            if game_id is None:
+                return False
+            table = self.game_manager.get(game_id)
+            if table is not None:
+                # Not the table lock: a spectator can be dropped while a move's delta is sent to them.
+                table.spectators = table.spectators - {player}
+        return True
 
     def start_game(self, player, n, holes):
-        print(f"Starting game with player: {player}, n: {n}, holes: {holes}")
-        if player not in self.players:
+        if player not in self.registry:
             return {"status": "FAILURE", "reason": "Player is not registered."}
         
         if not 1 <= n <= 3:
@@ -178,117 +402,219 @@ class GameServer:
         if not 1 <= holes <= 9:
             return {"status": "FAILURE", "reason": "Invalid number of holes."}
         
-        free_players = [p for p in self.players if p != player and self.players[p].get("status") == "free"]
-        if len(free_players) < n:
+        # Picks the players and marks them in-play in one step; the dealer comes last
+        selected_players = self.registry.claim(player, n)
+        if selected_players is None:
+            if (self.registry.get(player) or {}).get("status") != "free":
+                return {"status": "FAILURE", "reason": "Player is not free to start a game."}
             return {"status": "FAILURE", "reason": "Not enough free players available."}
-        
-        selected_players = random.sample(free_players, n)
-        selected_players.append(player)  # Add the dealer to the list of players
 
-        print(f"Selected players: {selected_players}")
-        
-        game_id = self.generate_game_id()
-        
-        # Update player status
-        for p in selected_players:
-            self.players[p]["status"] = "in-play"
-
-        self.games[game_id] = {
-            "dealer": player,
-            "players": selected_players,
-            "holes": holes,
-            "status": "in-play"
-        }
-        
-        self.game_logic = SixCardGolfGame(len(selected_players))
-        self.game_logic.players = selected_players
-        
-        player_info = [
-            {"name": p, "ipv4": self.players[p]["ipv4"], "p_port": self.players[p]["p_port"]}
-            for p in selected_players
-        ]
-        print("Starting the game...")
-        self.broadcast({"type": "start", "message": "Game is starting!"})
-        self.broadcast_game_state()
-        
+        table = self.game_manager.create_table(player, selected_players, holes)
+        self.registry.assign_game(selected_players, table.game_id)
+
+        player_info = self.player_info(selected_players)
+        log_event(log, logging.INFO, "game_started", game_id=table.game_id, dealer=player,
+                  players=",".join(selected_players), holes=holes, seed=table.seed)
+        self.broadcast_table(table, {"type": "start", "game_id": table.game_id, "message": "Game is starting!"})
+        self.broadcast_game_state(table)
+
         return {
             "status": "SUCCESS",
-            "game_id": game_id,
+            "game_id": table.game_id,
+            "players": player_info
+        }
+
+    def player_info(self, names):
+        info = []
+        for p in names:
+            record = self.registry.get(p) or {}
+            info.append({"name": p, "ipv4": record.get("ipv4"), "p_port": record.get("p_port")})
+        return info
+
+    def matchmake(self, player, size, holes):
+        """Queue a free player for a table of `size` players and `holes` holes."""
+        if player not in self.registry:
+            return {"status": "FAILURE", "reason": "Player is not registered."}
+        if not self.registry.reserve(player):
+            return {"status": "FAILURE", "reason": "Player is not free."}
+        response = self.matchmaking.enqueue(player, size, holes)
+        if response["status"] != "SUCCESS":
+            self.registry.release([player])
+            return response
+        self.start_matchmaking()
+        return response
+
+    def cancel_match(self, player):
+        if not self.matchmaking.cancel(player):
+            return {"status": "FAILURE", "reason": "Player is not queued."}
+        self.registry.release([player])
+        return {"status": "SUCCESS"}
+
+    def start_matchmaking(self):
+        self.matchmaking.start()
+
+    def form_matched_table(self, requests):
+        """MatchmakingQueue callback: seat a matched group; the longest-waiting player deals."""
+        players = [request.player for request in requests]
+        dealer = players[0]
+        table = self.game_manager.create_table(dealer, players, requests[0].holes)
+        if self.peer_tables:
+            table.host = dealer
+        self.registry.seat(players, table.game_id)
+        log_event(log, logging.INFO, "game_matched", game_id=table.game_id, dealer=dealer,
+                  players=",".join(players), holes=table.holes, seed=table.seed)
+        self.announce_match(table, self.player_info(players))
+
+    def announce_match(self, table, player_info):
+        """Tell a matched table who is playing, then start it with the opening state."""
+        matched = {
+            "type": "matched",
+            "game_id": table.game_id,
+            "dealer": table.dealer,
             "players": player_info
         }
+        if table.host is not None:
+            matched["host"] = table.host
+            matched["holes"] = table.holes
+        self.broadcast_table(table, matched)
+        if table.host is not None:
+            # The host's client deals and starts the game; players connect to its p_port.
+            return
+        self.broadcast_table(table, {"type": "start", "game_id": table.game_id, "message": "Game is starting!"})
+        self.broadcast_game_state(table)
+
+    def on_match_expired(self, request):
+        self.registry.release([request.player])
+        self.broadcaster.publish([request.player], {
+            "type": "match_timeout",
+            "message": "No table could be formed in time; you have been removed from the queue."
+        })
 
     def end_game(self, game_id, player):
-        if game_id not in self.games:
-            print(f"FAILURE: Game identifier '{game_id}' not found.")
+        table = self.game_manager.get(game_id)
+        if table is None:
             return {"status": "FAILURE", "reason": "Game identifier not found."}
-        
-        game_info = self.games[game_id]
-        if game_info["dealer"] != player:
-            print(f"FAILURE: Player '{player}' is not the dealer for game '{game_id}'.")
+
+        if table.dealer != player:
             return {"status": "FAILURE", "reason": "Player is not the dealer."}
-        
+
         # Remove the game and update player statuses
-        for p in game_info["players"]:
-            self.players[p]["status"] = "free"
-        del self.games[game_id]
-        
-        print(f"SUCCESS: Game '{game_id}' ended by dealer '{player}'.")
+        self.game_manager.remove_table(game_id)
+        self.registry.release(table.players)
+        with self.spectator_lock:
+            spectators = table.spectators
+            for name in spectators:
+                if self.spectating.get(name) == game_id:
+                    del self.spectating[name]
+        if spectators:
+            # Published outside spectator_lock: dropping a slow spectator takes it again.
+            self.broadcaster.publish(spectators, {"type": "game_ended", "game_id": game_id,
+                                                  "message": "The game has ended."})
+
+        log_event(log, logging.INFO, "game_ended", game_id=game_id, dealer=player)
         return {"status": "SUCCESS"}
 
-    def generate_game_id(self):
-        return f"game_{len(self.games) + 1}"
-    
+    def record_hole(self, game_id, player, hole, scores):
+        """A peer table's host reporting the scores of a finished hole."""
+        table = self.game_manager.get(game_id)
+        if table is None:
+            return {"status": "FAILURE", "reason": "Game identifier not found."}
+        if table.host != player:
+            return {"status": "FAILURE", "reason": "Player is not the host of this table."}
+        if (not isinstance(scores, dict) or scores.keys() != set(table.players)
+                or not all(type(score) is int and 0 <= score <= MAX_HOLE_SCORE for score in scores.values())):
+            return {"status": "FAILURE", "reason": "Invalid hole scores."}
+        with table.lock:
+            if hole != len(table.hole_scores) + 1 or hole > table.holes:
+                return {"status": "FAILURE", "reason": "Unexpected hole number."}
+            table.hole_scores.append(scores)
+        log_event(log, logging.INFO, "hole_finished", game_id=game_id, hole=hole, scores=scores)
+        if hole == table.holes:
+            totals = dict.fromkeys(table.players, 0)
+            for hole_scores in table.hole_scores:
+                for name, score in hole_scores.items():
+                    totals[name] += score
+            self.record_match(table, totals)
+        return {"status": "SUCCESS"}
+
+    def record_match(self, table, totals):
+        """Enter a finished match's {name: total} on the leaderboard."""
+        self.views.record_match(totals)
+
     def handle_draw_card(self, player):
-        card = self.game_logic.draw_card()
-        if card:
-            print(f"Player {player} drew a card: {card}")
-            self.game_logic.players_cards[player].append(card)
-            self.broadcast_game_state()
+        table = self.game_manager.table_for(player)
+        if table is None:
+            return {"status": "FAILURE", "reason": "Player is not in a game."}
+        if table.host is not None:
+            return {"status": "FAILURE", "reason": "This table is hosted by its dealer; send moves to the host."}
+        hole = table.hole
+        response = table.draw_card(player)
+        if response["status"] == "SUCCESS":
+            log_event(log, logging.DEBUG, "card_drawn", player=player, card=response["card"])
+        elif response.get("hole_over") and not table.match_over():
+            self.finish_hole(table, hole)
+        return response
 
     def handle_discard_card(self, player, card):
-        if self.game_logic.current_player != player:
-            return {"status": "FAILURE", "reason": "It's not your turn."}
-        
-        if card in self.game_logic.players_cards[player]:
-            print(f"Player {player} discarded card: {card}")
-            self.game_logic.discard_card(player, card)
-            
-            if len(self.game_logic.players_cards[player]) == 0:
-                print(f"Player {player} has no more cards left.")
-                self.broadcast({"type": "game_over", "message": f"Player {player} has finished all cards!"})
-                
-                # Check if all players have finished their cards
-                if all(len(cards) == 0 for cards in self.game_logic.players_cards.values()):
-                    scores = self.calculate_scores()
-                    winner_id = min(scores, key=scores.get)
-                    result_message = f"Game Over! Scores: {scores}. Player {winner_id} wins!"
-                    self.broadcast({"type": "final_result", "message": result_message})
-                    self.end_game(self.generate_game_id(), self.games[self.generate_game_id()]["dealer"])
-            else:
-                self.game_logic.end_turn()
-                self.broadcast_game_state()
-            
-            return {"status": "SUCCESS"}
-        else:
-            return {"status": "FAILURE", "reason": "Card not in player's hand."}
+        table = self.game_manager.table_for(player)
+        if table is None:
+            return {"status": "FAILURE", "reason": "Player is not in a game."}
+        if table.host is not None:
+            return {"status": "FAILURE", "reason": "This table is hosted by its dealer; send moves to the host."}
+
+        hole = table.hole
+        response = table.discard_card(player, card)
+        if response["status"] != "SUCCESS":
+            return response
+        log_event(log, logging.DEBUG, "card_discarded", player=player, card=card)
+
+        if not table.hand_size(player):
+            log_event(log, logging.DEBUG, "hand_empty", game_id=table.game_id, player=player)
+            self.broadcast_public(table, {"type": "game_over", "message": f"Player {player} has finished all cards!"})
+
+            # Check if all players have finished their cards
+            if table.all_hands_empty():
+                self.finish_hole(table, hole)
+
+        return response
+
+    def finish_hole(self, table, hole):
+        """Score a hole and deal the next one, or finish the match after the last hole."""
+        scores = self.game_manager.end_hole(table, hole)
+        if scores is None:
+            return
+        totals = table.by_name(table.totals)
+        self.broadcast_public(table, {"type": "hole_over", "game_id": table.game_id, "hole": hole,
+                                      "scores": table.by_name(scores), "totals": totals})
+        log_event(log, logging.INFO, "hole_finished", game_id=table.game_id, hole=hole, scores=scores)
+        if not table.match_over():
+            log_event(log, logging.INFO, "hole_dealt", game_id=table.game_id, hole=table.hole,
+                      dealer=table.hole_dealer(), seed=table.seed)
+            self.broadcast_game_state(table)
+            self.broadcast_spectator_state(table)
+            return
+        winner = min(totals, key=totals.get)
+        self.broadcast_public(table, {"type": "final_result", "game_id": table.game_id, "totals": totals,
+                                      "message": f"Game Over! Totals: {totals}. {winner} wins!"})
+        self.record_match(table, totals)
+        self.end_game(table.game_id, table.dealer)
 
     def handle_swap_card(self, player, your_card, drawn_card):
-        if self.game_logic.current_player != player:
-            return {"status": "FAILURE", "reason": "It's not your turn."}
-        
-        if your_card in self.game_logic.players_cards[player] and drawn_card in self.game_logic.players_cards[player]:
-            self.game_logic.swap_card(player, your_card, drawn_card)
-            print(f"Player {player} swapped {your_card} with {drawn_card}")
-            self.game_logic.end_turn()
-            self.broadcast_game_state()
-            return {"status": "SUCCESS"}
-        else:
-            return {"status": "FAILURE", "reason": "Invalid card swap."}
-
-    def calculate_scores(self):
+        table = self.game_manager.table_for(player)
+        if table is None:
+            return {"status": "FAILURE", "reason": "Player is not in a game."}
+        if table.host is not None:
+            return {"status": "FAILURE", "reason": "This table is hosted by its dealer; send moves to the host."}
+
+        response = table.swap_card(player, your_card, drawn_card)
+        if response["status"] == "SUCCESS":
+            log_event(log, logging.DEBUG, "card_swapped", player=player, your_card=your_card, drawn_card=drawn_card)
+        return response
+
+    def calculate_scores(self, game):
         """Calculate the scores for each player based on their remaining cards."""
         score_dict = {}
-        for player_id, cards in self.game_logic.players_cards.items():
+        for player_id, cards in game.players_cards.items():
             score = 0
             for card in cards:
                 rank = card[:-1]  # Extract the rank from card, e.g., '2' from '2H'
@@ -301,26 +627,37 @@ class GameServer:
             score_dict[player_id] = score
         return score_dict
     
-    def broadcast_game_state(self):
-        game_state = {
-            "type": "game_state",
-            "current_player": self.game_logic.current_player,
-            "players": self.players,
-            "discard_pile": self.game_logic.get_top_discard_card(),
-            "player_cards": self.game_logic.players_cards
-        }
-        print(f"Broadcasting game state: {game_state}")
-        self.broadcast(game_state)
+    def broadcast_game_state(self, table):
+        game_state = table.snapshot()
+        log_event(log, logging.DEBUG, "game_state_broadcast", game_id=table.game_id, version=game_state["version"])
+        # A newer snapshot of the same table supersedes a queued one.
+        self.broadcast_table(table, game_state, key=("game_state", table.game_id))
+
+    def broadcast_spectator_state(self, table):
+        """Send the table's public state to its spectators, e.g. after a new hole is dealt."""
+        with table.lock:
+            if table.spectators:
+                self.broadcaster.publish(table.spectators, self.views.public_frame(table))
+
+    def publish_delta(self, table, delta):
+        """GameManager listener: send each move's delta to the players at that table, and its public part to spectators."""
+        self.broadcast_table(table, delta)
+        if table.spectators:
+            self.broadcaster.publish(table.spectators, public_delta(delta))
+
+    def broadcast_table(self, table, message, key=None):
+        """Queue a message for the players seated at one table."""
+        self.broadcaster.publish(table.players, message, key)
+
+    def broadcast_public(self, table, message):
+        """Queue a message that gives nothing away for the players at a table and its spectators."""
+        self.broadcaster.publish(table.players + list(table.spectators), message)
 
     def broadcast(self, message):
-        for client, player_id in self.clients:
-            print(f"Broadcasting message to player {player_id}")
-            try:
-                client.send(pickle.dumps(message))
-            except Exception as e:
-                print(f"Error broadcasting message to player {player_id}: {e}")
-                self.deregister_player(player_id)
+        self.broadcaster.publish(self.broadcaster.names(), message)
 
 # Main execution
 if __name__ == "__main__":
-    GameServer()
\ No newline at end of file
+    configure_logging()
+    GameServer(journal_path=sys.argv[1] if len(sys.argv) > 1 else None,
+               metrics_port=int(sys.argv[2]) if len(sys.argv) > 2 else None)
\ No newline at end of file
@@ -0,0 +1,555 @@
+"""Multi-process GameServer: tables sharded across worker processes by game ID.
+
+One front process accepts connections and owns everything that spans
+tables: registration, matchmaking and the lobby. When matchmaking forms a
+table, the front numbers it and passes the seated players' connections to
+worker (game number % workers) over a Unix socket with SCM_RIGHTS, along
+with any bytes it had read but not yet handled. From then on the worker
+reads those connections itself, runs the game and fans out its deltas, so
+moves never touch the front process or share its GIL. When the game ends
+the worker passes the connections back and the front takes over again.
+
+query_players, query_games and leaderboard are answered by whichever
+process holds the connection. The front keeps the views (see views.py):
+workers report each finished match's totals when they return its table.
+It republishes them into shared memory at most every VIEW_INTERVAL seconds
+after a change, and a worker loads them into its own copy when it next
+serves a query. Tables are not watched across processes, so spectate is
+refused here, and so is start_game: every table is formed by matchmaking
+and numbered by the front.
+
+Every process reads all of its connections on one thread through a
+selector, so a connection can change hands between two reads. Each process
+times out the idle connections it is reading; a player whose connection a
+worker drops is missing from the table's returned connections, and the
+front evicts them when the table comes back.
+
+Usage: python sharded_server.py [host] [port] [workers]
+"""
+import itertools
+import logging
+import mmap
+import multiprocessing
+import os
+import selectors
+import socket
+import struct
+import sys
+import time
+from collections import deque
+from metrics import configure_logging, log_event
+from protocol import IDLE_TIMEOUT, FrameDecoder, decode_message, decode_payload, encode_message, encode_payload
+from server import GameServer
+from views import Views
+
+log = logging.getLogger("golf.sharded")
+
+VIEW_INTERVAL = 0.05
+RECV_SIZE = 65536
+CONTROL_BUFSIZE = 1 << 20
+MAX_HANDOFF = 16
+
+
+class SharedView:
+    """Bytes published by one process and read by others through shared memory.
+
+    The mapping is anonymous and shared, so processes forked after it is
+    created see the same pages. It holds a sequence number and one slot of
+    (length, data), guarded as a seqlock: the writer makes the sequence odd
+    before it touches the slot and even again once it is done, and a reader
+    retries while the sequence is odd or has moved on since it started.
+    """
+
+    SEQUENCE = struct.Struct("<Q")
+    LENGTH = struct.Struct("<I")
+
+    def __init__(self, capacity=8 << 20):
+        self.capacity = capacity
+        self.map = mmap.mmap(-1, self.SEQUENCE.size + self.LENGTH.size + capacity)
+
+    def version(self):
+        """The sequence number; it changes with every publish and is odd while one is under way."""
+        return self.SEQUENCE.unpack_from(self.map)[0]
+
+    def publish(self, data):
+        if len(data) > self.capacity:
+            raise ValueError(f"View of {len(data)} bytes exceeds capacity of {self.capacity}.")
+        sequence = self.version()
+        self.SEQUENCE.pack_into(self.map, 0, sequence + 1)
+        offset = self.SEQUENCE.size
+        self.LENGTH.pack_into(self.map, offset, len(data))
+        self.map[offset + self.LENGTH.size:offset + self.LENGTH.size + len(data)] = data
+        self.SEQUENCE.pack_into(self.map, 0, sequence + 2)
+
+    def read(self):
+        """Return (version, data) for a consistent copy of the latest publish."""
+        offset = self.SEQUENCE.size
+        while True:
+            sequence = self.version()
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            (length,) = self.LENGTH.unpack_from(self.map, offset)
+            start = offset + self.LENGTH.size
+            data = self.map[start:start + min(length, self.capacity)]
+            if self.version() == sequence:
+                return sequence, data
+
+
+class ControlChannel:
+    """One end of the SOCK_SEQPACKET pair between the front and a worker.
+
+    Sends never block: a message that does not fit is queued and written
+    once the socket turns writable, so two busy processes never wait on
+    each other's full buffers. Sockets handed over with a message stay
+    open here until the message has been written.
+    """
+
+    def __init__(self, sock, index, process=None):
+        sock.setblocking(False)
+        self.sock = sock
+        self.index = index
+        self.process = process
+        self.outbox = deque()
+
+    def send(self, message, socks=()):
+        """Queue message; returns False if part of the outbox is still waiting to be written."""
+        self.outbox.append((encode_message(message), socks))
+        return self.flush()
+
+    def flush(self):
+        while self.outbox:
+            frame, socks = self.outbox[0]
+            try:
+                socket.send_fds(self.sock, [frame], [s.fileno() for s in socks])
+            except BlockingIOError:
+                return False
+            self.outbox.popleft()
+            for s in socks:
+                s.close()
+        return True
+
+    def receive(self):
+        """Return [(message, sockets)] for every message waiting."""
+        received = []
+        while True:
+            try:
+                data, fds, _, _ = socket.recv_fds(self.sock, CONTROL_BUFSIZE, MAX_HANDOFF)
+            except BlockingIOError:
+                return received
+            if not data:
+                raise ConnectionError(f"Control channel {self.index} closed.")
+            received.append((decode_message(data), [socket.socket(fileno=fd) for fd in fds]))
+
+
+class Connection:
+    """A client connection read by a selector loop."""
+
+    def __init__(self, sock, name=None, backlog=(), buffered=b""):
+        sock.setblocking(False)
+        self.sock = sock
+        self.name = name
+        self.game_id = None
+        self.decoder = FrameDecoder()
+        self.decoder.buffer += buffered
+        # Messages decoded but not yet dispatched; they travel with the connection.
+        self.backlog = deque(backlog)
+
+    def handoff_state(self):
+        return [list(self.backlog), bytes(self.decoder.buffer)]
+
+
+class SelectorServer(GameServer):
+    """GameServer whose client connections are all read on one thread through a selector."""
+
+    def __init__(self, **kwargs):
+        self.selector = selectors.DefaultSelector()
+        self.connections = {}
+        super().__init__(serve=False, **kwargs)
+
+    def active_connections(self):
+        return len(self.connections)
+
+    def serve_forever(self):
+        while True:
+            for key, mask in self.selector.select(self.loop_timeout()):
+                target = key.data
+                if isinstance(target, Connection):
+                    self.read(target)
+                elif isinstance(target, ControlChannel):
+                    self.service_control(target, mask)
+                else:
+                    self.accept()
+            self.tick()
+            if self.reaper is not None:
+                self.reap_idle()
+
+    def loop_timeout(self):
+        return self.reaper.resolution if self.reaper is not None else None
+
+    def tick(self):
+        """Called after every batch of selector events."""
+
+    def accept(self):
+        pass
+
+    # Client connections
+
+    def watch_connection(self, conn):
+        self.connections[conn.sock] = conn
+        self.selector.register(conn.sock, selectors.EVENT_READ, conn)
+        if self.reaper is not None:
+            self.reaper.add(conn.sock)
+        self.drain(conn)
+
+    def unwatch_connection(self, conn):
+        """Stop reading conn here and write out what is queued for it, ready to hand it over."""
+        self.selector.unregister(conn.sock)
+        del self.connections[conn.sock]
+        if self.reaper is not None:
+            self.reaper.remove(conn.sock)
+        self.broadcaster.detach(conn.sock)
+
+    def close_connection(self, conn):
+        self.selector.unregister(conn.sock)
+        del self.connections[conn.sock]
+        self.connection_closed(conn.sock)
+        conn.sock.close()
+
+    def drop_idle(self, sock):
+        conn = self.connections.get(sock)
+        if conn is not None:
+            self.close_connection(conn)
+
+    def read(self, conn):
+        try:
+            data = conn.sock.recv(RECV_SIZE)
+            if not data:
+                raise ConnectionError("Client closed the connection.")
+            conn.backlog.extend(conn.decoder.feed(data))
+            if self.reaper is not None:
+                self.reaper.touch(conn.sock)
+        except BlockingIOError:
+            return
+        except Exception as e:
+            log_event(log, logging.INFO, "connection_closed", player=conn.name, reason=e)
+            self.close_connection(conn)
+            return
+        self.drain(conn)
+
+    def drain(self, conn):
+        """Dispatch conn's decoded messages, unless its connection is about to change hands."""
+        try:
+            while conn.backlog and not self.holding(conn):
+                self.dispatch(conn.backlog.popleft(), conn.sock)
+            if len(conn.backlog) > self.max_replies:
+                raise ConnectionError("Too many requests waiting while the connection changes hands.")
+        except Exception as e:
+            log_event(log, logging.INFO, "connection_closed", player=conn.name, reason=e)
+            self.close_connection(conn)
+
+    def holding(self, conn):
+        return False
+
+    def on_spectate(self, message, client_socket):
+        return {"status": "FAILURE", "reason": "Spectating is not available on a sharded server."}
+
+    # Control channels
+
+    def send_control(self, channel, message, socks=()):
+        if not channel.send(message, socks):
+            self.selector.modify(channel.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, channel)
+
+    def service_control(self, channel, mask):
+        if mask & selectors.EVENT_WRITE and channel.flush():
+            self.selector.modify(channel.sock, selectors.EVENT_READ, channel)
+        if mask & selectors.EVENT_READ:
+            for message, socks in channel.receive():
+                self.on_control(channel, message, socks)
+
+    def on_control(self, channel, message, socks):
+        """Called for each message read from a control channel; by default it is ignored.
+
+        Sockets handed over with a message belong to the callee, so the ones
+        nobody adopts are closed here.
+        """
+        for sock in socks:
+            sock.close()
+
+
+class FrontServer(SelectorServer):
+    """Accepts connections, registers players, matches tables and routes each to a worker."""
+
+    def __init__(self, host='192.168.1.160', port=7500, workers=None, backlog=1024, max_queue=256,
+                 slow_client_policy="coalesce", metrics_port=None, metrics_file=None, instrument=True,
+                 view_capacity=8 << 20, idle_timeout=IDLE_TIMEOUT, max_replies=64):
+        self.view = SharedView(view_capacity)
+        worker_options = {"max_queue": max_queue, "slow_client_policy": slow_client_policy, "instrument": instrument,
+                          "idle_timeout": idle_timeout, "max_replies": max_replies}
+        # Fork the workers before this process starts any threads.
+        self.workers = []
+        context = multiprocessing.get_context("fork")
+        for index in range(workers or os.cpu_count()):
+            front_end, worker_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            inherited = [worker.sock for worker in self.workers] + [front_end]
+            process = context.Process(target=run_worker, name=f"golf-worker-{index}", daemon=True,
+                                      args=(index, worker_end, self.view, inherited, worker_options))
+            process.start()
+            worker_end.close()
+            self.workers.append(ControlChannel(front_end, index, process))
+
+        super().__init__(max_queue=max_queue, slow_client_policy=slow_client_policy, metrics_port=metrics_port,
+                         metrics_file=metrics_file, instrument=instrument, idle_timeout=idle_timeout,
+                         max_replies=max_replies)
+        self.remote_tables = {}
+        self.table_numbers = itertools.count(1)
+        self.next_match = 0.0
+        self.next_view = 0.0
+        self.view_version = None
+        self.publish_view()
+        if instrument:
+            self.metrics.gauge("golf_tables", lambda: len(self.remote_tables))
+            self.metrics.gauge("golf_shards", self.shard_metrics)
+
+        for worker in self.workers:
+            self.selector.register(worker.sock, selectors.EVENT_READ, worker)
+        self.listener = socket.create_server((host, port), backlog=backlog)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ, None)
+        log_event(log, logging.INFO, "server_started", host=host, port=port, workers=len(self.workers))
+
+    def shard_metrics(self):
+        tables = [0] * len(self.workers)
+        for index, _ in self.remote_tables.values():
+            tables[index] += 1
+        return {f"worker_{index}_tables": count for index, count in enumerate(tables)}
+
+    def loop_timeout(self):
+        return min(self.matchmaking.interval, super().loop_timeout() or self.matchmaking.interval)
+
+    def tick(self):
+        now = time.monotonic()
+        if self.matchmaking.wakeup.is_set() or now >= self.next_match:
+            self.matchmaking.wakeup.clear()
+            self.next_match = now + self.matchmaking.interval
+            try:
+                self.matchmaking.form_tables()
+            except Exception as e:
+                log_event(log, logging.ERROR, "matchmaking_failed", error=e)
+        if self.views.version != self.view_version and now >= self.next_view:
+            self.publish_view()
+            self.next_view = now + VIEW_INTERVAL
+
+    def publish_view(self):
+        self.view_version = self.views.version
+        self.view.publish(encode_payload(self.views.snapshot()))
+
+    def accept(self):
+        while True:
+            try:
+                sock, addr = self.listener.accept()
+            except BlockingIOError:
+                return
+            log_event(log, logging.DEBUG, "connection_opened", peer=addr)
+            # A delta and its reply are separate small writes; don't let Nagle hold the second.
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.watch_connection(Connection(sock))
+
+    def start_matchmaking(self):
+        # Tables are formed by tick() on the selector thread, which owns the connections.
+        pass
+
+    def start_game(self, player, n, holes):
+        # Every table runs on a worker and is numbered from table_numbers; matchmaking forms them.
+        return {"status": "FAILURE", "reason": "Explicit games are not available on a sharded server; use matchmake."}
+
+    def deregister_player(self, player_name):
+        remote = self.remote_tables.get(self.registry.game_of(player_name))
+        if remote is not None:
+            if player_name == remote[1]["dealer"]:
+                return {"status": "FAILURE", "reason": "Player is the dealer of an ongoing game."}
+            return {"status": "FAILURE", "reason": "Player is involved in an ongoing game."}
+        return super().deregister_player(player_name)
+
+    def form_matched_table(self, requests):
+        """MatchmakingQueue callback: number a matched group and hand it to its worker."""
+        players = [request.player for request in requests]
+        number = next(self.table_numbers)
+        game_id = f"game_{number}"
+        worker = self.workers[number % len(self.workers)]
+        self.registry.seat(players, game_id)
+        info = {"game_id": game_id, "dealer": players[0], "players": players}
+        self.remote_tables[game_id] = (worker.index, info)
+        self.views["games"].put(game_id, info)
+        connected = []
+        socks = []
+        states = []
+        for name in players:
+            channel = self.broadcaster.channels.get(name)
+            conn = self.connections.get(channel.sock) if channel is not None else None
+            if conn is None:
+                continue
+            self.unwatch_connection(conn)
+            connected.append(name)
+            socks.append(conn.sock)
+            states.append(conn.handoff_state())
+        self.send_control(worker, {
+            "type": "table",
+            "game_id": game_id,
+            "dealer": players[0],
+            "players": players,
+            "holes": requests[0].holes,
+            "player_info": self.player_info(players),
+            "connected": connected,
+            "states": states
+        }, socks)
+        log_event(log, logging.INFO, "game_matched", game_id=game_id, dealer=players[0],
+                  players=",".join(players), holes=requests[0].holes, worker=worker.index)
+
+    def on_control(self, worker, message, socks):
+        if message["type"] == "returned":
+            self.on_table_returned(message, socks)
+
+    def on_table_returned(self, message, socks):
+        """A worker ended a table: free its players and read their connections here again."""
+        _, info = self.remote_tables.pop(message["game_id"])
+        self.views["games"].remove(message["game_id"])
+        if message.get("totals"):
+            self.views.record_match(message["totals"])
+        self.registry.release(info["players"])
+        for name, sock, (backlog, buffered) in zip(message["connected"], socks, message["states"]):
+            self.broadcaster.add(name, sock)
+            conn = Connection(sock, name, backlog, buffered)
+            self.watch_connection(conn)
+        for name in set(info["players"]) - set(message["connected"]):
+            # Their connection closed while the worker had it.
+            self.evict_player(name)
+        log_event(log, logging.INFO, "game_ended", game_id=message["game_id"], dealer=info["dealer"])
+
+    def broadcast(self, message):
+        super().broadcast(message)
+        for worker in self.workers:
+            self.send_control(worker, {"type": "broadcast", "message": message})
+
+    def service_control(self, channel, mask):
+        try:
+            super().service_control(channel, mask)
+        except ConnectionError as e:
+            log_event(log, logging.ERROR, "worker_lost", worker=channel.index, error=e)
+            self.selector.unregister(channel.sock)
+
+
+class TableWorker(SelectorServer):
+    """Runs the tables of one shard and their players' connections in a worker process."""
+
+    def __init__(self, index, control, view, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+        self.control = ControlChannel(control, index)
+        self.view = view
+        # The front's views as of shared version view_version; this worker's own views only see its tables.
+        self.shared_views = Views()
+        self.view_version = 0
+        self.table_connections = {}
+        # Final totals of the tables ended since the last tick
+        self.results = {}
+        # Tables ended since the last tick; their connections go back to the front.
+        self.ending = []
+        self.selector.register(control, selectors.EVENT_READ, self.control)
+        self.command_handlers.update({
+            "register": self.on_seated_register,
+            "start_game": self.on_not_free,
+            "matchmake": self.on_not_free,
+            "cancel_match": self.on_not_free,
+        })
+
+    def on_control(self, channel, message, socks):
+        if message["type"] == "table":
+            self.adopt_table(message, socks)
+        elif message["type"] == "broadcast":
+            self.broadcaster.publish(self.broadcaster.names(), message["message"])
+
+    def adopt_table(self, message, socks):
+        table = self.game_manager.create_table(message["dealer"], message["players"], message["holes"],
+                                               game_id=message["game_id"])
+        connections = []
+        for name, sock, (backlog, buffered) in zip(message["connected"], socks, message["states"]):
+            conn = Connection(sock, name, backlog, buffered)
+            conn.game_id = table.game_id
+            self.broadcaster.add(name, sock)
+            connections.append(conn)
+        self.table_connections[table.game_id] = connections
+        self.announce_match(table, message["player_info"])
+        for conn in connections:
+            self.watch_connection(conn)
+
+    def holding(self, conn):
+        return conn.game_id in self.ending
+
+    def end_game(self, game_id, player):
+        response = super().end_game(game_id, player)
+        if response["status"] == "SUCCESS":
+            self.ending.append(game_id)
+        return response
+
+    def tick(self):
+        """Hand the connections of every table that ended back to the front."""
+        while self.ending:
+            game_id = self.ending.pop()
+            connections = [conn for conn in self.table_connections.pop(game_id, ())
+                           if self.connections.get(conn.sock) is conn]
+            for conn in connections:
+                self.unwatch_connection(conn)
+            self.send_control(self.control, {
+                "type": "returned",
+                "game_id": game_id,
+                "connected": [conn.name for conn in connections],
+                "states": [conn.handoff_state() for conn in connections],
+                "totals": self.results.pop(game_id, None)
+            }, [conn.sock for conn in connections])
+
+    def service_control(self, channel, mask):
+        try:
+            super().service_control(channel, mask)
+        except ConnectionError:
+            # The front process has gone; its players' connections go with it.
+            log_event(log, logging.INFO, "worker_stopped", worker=self.index)
+            raise SystemExit(0)
+
+    def read_views(self):
+        if self.view.version() != self.view_version:
+            self.view_version, data = self.view.read()
+            self.shared_views.load(decode_payload(data))
+        return self.shared_views
+
+    def record_match(self, table, totals):
+        # The front keeps the leaderboard; the totals go back with the table's connections.
+        self.results[table.game_id] = totals
+
+    def on_seated_register(self, message, client_socket):
+        return {"status": "FAILURE", "reason": "Player already registered."}
+
+    def on_not_free(self, message, client_socket):
+        return {"status": "FAILURE", "reason": "Player is not free."}
+
+    def on_deregister(self, message, client_socket):
+        table = self.game_manager.table_for(message.get("name"))
+        if table is not None and table.dealer == message.get("name"):
+            return {"status": "FAILURE", "reason": "Player is the dealer of an ongoing game."}
+        return {"status": "FAILURE", "reason": "Player is involved in an ongoing game."}
+
+
+def run_worker(index, control, view, inherited, options):
+    # Control sockets of the other workers came along with the fork.
+    for sock in inherited:
+        sock.close()
+    TableWorker(index, control, view, **options).serve_forever()
+
+
+# Main execution
+if __name__ == "__main__":
+    host = sys.argv[1] if len(sys.argv) > 1 else '192.168.1.160'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 7500
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    configure_logging()
+    FrontServer(host, port, workers).serve_forever()
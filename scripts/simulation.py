@@ -0,0 +1,321 @@
+"""Headless Six Card Golf simulation with pluggable bot policies.
+
+Plays full multi-hole games in-process, with no sockets and no input()
+prompts, and runs batches of them across a multiprocessing pool. Each
+batch is seeded from the base seed and its batch index, so a run is
+reproducible no matter how the pool schedules the batches.
+
+Rules: each player has six cards in two rows of three (positions 0-2 over
+3-5), starting face down with two flipped. On a turn a player takes the top
+discard or draws from the deck. The card is either swapped into the hand
+(the replaced card is discarded face up) or, if it came from the deck,
+discarded while one face-down card is flipped. Once a player has all six
+cards face up, every other player gets one last turn. Scoring is either
+"sum" (rank values as in GameServer.calculate_scores) or "pairs", where a
+column holding two cards of the same rank scores zero.
+
+Usage: python simulation.py --games 100000 --players 4 --holes 9 --policies greedy,pairs,random,greedy
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from collections import Counter
+from cards import CARD_VALUES, RANKS
+
+HAND_SIZE = 6
+COLUMNS = ((0, 3), (1, 4), (2, 5))
+PARTNER = (3, 4, 5, 0, 1, 2)
+# Expected value of a face-down card, used by bots to weigh unknown positions.
+UNKNOWN_VALUE = sum(CARD_VALUES) / len(CARD_VALUES)
+MAX_TURNS_PER_HOLE = 400
+
+
+def score_sum(hand):
+    """Sum of rank values, the rule GameServer.calculate_scores uses."""
+    values = CARD_VALUES
+    return (values[hand[0]] + values[hand[1]] + values[hand[2]]
+            + values[hand[3]] + values[hand[4]] + values[hand[5]])
+
+
+def score_pairs(hand):
+    """Rank values, except a column holding a matching pair scores zero."""
+    values = CARD_VALUES
+    ranks = len(RANKS)
+    total = 0
+    for top, bottom in COLUMNS:
+        a = hand[top]
+        b = hand[bottom]
+        if a % ranks != b % ranks:
+            total += values[a] + values[b]
+    return total
+
+
+SCORING = {"sum": score_sum, "pairs": score_pairs}
+
+
+class RandomBot:
+    """Takes the discard or swaps at random."""
+
+    name = "random"
+
+    def __init__(self, rng, scoring):
+        self.rng = rng
+        self.scoring = scoring
+
+    def take_discard(self, hand, up, top):
+        return self.rng.random() < 0.5
+
+    def place(self, hand, up, card, from_discard):
+        if not from_discard and self.rng.random() < 0.5:
+            return -1
+        return self.rng.randrange(HAND_SIZE)
+
+    def flip(self, hand, up):
+        down = [i for i in range(HAND_SIZE) if not up[i]]
+        return self.rng.choice(down) if down else -1
+
+
+class GreedyBot(RandomBot):
+    """Replaces whichever position gives the biggest expected drop in hand score."""
+
+    name = "greedy"
+
+    def estimate(self, hand, up, index):
+        return CARD_VALUES[hand[index]] if up[index] else UNKNOWN_VALUE
+
+    def gain(self, hand, up, card, index):
+        return self.estimate(hand, up, index) - CARD_VALUES[card]
+
+    def best_position(self, hand, up, card):
+        best = 0
+        best_gain = self.gain(hand, up, card, 0)
+        for index in range(1, HAND_SIZE):
+            gain = self.gain(hand, up, card, index)
+            if gain > best_gain:
+                best = index
+                best_gain = gain
+        return best, best_gain
+
+    def take_discard(self, hand, up, top):
+        return self.best_position(hand, up, top)[1] > 1.0
+
+    def place(self, hand, up, card, from_discard):
+        index, gain = self.best_position(hand, up, card)
+        if gain > 0 or from_discard:
+            return index
+        return -1
+
+    def flip(self, hand, up):
+        for index in range(HAND_SIZE):
+            if not up[index]:
+                return index
+        return -1
+
+
+class PairBot(GreedyBot):
+    """Greedy bot that scores positions by column, so it completes and keeps pairs."""
+
+    name = "pairs"
+
+    def column_estimate(self, hand, up, index, card):
+        partner = PARTNER[index]
+        if not up[partner]:
+            return CARD_VALUES[card] + UNKNOWN_VALUE
+        other = hand[partner]
+        if card % len(RANKS) == other % len(RANKS):
+            return 0
+        return CARD_VALUES[card] + CARD_VALUES[other]
+
+    def gain(self, hand, up, card, index):
+        if up[index]:
+            current = self.column_estimate(hand, up, index, hand[index])
+        else:
+            partner = PARTNER[index]
+            current = UNKNOWN_VALUE + (CARD_VALUES[hand[partner]] if up[partner] else UNKNOWN_VALUE)
+        return current - self.column_estimate(hand, up, index, card)
+
+    def flip(self, hand, up):
+        # Prefer flipping next to a face-up card so the column's value becomes known.
+        for index in range(HAND_SIZE):
+            if not up[index] and up[PARTNER[index]]:
+                return index
+        return GreedyBot.flip(self, hand, up)
+
+
+POLICIES = {bot.name: bot for bot in (RandomBot, GreedyBot, PairBot)}
+
+
+class GolfSimulator:
+    """Plays complete games for a fixed seating of bot policies."""
+
+    def __init__(self, policies, holes=9, scoring="sum", seed=None):
+        self.rng = random.Random(seed)
+        self.holes = holes
+        self.score = SCORING[scoring]
+        self.bots = [POLICIES[name](self.rng, scoring) for name in policies]
+
+    def play_hole(self, dealer):
+        rng = self.rng
+        bots = self.bots
+        num_players = len(bots)
+        deck = list(range(len(CARD_VALUES)))
+        rng.shuffle(deck)
+        hands = [deck[i * HAND_SIZE:(i + 1) * HAND_SIZE] for i in range(num_players)]
+        del deck[:num_players * HAND_SIZE]
+        up = []
+        for _ in range(num_players):
+            flags = [False] * HAND_SIZE
+            for index in rng.sample(range(HAND_SIZE), 2):
+                flags[index] = True
+            up.append(flags)
+        discard = [deck.pop()]
+
+        seat = (dealer + 1) % num_players
+        ender = -1
+        turns = 0
+        while turns < MAX_TURNS_PER_HOLE:
+            bot = bots[seat]
+            hand = hands[seat]
+            flags = up[seat]
+            if bot.take_discard(hand, flags, discard[-1]):
+                card = discard.pop()
+                from_discard = True
+            else:
+                if not deck:
+                    deck = discard[:-1]
+                    discard = discard[-1:]
+                    rng.shuffle(deck)
+                card = deck.pop()
+                from_discard = False
+            index = bot.place(hand, flags, card, from_discard)
+            if index >= 0:
+                discard.append(hand[index])
+                hand[index] = card
+                flags[index] = True
+            else:
+                discard.append(card)
+                index = bot.flip(hand, flags)
+                if index >= 0:
+                    flags[index] = True
+            turns += 1
+            if ender < 0 and all(flags):
+                ender = seat
+            seat = (seat + 1) % num_players
+            if seat == ender:
+                break
+        return [self.score(hand) for hand in hands], turns
+
+    def play_game(self):
+        """Play every hole with a rotating dealer; return (totals, turns)."""
+        num_players = len(self.bots)
+        totals = [0] * num_players
+        turns = 0
+        for hole in range(self.holes):
+            scores, hole_turns = self.play_hole(hole % num_players)
+            turns += hole_turns
+            for seat in range(num_players):
+                totals[seat] += scores[seat]
+        return totals, turns
+
+
+def new_stats(num_players):
+    return {"games": 0, "wins": [0.0] * num_players, "scores": Counter(), "turns": Counter()}
+
+
+def merge_stats(into, stats):
+    into["games"] += stats["games"]
+    into["wins"] = [a + b for a, b in zip(into["wins"], stats["wins"])]
+    into["scores"].update(stats["scores"])
+    into["turns"].update(stats["turns"])
+    return into
+
+
+def run_batch(args):
+    """Pool worker: play `games` games from its own seed and return aggregate stats."""
+    seed, games, policies, holes, scoring = args
+    simulator = GolfSimulator(policies, holes, scoring, seed)
+    stats = new_stats(len(policies))
+    wins = stats["wins"]
+    scores = stats["scores"]
+    turns_seen = stats["turns"]
+    for _ in range(games):
+        totals, turns = simulator.play_game()
+        best = min(totals)
+        winners = [seat for seat, total in enumerate(totals) if total == best]
+        for seat in winners:
+            wins[seat] += 1 / len(winners)
+        scores.update(totals)
+        turns_seen[turns] += 1
+    stats["games"] = games
+    return stats
+
+
+def simulate(games, policies, holes=9, scoring="sum", workers=None, seed=0, batch_size=2000):
+    """Play `games` games across a process pool and return the merged stats."""
+    batches = []
+    remaining = games
+    index = 0
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        batches.append((seed * 1000003 + index, size, policies, holes, scoring))
+        remaining -= size
+        index += 1
+    stats = new_stats(len(policies))
+    if workers == 1:
+        for batch in batches:
+            merge_stats(stats, run_batch(batch))
+        return stats
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(run_batch, batches):
+            merge_stats(stats, result)
+    return stats
+
+
+def summarize(stats, policies, elapsed):
+    games = stats["games"]
+    scores = stats["scores"]
+    turns = stats["turns"]
+    score_count = sum(scores.values())
+    ordered = sorted(scores.elements()) if score_count <= 2_000_000 else None
+    return {
+        "games": games,
+        "elapsed_s": round(elapsed, 3),
+        "games_per_s": round(games / elapsed) if elapsed else None,
+        "win_rate_by_seat": {
+            f"{seat + 1}:{name}": round(wins / games, 4) for seat, (name, wins) in enumerate(zip(policies, stats["wins"]))
+        },
+        "score_mean": round(sum(s * c for s, c in scores.items()) / score_count, 2),
+        "score_median": ordered[len(ordered) // 2] if ordered else None,
+        "score_histogram": dict(sorted(scores.items())),
+        "turns_mean": round(sum(t * c for t, c in turns.items()) / games, 2),
+        "turns_histogram": dict(sorted(turns.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate Six Card Golf games between bots.")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--holes", type=int, default=9)
+    parser.add_argument("--policies", default="greedy,pairs,random",
+                        help=f"comma-separated, cycled over the seats; choices: {', '.join(POLICIES)}")
+    parser.add_argument("--scoring", choices=sorted(SCORING), default="sum")
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--histograms", action="store_true", help="include full histograms in the output")
+    args = parser.parse_args()
+
+    names = args.policies.split(",")
+    policies = [names[seat % len(names)] for seat in range(args.players)]
+    started = time.perf_counter()
+    stats = simulate(args.games, policies, args.holes, args.scoring, args.workers, args.seed)
+    summary = summarize(stats, policies, time.perf_counter() - started)
+    if not args.histograms:
+        del summary["score_histogram"], summary["turns_histogram"]
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
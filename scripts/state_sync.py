@@ -0,0 +1,63 @@
+class GameMirror:
+    """Client-side copy of one table's state, kept current by applying deltas.
+
+    load() takes a full game_state snapshot. apply() takes a delta and returns
+    False when its version does not follow the mirror's, meaning a delta was
+    missed and the client should ask the server to resync. Each delta carries
+    the moving seat's hole score, so standings() stays current without
+    rescoring any hand.
+    """
+
+    def __init__(self):
+        self.state = None
+
+    @property
+    def version(self):
+        return self.state["version"] if self.state else None
+
+    def load(self, game_state):
+        self.state = {
+            "game_id": game_state["game_id"],
+            "version": game_state["version"],
+            "current_player": game_state["current_player"],
+            "players": game_state["players"],
+            "discard_pile": game_state["discard_pile"],
+            "player_cards": {seat: list(cards) for seat, cards in game_state["player_cards"].items()},
+            "hole": game_state.get("hole", 1),
+            "scores": dict(game_state.get("scores", {})),
+            "totals": dict(game_state.get("totals", {})),
+        }
+
+    def standings(self):
+        """{seat: match total so far, counting the hole in play}."""
+        scores = self.state["scores"]
+        return {seat: total + scores.get(seat, 0) for seat, total in self.state["totals"].items()}
+
+    def apply(self, delta):
+        state = self.state
+        if state is None or delta["game_id"] != state["game_id"]:
+            return False
+        if delta["version"] <= state["version"]:
+            return True  # Already covered by a newer snapshot
+        if delta["version"] != state["version"] + 1:
+            return False
+
+        hand = state["player_cards"][delta["seat"]]
+        op = delta["op"]
+        if op == "draw":
+            hand.append(delta["card"])
+        elif op == "discard":
+            hand.remove(delta["card"])
+            state["discard_pile"] = delta["card"]
+        elif op == "swap":
+            hand.remove(delta["drawn_card"])
+            hand[hand.index(delta["your_card"])] = delta["drawn_card"]
+            state["discard_pile"] = delta["your_card"]
+        else:
+            return False
+        if "current_player" in delta:
+            state["current_player"] = delta["current_player"]
+        if "score" in delta:
+            state["scores"][delta["seat"]] = delta["score"]
+        state["version"] = delta["version"]
+        return True
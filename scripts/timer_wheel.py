@@ -0,0 +1,87 @@
+"""Hashed timer wheel for idle timeouts on many connections.
+
+Every key has a deadline `timeout` after it was last touched and sits in
+one of slots + 1 buckets, one per tick of timeout / slots seconds.
+touch() only records the new deadline, so it costs the same however many
+keys there are. expire() visits the buckets of the ticks that have passed
+since it last ran: a key whose deadline has passed is removed and
+returned, and a key touched since it was filed moves to the bucket of its
+new deadline. Each key is looked at about once per timeout, and a pass
+costs what expires plus what was refreshed, never a scan of every key.
+"""
+import threading
+import time
+
+
+class TimerWheel:
+    def __init__(self, timeout, slots=64, clock=time.monotonic):
+        self.timeout = timeout
+        self.resolution = timeout / slots
+        self.clock = clock
+        self.buckets = [set() for _ in range(slots + 1)]
+        self.deadlines = {}
+        # Index of the bucket each key is filed in, so remove() is O(1).
+        self.filed = {}
+        self.lock = threading.Lock()
+        self.current = self.tick_of(clock())
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def tick_of(self, t):
+        return int(t / self.resolution)
+
+    def file(self, key, deadline, earliest):
+        index = max(self.tick_of(deadline), earliest) % len(self.buckets)
+        self.buckets[index].add(key)
+        self.filed[key] = index
+
+    def add(self, key, now=None):
+        """Start timing key, or restart it if it is already here."""
+        deadline = (self.clock() if now is None else now) + self.timeout
+        with self.lock:
+            index = self.filed.get(key)
+            if index is not None:
+                self.buckets[index].discard(key)
+            self.deadlines[key] = deadline
+            self.file(key, deadline, self.current + 1)
+
+    def touch(self, key, now=None):
+        """Push key's deadline back to timeout from now; keys not being timed are ignored."""
+        deadline = (self.clock() if now is None else now) + self.timeout
+        with self.lock:
+            if key in self.deadlines:
+                self.deadlines[key] = deadline
+
+    def remove(self, key):
+        with self.lock:
+            index = self.filed.pop(key, None)
+            if index is not None:
+                self.buckets[index].discard(key)
+                del self.deadlines[key]
+
+    def expire(self, now=None):
+        """Stop timing and return every key whose deadline has passed."""
+        now = self.clock() if now is None else now
+        expired = []
+        with self.lock:
+            target = self.tick_of(now)
+            count = len(self.buckets)
+            # After a long gap one turn of the wheel visits every bucket once.
+            for tick in range(max(self.current + 1, target - count + 1), target + 1):
+                index = tick % count
+                bucket = self.buckets[index]
+                if not bucket:
+                    continue
+                self.buckets[index] = set()
+                for key in bucket:
+                    deadline = self.deadlines[key]
+                    if deadline <= now:
+                        expired.append(key)
+                        del self.deadlines[key]
+                        del self.filed[key]
+                    else:
+                        self.file(key, deadline, target + 1)
+            if target > self.current:
+                self.current = target
+        return expired
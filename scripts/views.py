@@ -0,0 +1,242 @@
+"""Read-side views of the lobby, the tables in play and the leaderboard.
+
+Polling clients never touch the registry or the tables. Each view holds
+its rows keyed by player name or game ID and is kept current as players
+register and change status, tables start and end and matches finish, one
+row at a time. Every change bumps the view's version; a page of a view is
+encoded into a frame the first time it is asked for at a version and
+served from cache until the next change, so any number of clients polling
+the same page cost one encode per version.
+
+Spectators get a table's public state: the discard pile, the size of each
+hand and the totals of the holes already played. The cards in the hands,
+the card just drawn and the hole's running scores (which add up the hands)
+stay hidden. The public state is encoded once per table version too.
+"""
+import bisect
+import threading
+from protocol import encode_message
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Pages encoded at one version, across every page number and size; more clears the cache.
+MAX_CACHED_PAGES = 256
+
+
+def row_only(key, row):
+    return row
+
+
+def with_names(key, row):
+    """The lobby lists (name, record) pairs, as query_players always has."""
+    return key, row
+
+
+def ranked(row):
+    """Most wins first, then the lowest match total, then by name."""
+    return -row["wins"], row["best"], row["name"]
+
+
+class View:
+    """Rows keyed by name, changed one at a time, served as encoded pages.
+
+    entry(key, row) is what a page lists for a row. Without a rank the rows
+    are listed in the order they were first put; with one, (rank(row), key)
+    orders them and each change moves one entry with bisect instead of
+    sorting the view again. A page is cut from an immutable tuple of the
+    entries taken once per version, and encoded outside the lock.
+    """
+
+    def __init__(self, field, rank=None, entry=row_only, page_size=DEFAULT_PAGE_SIZE):
+        self.field = field
+        self.rank = rank
+        self.entry = entry
+        self.page_size = page_size
+        self.rows = {}
+        # Unranked: key -> entry, in insertion order. Ranked: (rank, key) positions and their entries.
+        self.entries = {}
+        self.positions = []
+        self.ordered = []
+        self.version = 0
+        self.lock = threading.Lock()
+        # (version, tuple of entries), replaced whole once the version has moved on
+        self.snapshot = (0, ())
+        self.pages = {}
+        self.encoded = 0
+        self.served = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def place(self, key, old, row):
+        """Move key's entry from where old ranked it to where row does; either may be None."""
+        if self.rank is None:
+            if row is None:
+                del self.entries[key]
+            else:
+                self.entries[key] = self.entry(key, row)
+            return
+        if old is not None:
+            index = bisect.bisect_left(self.positions, (self.rank(old), key))
+            del self.positions[index]
+            del self.ordered[index]
+        if row is not None:
+            position = (self.rank(row), key)
+            index = bisect.bisect_left(self.positions, position)
+            self.positions.insert(index, position)
+            self.ordered.insert(index, self.entry(key, row))
+
+    def changed(self):
+        """Called with the lock held after every change."""
+        self.version += 1
+        self.pages = {}
+
+    def put(self, key, row):
+        with self.lock:
+            self.place(key, self.rows.get(key), row)
+            self.rows[key] = row
+            self.changed()
+
+    def update(self, key, change):
+        """Replace key's row with change(row), where row is None if there is none yet."""
+        with self.lock:
+            old = self.rows.get(key)
+            row = self.rows[key] = change(old)
+            self.place(key, old, row)
+            self.changed()
+
+    def remove(self, key):
+        with self.lock:
+            old = self.rows.pop(key, None)
+            if old is not None:
+                self.place(key, old, None)
+                self.changed()
+
+    def load(self, version, items):
+        """Take the rows of another process's view at version, as (key, row) pairs."""
+        with self.lock:
+            if version == self.version:
+                return
+            self.rows = dict(items)
+            if self.rank is None:
+                self.entries = {key: self.entry(key, row) for key, row in self.rows.items()}
+            else:
+                self.positions = sorted((self.rank(row), key) for key, row in self.rows.items())
+                self.ordered = [self.entry(key, self.rows[key]) for _, key in self.positions]
+            self.changed()
+            self.version = version
+
+    def items(self):
+        """(version, [(key, row)]) for load()."""
+        with self.lock:
+            return self.version, list(self.rows.items())
+
+    def page(self, number=0, size=None):
+        """The frame of one page: its rows, the total row count and the version it shows."""
+        size = min(size or self.page_size, MAX_PAGE_SIZE)
+        with self.lock:
+            self.served += 1
+            frame = self.pages.get((number, size))
+            if frame is not None:
+                return frame
+            snapshot = self.snapshot
+            if snapshot[0] != self.version:
+                entries = self.entries.values() if self.rank is None else self.ordered
+                snapshot = self.snapshot = (self.version, tuple(entries))
+        version, entries = snapshot
+        frame = encode_message({
+            "status": len(entries),
+            self.field: list(entries[number * size:(number + 1) * size]),
+            "version": version,
+            "page": number,
+            "pages": -(-len(entries) // size),
+        })
+        with self.lock:
+            self.encoded += 1
+            if self.version == version:
+                if len(self.pages) >= MAX_CACHED_PAGES:
+                    self.pages = {}
+                self.pages[(number, size)] = frame
+        return frame
+
+
+class Views:
+    """The lobby, game-list and leaderboard views of one server.
+
+    on_player is a PlayerRegistry listener and on_table a GameManager table
+    listener; record_match takes the final {name: total} of each match.
+    """
+
+    def __init__(self, page_size=DEFAULT_PAGE_SIZE):
+        self.views = {
+            "players": View("players", entry=with_names, page_size=page_size),
+            "games": View("games", page_size=page_size),
+            "leaders": View("leaders", rank=ranked, page_size=page_size),
+        }
+        # game_id -> (table version, frame) of the latest public state sent to spectators
+        self.public_frames = {}
+
+    def __getitem__(self, name):
+        return self.views[name]
+
+    @property
+    def version(self):
+        """Grows with every change to any of the views."""
+        return sum(view.version for view in self.views.values())
+
+    def on_player(self, name, record):
+        if record is None:
+            self.views["players"].remove(name)
+        else:
+            self.views["players"].put(name, record)
+
+    def on_table(self, table):
+        if table.status == "ended":
+            self.views["games"].remove(table.game_id)
+            self.public_frames.pop(table.game_id, None)
+        else:
+            self.views["games"].put(table.game_id, table.info())
+
+    def record_match(self, totals):
+        """Count a finished match: every player has played it and the lowest total wins."""
+        if not totals:
+            return
+        best = min(totals.values())
+        for name, total in totals.items():
+            def change(row, name=name, total=total):
+                if row is None:
+                    row = {"name": name, "played": 0, "wins": 0, "best": total}
+                return {"name": name, "played": row["played"] + 1, "wins": row["wins"] + (total == best),
+                        "best": min(row["best"], total)}
+            self.views["leaders"].update(name, change)
+
+    def public_frame(self, table):
+        """The encoded public state of table at its current version. Called with the table lock held."""
+        cached = self.public_frames.get(table.game_id)
+        if cached is not None and cached[0] == table.version:
+            return cached[1]
+        frame = encode_message(table.public_state())
+        self.public_frames[table.game_id] = (table.version, frame)
+        return frame
+
+    def snapshot(self):
+        """Every view's rows, to load into the views of another process."""
+        return {name: view.items() for name, view in self.views.items()}
+
+    def load(self, snapshot):
+        for name, (version, items) in snapshot.items():
+            self.views[name].load(version, items)
+
+    def metrics(self):
+        return {name: {"rows": len(view), "version": view.version, "encoded": view.encoded, "served": view.served}
+                for name, view in self.views.items()}
+
+
+def public_delta(delta):
+    """A move's delta as spectators see it: the card drawn and the mover's hole score are left out."""
+    public = dict(delta)
+    public.pop("score", None)
+    public.pop("drawn_card", None)
+    if public["op"] == "draw":
+        public.pop("card", None)
+    return public
@@ -0,0 +1,109 @@
+import socket
+import threading
+import time
+import pytest
+from broadcaster import ACCEPTED, DISCONNECT, Broadcaster, ClientChannel
+from protocol import MessageReader, decode_message
+
+MAX_QUEUE = 16
+MESSAGES = 400
+HEALTHY = 4
+PAYLOAD = "x" * 512
+
+
+def read_all(sock, received):
+    messages = MessageReader(sock)
+    while True:
+        message = messages.recv()
+        received.append(message["seq"])
+        if message["seq"] == MESSAGES - 1:
+            return
+
+
+@pytest.fixture
+def pairs():
+    socks = []
+
+    def pair(buffer=None):
+        server_end, client_end = socket.socketpair()
+        if buffer:
+            server_end.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer)
+            client_end.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer)
+        socks.extend((server_end, client_end))
+        return server_end, client_end
+
+    yield pair
+    for sock in socks:
+        sock.close()
+
+
+@pytest.mark.parametrize("policy", ["drop", "coalesce", "disconnect"])
+def test_stalled_client_does_not_hold_up_the_others(pairs, policy):
+    disconnected = []
+    broadcaster = Broadcaster(max_queue=MAX_QUEUE, policy=policy, on_disconnect=disconnected.append,
+                              instrument=False)
+    names = []
+    readers = []
+    for i in range(HEALTHY):
+        server_end, client_end = pairs()
+        broadcaster.add(f"client{i}", server_end)
+        names.append(f"client{i}")
+        received = []
+        thread = threading.Thread(target=read_all, args=(client_end, received), daemon=True)
+        thread.start()
+        readers.append((thread, received))
+    server_end, _ = pairs(buffer=4096)
+    stalled = broadcaster.add("stalled", server_end)
+    names.append("stalled")
+
+    healthy = [broadcaster.channels[name] for name in names[:HEALTHY]]
+    slowest = 0.0
+    for seq in range(MESSAGES):
+        started = time.perf_counter()
+        broadcaster.publish(names, {"type": "game_state", "seq": seq, "message": PAYLOAD},
+                            key="state" if seq % 2 else None)
+        slowest = max(slowest, time.perf_counter() - started)
+        # Keep pace with the readers, so only the stalled client ever has a full queue.
+        deadline = time.perf_counter() + 5
+        while any(channel.depth() for channel in healthy) and time.perf_counter() < deadline:
+            time.sleep(0.0002)
+    # Publishing only queues, so a client that never reads cannot block it.
+    assert slowest < 0.5
+
+    for thread, received in readers:
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+        assert received == list(range(MESSAGES))
+
+    if policy == "disconnect":
+        assert stalled.closed
+        assert disconnected == ["stalled"]
+        assert broadcaster.disconnected == 1
+        return
+    assert not stalled.closed
+    assert disconnected == []
+    assert stalled.depth() <= MAX_QUEUE + 1
+    if policy == "drop":
+        assert stalled.dropped > 0
+        assert stalled.coalesced == 0
+    else:
+        assert stalled.coalesced > 0
+        # The latest keyed message replaces the queued one instead of piling up behind it.
+        keyed = [decode_message(entry[0])["seq"] for entry in stalled.queue if entry[2] == "state"]
+        assert keyed == [MESSAGES - 1]
+
+
+def test_coalesce_never_evicts_a_queued_reply():
+    channel = ClientChannel("ann", None, max_queue=2, policy="coalesce", max_replies=1)
+    assert channel.offer(b"reply", reliable=True) == ACCEPTED
+    assert channel.offer(b"b1") == ACCEPTED
+    assert channel.offer(b"b2") == ACCEPTED
+    assert [entry[0] for entry in channel.queue] == [b"reply", b"b2"]
+    assert channel.dropped == 1
+
+    # With only replies queued there is no broadcast to give up for a new one.
+    channel = ClientChannel("bob", None, max_queue=2, policy="coalesce")
+    for _ in range(2):
+        assert channel.offer(b"reply", reliable=True) == ACCEPTED
+    assert channel.offer(b"b1") == DISCONNECT
+    assert [entry[0] for entry in channel.queue] == [b"reply", b"reply"]
@@ -0,0 +1,46 @@
+import os
+import struct
+import zlib
+import pytest
+
+np = pytest.importorskip("numpy")
+from card_atlas import IMAGE_NAMES, CardAtlas, build_atlas, letterbox  # noqa: E402
+
+
+def write_png(path, pixels):
+    """Write an (h, w, 4) uint8 array as an unfiltered RGBA PNG."""
+    height, width = pixels.shape[:2]
+    raw = b"".join(b"\0" + pixels[y].tobytes() for y in range(height))
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+                + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def test_letterbox_keeps_the_aspect_ratio():
+    wide = np.full((10, 20, 4), 255, dtype=np.uint8)
+    cell = letterbox(wide, 20, 20)
+    assert cell.shape == (20, 20, 4)
+    assert (cell[5:15] == 255).all()
+    assert not cell[:5].any() and not cell[15:].any()
+
+    shrunk = letterbox(wide, 10, 10)
+    assert (shrunk[2:7] == 255).all()
+    assert not shrunk[:2].any() and not shrunk[7:].any()
+
+
+def test_build_atlas_letterboxes_odd_sizes(tmp_path):
+    for code, name in enumerate(IMAGE_NAMES):
+        width = 8 if code == 0 else 4
+        write_png(os.path.join(tmp_path, name + ".png"), np.full((6, width, 4), code + 1, dtype=np.uint8))
+    path = os.path.join(tmp_path, "cards.atlas")
+    assert build_atlas(str(tmp_path), path) == (8, 6)
+    atlas = CardAtlas(path)
+    wide, narrow = atlas.pixels(0).copy(), atlas.pixels(1).copy()
+    atlas.close()
+    assert (wide == 1).all()
+    assert (narrow[:, 2:6] == 2).all()
+    assert not narrow[:, :2].any() and not narrow[:, 6:].any()
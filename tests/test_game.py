@@ -0,0 +1,47 @@
+import pytest
+from cards import CARD_CODES
+from compact_game import CompactGolfGame
+from decks import shuffled_deck
+from game_manager import Table
+from game_logic import SixCardGolfGame
+
+
+@pytest.mark.parametrize("game_class", [SixCardGolfGame, CompactGolfGame])
+def test_swap_with_itself_changes_nothing(game_class):
+    game = game_class(2, shuffled_deck(7))
+    card = game.players_cards[1][0]
+    assert not game.swap_card(1, card, card)
+    assert game.players_cards[1][0] == card
+    assert game.hand_size(1) == 6
+
+
+@pytest.mark.parametrize("game_class", [SixCardGolfGame, CompactGolfGame])
+def test_table_rejects_swapping_a_card_with_itself(game_class):
+    table = Table("game_1", "bob", ["ann", "bob"], 1, game_class(2, shuffled_deck(7)))
+    hand = list(table.hand("ann"))
+    response = table.swap_card("ann", hand[0], hand[0])
+    assert response["status"] == "FAILURE"
+    assert list(table.hand("ann")) == hand
+    assert table.scores[1] == table.game.score(1)
+
+
+def test_compact_game_treats_an_unknown_card_as_not_in_hand():
+    game = CompactGolfGame(2, shuffled_deck(7))
+    hand = list(game.players_cards[1])
+    assert not game.has_card(1, "XX")
+    game.discard_card(1, "XX")
+    assert not game.swap_card(1, "XX", hand[0])
+    assert list(game.players_cards[1]) == hand
+
+
+@pytest.mark.parametrize("game_class", [SixCardGolfGame, CompactGolfGame])
+def test_table_rejects_card_codes(game_class):
+    table = Table("game_1", "bob", ["ann", "bob"], 1, game_class(2, shuffled_deck(7)))
+    hand = list(table.hand("ann"))
+    code = CARD_CODES[hand[0]]
+    assert table.discard_card("ann", code)["status"] == "FAILURE"
+    assert table.swap_card("ann", code, hand[1])["status"] == "FAILURE"
+    assert table.swap_card("ann", hand[1], code)["status"] == "FAILURE"
+    assert list(table.hand("ann")) == hand
+    assert table.version == 0
+    assert table.scores[1] == table.game.score(1)
@@ -0,0 +1,116 @@
+import random
+import pytest
+from cards import CARD_NAMES
+from compact_game import CompactGolfGame
+from decks import DeckPool, shuffled_deck, split_deal
+from game_logic import SixCardGolfGame
+from game_manager import GameManager
+
+
+def manager(game_class=SixCardGolfGame):
+    return GameManager(game_factory=game_class, deck_pool=DeckPool(size=8, seed=11))
+
+
+def play_turn(table, rng):
+    """Draw for the current player, then discard or swap at random. Returns False once the deck is empty."""
+    player = table.players[table.game.current_player - 1]
+    drawn = table.draw_card(player).get("card")
+    if not drawn:
+        return False
+    hand = list(table.hand(player))
+    if rng.random() < 0.5:
+        reply = table.discard_card(player, rng.choice(hand))
+    else:
+        reply = table.swap_card(player, rng.choice([card for card in hand if card != drawn]), drawn)
+    assert reply["status"] == "SUCCESS"
+    return True
+
+
+@pytest.mark.parametrize("game_class", [SixCardGolfGame, CompactGolfGame])
+def test_running_scores_match_a_full_recompute(game_class):
+    table = manager(game_class).create_table("ann", ["ann", "bob", "cat"], 1)
+    rng = random.Random(5)
+    while play_turn(table, rng) and not table.all_hands_empty():
+        for seat in table.seats.values():
+            assert table.scores[seat] == table.game.score(seat)
+        assert table.standings() == table.scores
+
+
+def test_hole_rolls_over_to_a_fresh_deal():
+    games = manager()
+    table = games.create_table("ann", ["ann", "bob"], 3)
+    first_seed = table.seed
+    rng = random.Random(8)
+    for _ in range(5):
+        play_turn(table, rng)
+    played = {seat: table.game.score(seat) for seat in table.seats.values()}
+    version = table.version
+
+    assert games.end_hole(table, 1) == played
+    assert games.end_hole(table, 1) is None
+    assert table.hole == 2
+    assert table.totals == played
+    assert table.version == version + 1
+    assert table.seed != first_seed
+    hands, discard, rest = split_deal(shuffled_deck(table.seed), 2)
+    for seat, hand in enumerate(hands, 1):
+        assert table.game.players_cards[seat] == [CARD_NAMES[code] for code in hand]
+        assert table.scores[seat] == table.game.score(seat)
+    assert table.game.get_top_discard_card() == CARD_NAMES[discard]
+    assert len(table.game.deck) == len(rest)
+    assert table.standings() == {seat: played[seat] + table.scores[seat] for seat in table.seats.values()}
+
+
+# start_game seats the dealer last; matchmaking seats the longest-waiting player, who deals, first.
+@pytest.mark.parametrize("dealer, dealers", [
+    ("cat", ["cat", "ann", "bob", "cat", "ann"]),
+    ("ann", ["ann", "bob", "cat", "ann", "bob"]),
+])
+def test_dealer_and_first_player_rotate_each_hole(dealer, dealers):
+    games = manager()
+    table = games.create_table(dealer, ["ann", "bob", "cat"], 5)
+    seen = []
+    for hole in range(1, 6):
+        seen.append((table.hole_dealer(), table.players[table.game.current_player - 1]))
+        games.end_hole(table, hole)
+    # The player after the dealer plays first, and both move one seat on each hole.
+    assert seen == [(name, table.players[(table.players.index(name) + 1) % 3]) for name in dealers]
+
+
+def test_match_ends_after_its_holes():
+    games = manager()
+    table = games.create_table("ann", ["ann", "bob"], 3)
+    expected = {1: 0, 2: 0}
+    for hole in range(1, 4):
+        assert not table.match_over()
+        scores = games.end_hole(table, hole)
+        for seat, score in scores.items():
+            expected[seat] += score
+    assert table.match_over()
+    assert table.totals == expected
+    # The last hole is not followed by another deal.
+    assert table.hole == 4
+    assert games.end_hole(table, 4) is None
+
+
+@pytest.mark.parametrize("game_class", [SixCardGolfGame, CompactGolfGame])
+def test_turn_skips_empty_hands_until_the_hole_is_over(game_class):
+    table = manager(game_class).create_table("ann", ["ann", "bob"], 1)
+    first, second = (table.players[seat - 1] for seat in (table.game.current_player, 3 - table.game.current_player))
+    assert table.draw_card(second)["reason"] == "It's not your turn."
+    # The second player keeps one card more, so the first runs out of cards first.
+    drawn = False
+    while True:
+        player = table.players[table.game.current_player - 1]
+        if player == second and not drawn:
+            assert table.draw_card(second)["status"] == "SUCCESS"
+            drawn = True
+        assert table.discard_card(player, list(table.hand(player))[0])["status"] == "SUCCESS"
+        if table.all_hands_empty():
+            break
+        assert table.hand_size(table.players[table.game.current_player - 1])
+        if not table.hand_size(first):
+            assert table.players[table.game.current_player - 1] == second
+            assert table.discard_card(first, "AS")["reason"] == "It's not your turn."
+            assert table.draw_card(first)["reason"] == "It's not your turn."
+    assert table.hand_size(first) == table.hand_size(second) == 0
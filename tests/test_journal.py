@@ -0,0 +1,30 @@
+import os
+from decks import DeckPool
+from game_manager import GameManager
+from journal import Journal, recover
+
+
+def test_checkpoint_keeps_every_live_table(tmp_path):
+    path = os.path.join(tmp_path, "golf.journal")
+    games = GameManager(deck_pool=DeckPool(size=4, seed=21))
+    journal = Journal(path, sync=False)
+    games.use_journal(journal)
+    for dealer, other in (("ann", "bob"), ("cat", "dan"), ("eve", "fay")):
+        games.create_table(dealer, [dealer, other], 2)
+    games.remove_table("game_1")
+    table = games.get("game_3")
+    table.draw_card(table.players[table.game.current_player - 1])
+    journal.close()
+
+    tables, stats = recover(path)
+    assert sorted(tables) == ["game_2", "game_3"]
+    assert stats["last_game"] == 3
+    journal = Journal(path, sync=False)
+    journal.checkpoint(tables.values(), stats["last_game"])
+    journal.close()
+
+    recovered, stats = recover(path)
+    assert sorted(recovered) == ["game_2", "game_3"]
+    assert stats["last_game"] == 3
+    for game_id, table in tables.items():
+        assert recovered[game_id].snapshot() == table.snapshot()
@@ -0,0 +1,121 @@
+import socket
+import threading
+import pytest
+from peer import PeerHost, PeerLink
+from protocol import MessageReader, send_message
+from server import GameServer
+
+HOST = "127.0.0.1"
+
+
+class Client:
+    """A player's connection to the tracker."""
+
+    def __init__(self, port, name):
+        self.name = name
+        self.sock = socket.create_connection((HOST, port), timeout=10)
+        self.reader = MessageReader(self.sock)
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            send_message(self.sock, message)
+
+    def reply(self):
+        """The next reply, skipping broadcasts; every broadcast has a type and no reply does."""
+        while True:
+            message = self.reader.recv()
+            if "type" not in message:
+                return message
+
+    def request(self, message):
+        self.send(message)
+        return self.reply()
+
+    def wait_for(self, kind):
+        while True:
+            message = self.reader.recv()
+            if message.get("type") == kind:
+                return message
+
+
+@pytest.fixture
+def tracker():
+    server = GameServer(serve=False, instrument=False, idle_timeout=None, peer_tables=True)
+    server.server_socket = socket.create_server((HOST, 0))
+    threading.Thread(target=server.start_server, daemon=True).start()
+    return server
+
+
+def test_peer_table_relays_moves_and_reports_holes(tracker):
+    port = tracker.server_socket.getsockname()[1]
+    ann, bob = Client(port, "ann"), Client(port, "bob")
+    for client in (ann, bob):
+        assert client.request({"type": "register", "name": client.name, "ipv4": HOST, "t_port": 7501,
+                               "p_port": 7502})["status"] == "SUCCESS"
+        assert client.request({"type": "matchmake", "player": client.name, "size": 2, "holes": 1})["status"] \
+            == "SUCCESS"
+    matched = ann.wait_for("matched")
+    bob.wait_for("matched")
+    game_id = matched["game_id"]
+    assert matched["host"] == "ann"
+
+    players = [info["name"] for info in matched["players"]]
+    host = PeerHost(game_id, "ann", players, matched["holes"], 0, ann.send, host=HOST).start()
+    link = None
+    try:
+        link = PeerLink(HOST, host.server_socket.getsockname()[1], game_id, "bob")
+        assert link.recv()["status"] == "SUCCESS"
+        state = link.recv()
+        assert state["type"] == "game_state"
+
+        # Each player draws and discards once; the host relays every move to bob.
+        deltas = []
+
+        def next_reply():
+            message = link.recv()
+            while "type" in message:
+                deltas.append(message)
+                message = link.recv()
+            return message
+
+        version = state["version"]
+        for _ in range(2):
+            mover = players[host.table.game.current_player - 1]
+            if mover == "bob":
+                link.send({"type": "draw_card"})
+                card = next_reply()["card"]
+                link.send({"type": "discard_card", "card": card})
+                assert next_reply()["status"] == "SUCCESS"
+            else:
+                card = host.move("ann", {"type": "draw_card"})["card"]
+                assert host.move("ann", {"type": "discard_card", "card": card})["status"] == "SUCCESS"
+            while len(deltas) < 2:
+                deltas.append(link.recv())
+            for op in ("draw", "discard"):
+                message = deltas.pop(0)
+                version += 1
+                assert message["type"] == "delta"
+                assert (message["op"], message["seat"], message["version"]) == (op, players.index(mover) + 1,
+                                                                                version)
+
+        # Only the host may report the table's holes.
+        reply = bob.request({"type": "hole_result", "game_id": game_id, "player": "bob", "hole": 1,
+                             "scores": {"ann": 0, "bob": 0}})
+        assert reply["status"] == "FAILURE"
+        table = tracker.game_manager.get(game_id)
+        assert table.hole_scores == []
+
+        totals = host.table.by_name(host.table.standings())
+        host.end_hole()
+        assert ann.reply()["status"] == "SUCCESS"  # hole_result
+        assert ann.reply()["status"] == "SUCCESS"  # end
+        assert table.hole_scores == [totals]
+        assert tracker.game_manager.get(game_id) is None
+        assert {name: row["best"] for name, row in tracker.views["leaders"].rows.items()} == totals
+    finally:
+        host.close()
+        if link is not None:
+            link.close()
+        for client in (ann, bob):
+            client.sock.close()
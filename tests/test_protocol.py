@@ -0,0 +1,57 @@
+import socket
+import time
+import pytest
+from protocol import (MAX_DEPTH, T_DICT, T_INT, T_LIST, T_NONE, T_STR, ConnectionClosed, MessageReader, ProtocolError,
+                      decode_message, decode_payload, encode_message, send_message)
+
+
+def test_round_trip():
+    message = {"type": "delta", "game_id": "game_7", "version": 300, "op": "draw", "seat": 2, "card": "10D",
+               "score": -4, "ratio": 0.5, "blob": b"\x00\x01", "players": ["ann", "bob"]}
+    assert decode_message(encode_message(message)) == message
+
+
+def test_none_message_is_not_end_of_stream():
+    a, b = socket.socketpair()
+    with a, b:
+        reader = MessageReader(b)
+        send_message(a, None)
+        send_message(a, {"status": "SUCCESS"})
+        a.shutdown(socket.SHUT_WR)
+        assert reader.recv() is None
+        assert reader.recv() == {"status": "SUCCESS"}
+        with pytest.raises(ConnectionClosed):
+            reader.recv()
+
+
+@pytest.mark.parametrize("payload", [
+    bytes([T_DICT, 1, T_LIST, 0, T_NONE]),
+    bytes([T_DICT, 1, T_DICT, 0, T_NONE]),
+    bytes([T_LIST, 1] * 10000 + [T_NONE]),
+])
+def test_malformed_nesting_is_a_protocol_error(payload):
+    with pytest.raises(ProtocolError):
+        decode_payload(payload)
+
+
+def test_nesting_up_to_the_limit_decodes():
+    value = None
+    for _ in range(MAX_DEPTH):
+        value = [value]
+    assert decode_message(encode_message(value)) == value
+    with pytest.raises(ProtocolError):
+        decode_message(encode_message([value]))
+
+
+@pytest.mark.parametrize("tag", [T_INT, T_STR, T_LIST])
+def test_overlong_varint_is_a_protocol_error(tag):
+    started = time.perf_counter()
+    with pytest.raises(ProtocolError):
+        decode_payload(bytes([tag]) + b"\xff" * (1024 * 1024))
+    assert time.perf_counter() - started < 0.1
+
+
+def test_huge_int_is_refused_when_encoding():
+    assert decode_message(encode_message(-2 ** 64)) == -2 ** 64
+    with pytest.raises(ProtocolError):
+        encode_message(2 ** 80)
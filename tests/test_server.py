@@ -0,0 +1,85 @@
+import socket
+import pytest
+from server import GameServer
+
+
+@pytest.fixture
+def server():
+    server = GameServer(serve=False, instrument=False, idle_timeout=None)
+    socks = []
+
+    def join(name):
+        ours, theirs = socket.socketpair()
+        socks.extend((ours, theirs))
+        assert server.register_player(name, ours, "127.0.0.1", 7501, 7502)["status"] == "SUCCESS"
+
+    server.join = join
+    yield server
+    for sock in socks:
+        sock.close()
+
+
+def test_draw_replies_with_status(server):
+    for name in ("ann", "bob"):
+        server.join(name)
+    game_id = server.start_game("ann", 1, 1)["game_id"]
+    table = server.game_manager.get(game_id)
+    first = table.players[table.game.current_player - 1]
+    reply = server.handle_draw_card(first)
+    assert reply["status"] == "SUCCESS"
+    assert reply["card"] == table.hand(first)[-1]
+
+
+def test_dealer_already_in_play_cannot_start_another_game(server):
+    for name in ("ann", "bob", "cat", "dan"):
+        server.join(name)
+    assert server.start_game("ann", 1, 1)["status"] == "SUCCESS"
+    reply = server.start_game("ann", 1, 1)
+    assert reply["status"] == "FAILURE"
+    assert len(server.game_manager.tables) == 1
+
+
+def test_record_hole_rejects_bad_reports(server):
+    for name in ("ann", "bob"):
+        server.join(name)
+    game_id = server.start_game("ann", 1, 2)["game_id"]
+    table = server.game_manager.get(game_id)
+    table.host = "ann"
+    for hole, scores in [(1, {"ann": 3}), (1, {"ann": 3, "bob": 4, "cat": 5}), (1, {"ann": -1, "bob": 4}),
+                         (1, {"ann": 70000, "bob": 4}), (1, {"ann": "3", "bob": 4}), (2, {"ann": 3, "bob": 4}),
+                         (0, {"ann": 3, "bob": 4}), ("1", {"ann": 3, "bob": 4})]:
+        assert server.record_hole(game_id, "ann", hole, scores)["status"] == "FAILURE"
+    assert table.hole_scores == []
+    assert server.record_hole(game_id, "ann", 1, {"ann": 3, "bob": 4})["status"] == "SUCCESS"
+    assert server.record_hole(game_id, "ann", 1, {"ann": 3, "bob": 4})["status"] == "FAILURE"
+    assert server.record_hole(game_id, "ann", 2, {"ann": 5, "bob": 1})["status"] == "SUCCESS"
+    assert server.record_hole(game_id, "ann", 3, {"ann": 5, "bob": 1})["status"] == "FAILURE"
+    assert len(table.hole_scores) == 2
+
+
+def test_ending_a_game_tells_its_spectators(server):
+    for name in ("ann", "bob"):
+        server.join(name)
+    game_id = server.start_game("ann", 1, 1)["game_id"]
+    server.join("eve")
+    published = []
+    server.broadcaster.publish = lambda names, message, key=None: published.append((set(names), message))
+    assert server.spectate("eve", game_id)["status"] == "SUCCESS"
+    assert server.end_game(game_id, "ann")["status"] == "SUCCESS"
+    assert ({"eve"}, {"type": "game_ended", "game_id": game_id, "message": "The game has ended."}) in published
+    assert "eve" not in server.spectating
+
+
+def test_match_ends_and_is_ranked_after_its_last_hole(server):
+    for name in ("ann", "bob"):
+        server.join(name)
+    game_id = server.start_game("ann", 1, 2)["game_id"]
+    table = server.game_manager.get(game_id)
+    server.finish_hole(table, 1)
+    assert server.game_manager.get(game_id) is table
+    server.finish_hole(table, 2)
+    assert server.game_manager.get(game_id) is None
+    assert all(server.registry.get(name)["status"] == "free" for name in ("ann", "bob"))
+    leaders = server.views["leaders"].rows
+    assert {name: row["best"] for name, row in leaders.items()} == table.by_name(table.totals)
+    assert sum(row["wins"] for row in leaders.values()) >= 1
@@ -0,0 +1,63 @@
+import multiprocessing
+import socket
+from types import SimpleNamespace
+import pytest
+from sharded_server import FrontServer, SharedView
+
+
+def test_shared_view_reads_are_never_torn():
+    view = SharedView(capacity=1 << 16)
+    context = multiprocessing.get_context("fork")
+
+    def write():
+        for n in range(1, 2000):
+            view.publish(bytes([n % 256]) * (n * 7 % (1 << 16)))
+
+    writer = context.Process(target=write)
+    writer.start()
+    reads = 0
+    while writer.is_alive() or reads == 0:
+        sequence, data = view.read()
+        assert sequence % 2 == 0
+        assert len(set(data)) <= 1
+        reads += 1
+    writer.join()
+    assert view.read() == (2 * 1999, bytes([1999 % 256]) * (1999 * 7 % (1 << 16)))
+
+
+@pytest.fixture
+def front():
+    server = FrontServer(host="127.0.0.1", port=0, workers=1, instrument=False, idle_timeout=None)
+    socks = []
+
+    def join(name):
+        ours, theirs = socket.socketpair()
+        socks.extend((ours, theirs))
+        assert server.register_player(name, ours, "127.0.0.1", 7501, 7502)["status"] == "SUCCESS"
+
+    server.join = join
+    yield server
+    for worker in server.workers:
+        worker.process.kill()
+        worker.process.join()
+    server.listener.close()
+    for sock in socks:
+        sock.close()
+
+
+def test_front_keeps_players_at_remote_tables(front):
+    for name in ("ann", "bob", "cat"):
+        front.join(name)
+    front.form_matched_table([SimpleNamespace(player=name, holes=1) for name in ("ann", "bob")])
+    assert "game_1" in front.remote_tables
+    assert front.deregister_player("ann")["reason"] == "Player is the dealer of an ongoing game."
+    assert front.deregister_player("bob")["reason"] == "Player is involved in an ongoing game."
+    assert "bob" in front.registry
+    assert front.deregister_player("cat")["status"] == "SUCCESS"
+
+
+def test_front_refuses_explicit_games(front):
+    for name in ("ann", "bob"):
+        front.join(name)
+    assert front.start_game("ann", 1, 1)["status"] == "FAILURE"
+    assert len(front.game_manager) == 0
@@ -0,0 +1,37 @@
+import random
+from protocol import decode_message
+from views import View, Views, ranked
+
+
+def test_leaderboard_order_matches_a_full_sort():
+    views = Views(page_size=1000)
+    rng = random.Random(3)
+    names = [f"p{i}" for i in range(40)]
+    for _ in range(300):
+        players = rng.sample(names, rng.randint(2, 4))
+        views.record_match({name: rng.randint(0, 60) for name in players})
+    leaders = views["leaders"]
+    page = decode_message(leaders.page())
+    assert page["leaders"] == sorted(leaders.rows.values(), key=ranked)
+    assert page["version"] == leaders.version
+
+
+def test_page_is_cached_until_the_next_change():
+    view = View("games")
+    view.put("game_1", {"game_id": "game_1"})
+    frame = view.page()
+    assert view.page() is frame
+    view.remove("game_1")
+    assert decode_message(view.page())["games"] == []
+    assert view.encoded == 2
+
+
+def test_loaded_view_keeps_its_rank_order():
+    view = View("leaders", rank=ranked)
+    rows = [(f"p{i}", {"name": f"p{i}", "played": 1, "wins": i % 3, "best": 10 - i}) for i in range(10)]
+    view.load(5, rows)
+    view.remove("p4")
+    view.put("p0", {"name": "p0", "played": 2, "wins": 9, "best": 1})
+    page = decode_message(view.page())
+    assert page["leaders"] == sorted(view.rows.values(), key=ranked)
+    assert page["leaders"][0]["name"] == "p0"